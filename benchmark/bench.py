@@ -0,0 +1,151 @@
+"""
+离线基准测试: 在固定的fixtures/pricing.json上比较各优化器的规划速度和方案成本
+
+    cd benchmark && PYTHONPATH=.. python bench.py                # 与baseline.json比较, 退化时返回1
+    cd benchmark && PYTHONPATH=.. python bench.py --update-baseline
+"""
+import argparse, gc, json, logging, os, random, sys, time, tracemalloc
+from optimizer.BFD import BFD
+from optimizer.CABFD import CABFD
+from optimizer.BatchBFD import BatchBFD
+from utils.resources import Pod
+
+PRICING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pricing.json")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+# 各优化器参与测试的最大规模, 超过后单次规划耗时过长
+OPTIMIZERS = {
+    "BFD": (BFD, 10_000),
+    "CABFD": (CABFD, 100_000),
+    "BatchBFD": (BatchBFD, 1_000_000),
+}
+# BatchBFD的开销随shape数增长, shape几乎各不相同的负载只测到较小规模
+LIMITS = {("BatchBFD", "uniform"): 10_000, ("BatchBFD", "skewed"): 10_000}
+
+
+def uniform(n, rnd):
+    """CPU和RAM在节点可容纳范围内均匀分布, 几乎每个pod的shape都不同"""
+    return [(round(rnd.uniform(0.1, 4), 1), round(rnd.uniform(0.1, 16), 1)) for _ in range(n)]
+
+
+def skewed(n, rnd):
+    """大多数pod很小, 少数pod很大(长尾)"""
+    return [(min(round(rnd.paretovariate(2.5) * 0.1, 2), 8), min(round(rnd.paretovariate(2) * 0.25, 2), 32))
+            for _ in range(n)]
+
+
+def replica_heavy(n, rnd, deployments=8):
+    """少数Deployment, 副本数服从Zipf分布"""
+    shapes = [(rnd.choice([0.1, 0.25, 0.5, 1, 2]), rnd.choice([0.25, 0.5, 1, 2, 4])) for _ in range(deployments)]
+    weights = [1 / (i + 1) for i in range(deployments)]
+    return rnd.choices(shapes, weights=weights, k=n)
+
+
+WORKLOADS = {"uniform": uniform, "skewed": skewed, "replica-heavy": replica_heavy}
+
+
+def make_pods(workload, n, seed=0):
+    shapes = WORKLOADS[workload](n, random.Random(seed))
+    return [Pod({"CPU": cpu, "RAM": ram}) for cpu, ram in shapes]
+
+
+def measure(optimizer, pods):
+    """
+    先不开tracemalloc计时, 再单独跑一次记录峰值内存
+    :return: 该次规划的各项指标
+    """
+    gc.collect()
+    start = time.perf_counter()
+    schedule = optimizer.optimize(pods)
+    wall = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    optimizer.optimize(pods)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    capacity_cpu = sum(x.cpu for x in schedule)
+    capacity_ram = sum(x.memory for x in schedule)
+    return {
+        "wall_s": round(wall, 4),
+        "peak_mb": round(peak / 2**20, 2),
+        "nodes": len(schedule),
+        "price": round(sum(x.price for x in schedule), 6),
+        "cpu_util": round(sum(x.occupied_cpu for x in schedule) / capacity_cpu, 4),
+        "ram_util": round(sum(x.occupied_memory for x in schedule) / capacity_ram, 4),
+    }
+
+
+def run(sizes, optimizers, workloads):
+    results = {}
+    instances = {name: OPTIMIZERS[name][0](pricing_path=PRICING) for name in optimizers}
+    for workload in workloads:
+        for n in sizes:
+            pods = make_pods(workload, n)
+            for name in optimizers:
+                if n > LIMITS.get((name, workload), OPTIMIZERS[name][1]):
+                    continue
+                key = f"{name}/{workload}/{n}"
+                results[key] = measure(instances[name], pods)
+                print(f"{key:<32} {results[key]}", flush=True)
+    return results
+
+
+def compare(results, baseline, time_tolerance, cost_tolerance):
+    """
+    方案成本或节点数超过baseline的(1+cost_tolerance)倍, 或耗时超过(1+time_tolerance)倍视为退化
+    :return: 退化项的描述
+    """
+    regressions = []
+    for key, current in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        for metric, tolerance in (("price", cost_tolerance), ("nodes", cost_tolerance),
+                                  ("wall_s", time_tolerance), ("peak_mb", time_tolerance)):
+            # 过小的耗时和内存受噪声影响大, 不参与比较
+            if metric == "wall_s" and base[metric] < 0.05 or metric == "peak_mb" and base[metric] < 1:
+                continue
+            if current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {base[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--optimizers", nargs="+", default=list(OPTIMIZERS), choices=list(OPTIMIZERS))
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--time-tolerance", type=float, default=0.5)
+    parser.add_argument("--cost-tolerance", type=float, default=0.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    results = run(args.sizes, args.optimizers, args.workloads)
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as fp:
+                baseline = json.load(fp)
+        baseline.update(results)
+        with open(args.baseline, "w") as fp:
+            json.dump(baseline, fp, indent=1, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline found, run with --update-baseline first")
+        return 0
+    with open(args.baseline) as fp:
+        regressions = compare(results, json.load(fp), args.time_tolerance, args.cost_tolerance)
+    for x in regressions:
+        print(f"REGRESSION {x}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
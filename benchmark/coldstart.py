@@ -0,0 +1,62 @@
+"""
+冷启动测试: 在全新的Python进程中测量从导入调度模块到得出第一个方案的耗时
+并检查导入路径上没有提前加载google-cloud和kubernetes SDK
+
+    cd benchmark && PYTHONPATH=.. python coldstart.py              # 超过--budget-ms时返回1
+    cd benchmark && PYTHONPATH=.. python coldstart.py --runs 10 --pods 1000
+"""
+import argparse, json, os, statistics, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRICING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pricing.json")
+HEAVY = ("google.cloud", "kubernetes")
+
+# 在子进程中执行, 各阶段耗时以毫秒为单位输出为一行JSON
+PROBE = """
+import time, sys, json
+t0 = time.perf_counter()
+import cluster.Scheduler
+t1 = time.perf_counter()
+from optimizer.CABFD import CABFD
+from utils.resources import Pod
+cabfd = CABFD(pricing_path=sys.argv[1])
+t2 = time.perf_counter()
+cabfd.optimize([Pod({"CPU": 0.1 + i % 7 * 0.3, "RAM": 0.25 + i % 5 * 0.5}) for i in range(int(sys.argv[2]))])
+t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1e3, "load_ms": (t2 - t1) * 1e3, "plan_ms": (t3 - t2) * 1e3,
+                  "total_ms": (t3 - t0) * 1e3, "heavy": [x for x in sys.argv[3:] if x in sys.modules]}))
+"""
+
+
+def probe(pods):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    out = subprocess.run([sys.executable, "-c", PROBE, PRICING, str(pods), *HEAVY],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--pods", type=int, default=100)
+    parser.add_argument("--budget-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    runs = [probe(args.pods) for _ in range(args.runs)]
+    for key in ("import_ms", "load_ms", "plan_ms", "total_ms"):
+        values = [x[key] for x in runs]
+        print(f"{key:<10} median {statistics.median(values):8.1f}  max {max(values):8.1f}")
+
+    heavy = sorted({x for run in runs for x in run["heavy"]})
+    if heavy:
+        print(f"FAIL SDK imported eagerly: {heavy}")
+        return 1
+    total = statistics.median(x["total_ms"] for x in runs)
+    if total > args.budget_ms:
+        print(f"FAIL cold start {total:.1f}ms exceeds budget {args.budget_ms}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+pod列表解析测试: ClusterMonitor.get_pods的模型反序列化路径与raw JSON路径对比
+列表响应取自录制文件(replay/Recorder.py)中的pod, 复制改名到--pods个; 不提供录制文件时生成合成pod
+API调用本身不计入, 两条路径收到的是相同的响应字节, 模型路径与真实客户端的ApiClient.deserialize一样先json.loads再建立V1PodList
+
+    cd benchmark && PYTHONPATH=.. python listparse.py --pods 50000
+    cd benchmark && PYTHONPATH=.. python listparse.py recording.json --pods 50000 --page-size 500
+"""
+import argparse, copy, gc, json, time, tracemalloc
+from cluster.Monitor import ClusterMonitor
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class PagedListApi:
+    """只实现list_namespaced_pod的CoreV1Api替身, 每页的响应预先编码为字节"""
+    def __init__(self, pages):
+        from kubernetes import client
+        self.pages = pages
+        self.api_client = client.ApiClient()
+
+    def list_namespaced_pod(self, namespace, limit=None, _continue=None, _preload_content=True, **kwargs):
+        response = _Response(self.pages[int(_continue or 0)])
+        if not _preload_content:
+            return response
+        return self.api_client._ApiClient__deserialize(json.loads(response.data), "V1PodList")
+
+
+def synthetic(i):
+    return {"metadata": {"name": f"pod-{i}", "namespace": "default", "resourceVersion": str(i),
+                         "uid": f"{i:032x}", "labels": {"app": f"app-{i % 50}"}},
+            "spec": {"nodeName": f"node-{i % 500}" if i % 10 else None,
+                     "containers": [{"name": "app", "image": "nginx:1.25",
+                                     "resources": {"requests": {"cpu": "250m", "memory": "512Mi"},
+                                                   "limits": {"cpu": "500m", "memory": "1Gi"}}}]},
+            "status": {"phase": "Running" if i % 10 else "Pending"}}
+
+
+def build_pages(path, pods, page_size):
+    templates = None
+    if path:
+        with open(path, 'r') as fp:
+            templates = json.load(fp)["k8s"]["pods"]["items"]
+    items = []
+    for i in range(pods):
+        if templates:
+            item = copy.deepcopy(templates[i % len(templates)])
+            item["metadata"]["name"] = f"{item['metadata']['name']}-{i}"
+            item["metadata"]["resourceVersion"] = str(i)
+        else:
+            item = synthetic(i)
+        items.append(item)
+    pages = []
+    for start in range(0, pods, page_size):
+        more = start + page_size < pods
+        pages.append(json.dumps({"kind": "PodList", "apiVersion": "v1",
+                                 "metadata": {"resourceVersion": str(pods),
+                                              "continue": str(len(pages) + 1) if more else None},
+                                 "items": items[start:start + page_size]}).encode())
+    return pages
+
+
+def measure(api, raw, page_size):
+    """耗时与内存分两次list测量, tracemalloc本身会显著拖慢解析; informer=True时get_pods是一次完整的list"""
+    monitor = ClusterMonitor(informer=True, core_v1=api, raw=raw, page_size=page_size)
+    gc.collect()
+    start = time.perf_counter()
+    monitor.get_pods()
+    elapsed = time.perf_counter() - start
+    monitor = ClusterMonitor(informer=True, core_v1=api, raw=raw, page_size=page_size)
+    gc.collect()
+    tracemalloc.start()
+    monitor.get_pods()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, retained, monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=None, help="录制文件, 不提供时使用合成pod")
+    parser.add_argument("--pods", type=int, default=50_000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    pages = build_pages(args.path, args.pods, args.page_size)
+    api = PagedListApi(pages)
+    print(f"{args.pods} pods, {len(pages)} pages, {sum(len(x) for x in pages) / 2**20:.1f} MiB JSON")
+    results = {}
+    for name, raw in (("model", False), ("raw", True)):
+        elapsed, peak, retained, monitor = measure(api, raw, args.page_size)
+        results[name] = monitor
+        print(f"{name:<6} {elapsed * 1e3:9.1f} ms  peak {peak / 2**20:7.1f} MiB  retained {retained / 2**20:6.1f} MiB")
+    same = ({k: (v.status, v.node, v.cpu, v.memory) for k, v in results["model"].pod_store.items()}
+            == {k: (v.status, v.node, v.cpu, v.memory) for k, v in results["raw"].pod_store.items()})
+    print(f"records identical: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+"""
+资源数量解析的吞吐测试: utils.quantity与ClusterMonitor原先的字符串切片解析对比
+输入取旧实现能解析的写法(m/Ki/Mi/Gi), 模拟少数几种字符串在大量pod间重复的情况
+
+    cd benchmark && PYTHONPATH=.. python quantity.py
+    cd benchmark && PYTHONPATH=.. python quantity.py --count 1000000 --distinct 5000
+"""
+import argparse, random, time
+from utils import quantity
+
+CPU = ["100m", "250m", "500m", "1", "2", "1500m"]
+RAM = ["128Mi", "256Mi", "512Mi", "1Gi", "2Gi", "16393080Ki"]
+
+
+def legacy_cpu(cpu):
+    if cpu.endswith("m"):
+        return float(cpu[:-len("m")])/1000
+    else:
+        return float(cpu)
+
+
+def legacy_ram(ram):
+    if ram.endswith("Gi"):
+        return float(ram[:-len("Gi")])
+    elif ram.endswith("Mi"):
+        return float(ram[:-len("Mi")]) / 1024
+    elif ram.endswith("Ki"):
+        return float(ram[:-len("Ki")])/1024/1024
+
+
+def current_cpu(cpu):
+    return quantity.cpu_millis(cpu) / 1000
+
+
+def current_ram(ram):
+    return quantity.memory_bytes(ram) / 2**30
+
+
+def workload(count, distinct, seed=0):
+    """distinct为0时只用CPU/RAM中的常见写法, 否则额外生成distinct种不同的毫核/Mi数值"""
+    rnd = random.Random(seed)
+    cpu, ram = list(CPU), list(RAM)
+    cpu += [f"{rnd.randint(1, 4000)}m" for _ in range(distinct)]
+    ram += [f"{rnd.randint(1, 65536)}Mi" for _ in range(distinct)]
+    return [rnd.choice(cpu) for _ in range(count)], [rnd.choice(ram) for _ in range(count)]
+
+
+def measure(parse_cpu, parse_ram, cpu, ram):
+    start = time.perf_counter()
+    for c, r in zip(cpu, ram):
+        parse_cpu(c)
+        parse_ram(r)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200_000, help="解析的(cpu, memory)对数")
+    parser.add_argument("--distinct", type=int, default=0, help="额外的不同数量字符串个数")
+    args = parser.parse_args()
+
+    cpu, ram = workload(args.count, args.distinct)
+    mismatch = sum(abs(legacy_cpu(c) - current_cpu(c)) > 1e-9 or abs(legacy_ram(r) - current_ram(r)) > 1e-9
+                   for c, r in zip(cpu[:1000], ram[:1000]))
+    legacy = measure(legacy_cpu, legacy_ram, cpu, ram)
+    current = measure(current_cpu, current_ram, cpu, ram)
+    for name, elapsed in (("legacy", legacy), ("quantity", current)):
+        print(f"{name:<9} {elapsed * 1e3:8.1f} ms  {args.count / elapsed / 1e6:6.2f} M pairs/s")
+    print(f"mismatch  {mismatch} of {min(1000, args.count)} sampled pairs")
+    return 1 if mismatch else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
+import logging, time
+
+RETRY_STATUS = {409, 429, 500, 502, 503, 504}
+
+
+class Binder:
+    """
+    批量绑定: 把整个放置方案并发提交给API Server
+    所有工作线程共享同一个带连接池的CoreV1Api, 并发数即连接池大小
+    """
+    def __init__(self, core_v1=None, workers=32, retries=3, backoff=0.2):
+        """
+        :param core_v1: 可注入的CoreV1Api, 默认按kubeconfig创建连接池大小为workers的客户端
+        :param workers: 同时进行的绑定请求数上限
+        :param retries: 冲突或可重试错误的最大重试次数
+        :param backoff: 重试的初始退避时间(秒), 每次翻倍
+        """
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.core_v1 = core_v1 or self._pooled_client(workers)
+
+    @staticmethod
+    def _pooled_client(pool_size):
+        from kubernetes import config, client
+        config.load_kube_config("../configurations/.kube/config")
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = pool_size
+        return client.CoreV1Api(client.ApiClient(configuration))
+
+    @staticmethod
+    def assignments(schedule):
+        """:return: 方案中每个pod及其目标节点名 [(Pod, node_name)]"""
+        return [(pod, node.name) for node in schedule for pod in node.pods]
+
+    def bind(self, assignments):
+        """
+        :param assignments: [(Pod, node_name)]
+        :return: 每个pod的绑定结果, 顺序与输入一致
+        """
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda x: self._bind_one(*x), assignments))
+        bound = sum(x["status"] == "bound" for x in results)
+        for x in results:
+            metrics.BINDINGS.inc(status=x["status"])
+        logging.info(f"绑定完成: {bound}/{len(results)}个pod成功, 耗时{time.time() - start:.2f}s")
+        return results
+
+    def _bind_one(self, pod, node_name):
+        namespace = pod.namespace or "default"
+        result = {"pod": pod.name, "namespace": namespace, "node": node_name,
+                  "status": "failed", "attempts": 0, "error": None}
+        # 直接使用与V1Binding等价的dict, 绑定路径上不需要导入kubernetes的模型
+        body = {"apiVersion": "v1", "kind": "Binding", "metadata": {"name": pod.name},
+                "target": {"apiVersion": "v1", "kind": "Node", "name": node_name}}
+        for attempt in range(self.retries + 1):
+            result["attempts"] = attempt + 1
+            try:
+                # 不反序列化返回值: 客户端对V1Binding的响应解析存在已知问题, 且结果不需要
+                with metrics.api_call("k8s", "create_namespaced_pod_binding"):
+                    self.core_v1.create_namespaced_pod_binding(
+                        name=pod.name, namespace=namespace, body=body, _preload_content=False)
+                result["status"] = "bound"
+                return result
+            except Exception as e:
+                status = getattr(e, "status", None)  # ApiException带HTTP状态码
+                if status is None:
+                    result["error"] = str(e)
+                    break
+                result["error"] = f"{status} {e.reason}"
+                if status == 409:
+                    owner = self._bound_node(pod.name, namespace)
+                    if owner is not None:
+                        result["status"] = "bound" if owner == node_name else "conflict"
+                        result["node"] = owner
+                        return result
+                if status not in RETRY_STATUS:
+                    break
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+
+        logging.error(f"绑定 {namespace}/{pod.name} 到 {node_name} 失败: {result['error']}")
+        return result
+
+    def _bound_node(self, name, namespace):
+        """冲突时确认pod是否已被(其他调度器)绑定, :return: 已绑定的节点名或None"""
+        try:
+            return self.core_v1.read_namespaced_pod(name, namespace).spec.node_name
+        except Exception:
+            return None
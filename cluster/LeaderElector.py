@@ -0,0 +1,120 @@
+import json, logging, os, socket, time
+from datetime import datetime, timezone
+
+HTTP_NOT_FOUND = 404
+HTTP_CONFLICT = 409
+
+
+class LeaderElector:
+    """
+    基于coordination.k8s.io/v1 Lease的选主, 语义与client-go的leaderelection相同:
+        - 持有者每retry_period秒续约一次renewTime
+        - 其他副本只在本地观察到Lease记录连续lease_duration秒没有变化时才抢占, 不依赖各副本时钟一致
+        - 所有写入都带resourceVersion, 并发抢占时只有一个副本成功, 其余收到409
+    """
+    def __init__(self, coordination_v1=None, name="kdd-node-provisioner", namespace="default", identity=None,
+                 lease_duration=15, retry_period=2, api_client=None):
+        """
+        :param coordination_v1: 可注入的CoordinationV1Api(如FakeCoordinationV1Api)
+        :param api_client: 未注入coordination_v1时用于创建CoordinationV1Api的ApiClient,
+                           通常为ClusterMonitor.core_v1.api_client, 与其共用kubeconfig和连接池;
+                           为None时使用ClusterMonitor已载入的默认配置
+        :param identity: 本副本的标识, 默认为主机名-进程号
+        :param lease_duration: Lease的有效期(秒)
+        :param retry_period: 两次续约/抢占尝试的最小间隔(秒)
+        """
+        self.name = name
+        self.namespace = namespace
+        self.identity = identity or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_duration = lease_duration
+        self.retry_period = retry_period
+        self._setup(coordination_v1, api_client)
+
+    def _setup(self, coordination_v1=None, api_client=None):
+        if coordination_v1 is None:
+            from kubernetes import client
+            coordination_v1 = client.CoordinationV1Api(api_client)
+        self.coordination_v1 = coordination_v1
+        self.observed = None            # 最近观察到的Lease spec
+        self.observed_time = 0.0        # 本地观察到该记录的时间(monotonic)
+        self.last_attempt = None
+        self.leader = False
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def is_leader(self):
+        """距上次尝试超过retry_period时续约或抢占, :return: 本副本当前是否持有Lease"""
+        now = time.monotonic()
+        if self.last_attempt is None or now - self.last_attempt >= self.retry_period:
+            self.last_attempt = now
+            self.try_acquire_or_renew()
+        # 续约失败且超过有效期后不再认为自己是leader
+        if self.leader and now - self.observed_time > self.lease_duration:
+            self.leader = False
+        return self.leader
+
+    def try_acquire_or_renew(self):
+        now = self._now()
+        spec = {"holderIdentity": self.identity, "leaseDurationSeconds": self.lease_duration,
+                "acquireTime": now, "renewTime": now, "leaseTransitions": 0}
+        try:
+            lease = self._read()
+            if lease is None:
+                self.coordination_v1.create_namespaced_lease(
+                    self.namespace, {"apiVersion": "coordination.k8s.io/v1", "kind": "Lease",
+                                     "metadata": {"name": self.name}, "spec": spec}, _preload_content=False)
+                return self._observe(spec, True)
+
+            current = lease.get("spec") or {}
+            if current != self.observed:
+                self._observe(current, current.get("holderIdentity") == self.identity)
+            holder = current.get("holderIdentity")
+            expired = time.monotonic() - self.observed_time > current.get("leaseDurationSeconds", self.lease_duration)
+            if holder and holder != self.identity and not expired:
+                self.leader = False
+                return False
+            if holder == self.identity:
+                spec["acquireTime"] = current.get("acquireTime", now)
+                spec["leaseTransitions"] = current.get("leaseTransitions", 0)
+            else:
+                spec["leaseTransitions"] = current.get("leaseTransitions", 0) + 1
+                logging.info(f"{self.identity}尝试接管Lease {self.namespace}/{self.name} (原持有者{holder})")
+            lease["spec"] = spec
+            self.coordination_v1.replace_namespaced_lease(self.name, self.namespace, lease, _preload_content=False)
+            return self._observe(spec, True)
+        except Exception as e:
+            if getattr(e, "status", None) != HTTP_CONFLICT:
+                logging.error(f"{self.identity}续约Lease失败: {e}")
+            self.leader = False
+            return False
+
+    def _read(self):
+        try:
+            return json.loads(self.coordination_v1.read_namespaced_lease(self.name, self.namespace,
+                                                                          _preload_content=False).data)
+        except Exception as e:
+            if getattr(e, "status", None) == HTTP_NOT_FOUND:
+                return None
+            raise
+
+    def _observe(self, spec, leader):
+        if leader and not self.leader:
+            logging.info(f"{self.identity}成为Lease {self.namespace}/{self.name}的持有者")
+        self.observed, self.observed_time, self.leader = spec, time.monotonic(), leader
+        return leader
+
+    def release(self):
+        """主动放弃Lease, 其他副本无需等待过期即可接管"""
+        if not self.leader:
+            return
+        try:
+            lease = self._read()
+            if lease and (lease.get("spec") or {}).get("holderIdentity") == self.identity:
+                lease["spec"]["holderIdentity"] = None
+                self.coordination_v1.replace_namespaced_lease(self.name, self.namespace, lease,
+                                                              _preload_content=False)
+        except Exception as e:
+            logging.error(f"{self.identity}释放Lease失败: {e}")
+        self.leader = False
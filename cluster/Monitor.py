@@ -1,37 +1,268 @@
-from kubernetes import config,client
-import logging, time
+import json, logging, sys, time, threading
 from utils.resources import Node, Pod
+from utils import metrics
+from utils.quantity import cpu_millis, memory_bytes
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+HTTP_GONE = 410
+# 非informer模式下由API Server过滤的两类pod: 已绑定且未结束的pod(计入节点占用)和未绑定的Pending pod(待调度)
+ASSIGNED_PODS = "spec.nodeName!=,status.phase!=Succeeded,status.phase!=Failed"
+UNSCHEDULED_PODS = "spec.nodeName=,status.phase=Pending"
+# 本调度器的名字, 与test.py中filter_unscheduled_pods一致
+SCHEDULER_NAME = "test-scheduler"
+
 
 class ClusterMonitor:
-    def __init__(self):
+    def __init__(self, informer=False, watch_timeout=300, namespace="default", page_size=500, core_v1=None,
+                 raw=False, scheduler_name=SCHEDULER_NAME):
+        """
+        :param informer: 为True时只在启动时list一次, 之后通过watch事件增量维护node和pod缓存
+        :param watch_timeout: 每轮watch请求的超时(秒), 超时后从最新resourceVersion继续watch
+        :param namespace: 只list/watch该namespace下的pod, 由API Server过滤;
+                          可以是namespace列表(每个namespace各自list/watch), None为所有namespace
+        :param page_size: 分页list时每页的对象数(limit)
+        :param core_v1: 可注入的CoreV1Api(如回放用的FakeCoreV1Api), 默认按kubeconfig创建
+        :param raw: 为True时list请求_preload_content=False, 跳过V1Node/V1Pod的模型反序列化,
+                    直接从响应JSON(有orjson时用orjson解析)中取调度需要的字段
+        :param scheduler_name: 只调度spec.schedulerName为该名字或未指定的pod, 其他调度器的pod不计入pending
+        """
         logging.basicConfig(
             level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
         )
-        self._setup()
+        self.informer = informer
+        self.watch_timeout = watch_timeout
+        self.namespace = namespace
+        self.namespaces = list(namespace) if isinstance(namespace, (list, tuple, set)) else [namespace]
+        self.page_size = page_size
+        self.raw = raw
+        self.scheduler_name = scheduler_name
+        self._setup(core_v1)
 
-    def _setup(self):
-        config.load_kube_config("../configurations/.kube/config")
-        self.core_v1 = client.CoreV1Api()
-        self.node_cache = []
-        self.pod_cache = []
+    def _setup(self, core_v1=None):
+        if core_v1 is None:
+            from kubernetes import config, client
+            config.load_kube_config("../configurations/.kube/config")
+            core_v1 = client.CoreV1Api()
+        self.core_v1 = core_v1
+        # 快照只保存调度需要的字段(Node/Pod记录), 不保留反序列化后的V1Node/V1Pod
+        self.node_store = {}        # name -> Node
+        self.pod_store = {}         # (namespace, name) -> Pod
+        self.pods_by_node = {}      # nodeName -> {(namespace, name)}
+        self.unscheduled = []       # 非informer模式下list到的未绑定Pending pod
+        self.versions = {"node": {}, "pod": {}}     # key -> resourceVersion, 用于丢弃重复的watch事件
+        # 每个list/watch流的resourceVersion: "node"和("pod", namespace)
+        self.resource_version = {"node": None, **{("pod", x): None for x in self.namespaces}}
         self.last_update = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchers = []
+
+    @property
+    def node_cache(self):
+        with self._lock:
+            return list(self.node_store.values())
+
+    @property
+    def pod_cache(self):
+        with self._lock:
+            return list(self.pod_store.values())
+
+    def node(self, name):
+        return self.node_store.get(name)
+
+    def pod(self, namespace, name):
+        return self.pod_store.get((namespace, name))
+
+    def pods_on(self, node_name):
+        """:return: 绑定在该节点上的pod"""
+        with self._lock:
+            return [self.pod_store[x] for x in self.pods_by_node.get(node_name, ())]
+
+    def _put_pod(self, key, pod):
+        """写入pod并维护按节点的索引, 调用方持有self._lock"""
+        old = self.pod_store.get(key)
+        if old is not None and old.node is not None and old.node != pod.node:
+            self._unindex(key, old.node)
+        self.pod_store[key] = pod
+        if pod.node is not None:
+            self.pods_by_node.setdefault(pod.node, set()).add(key)
+
+    def _drop_pod(self, key):
+        old = self.pod_store.pop(key, None)
+        if old is not None and old.node is not None:
+            self._unindex(key, old.node)
+
+    def _unindex(self, key, node_name):
+        keys = self.pods_by_node.get(node_name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.pods_by_node[node_name]
 
     def refresh(self):
+        """informer模式下缓存由watch事件维护, 只在第一次调用时list"""
+        if self.informer:
+            if not self._watchers:
+                self.start_informer()
+            self.last_update = time.time()
+            return
         self.get_nodes()
         self.get_pods()
         self.last_update = time.time()
 
+    def start_informer(self):
+        self.get_nodes()
+        self.get_pods()
+        self._stop.clear()
+        self._watchers = [threading.Thread(target=self._watch, args=("node",), daemon=True)]
+        self._watchers += [threading.Thread(target=self._watch, args=("pod", x), daemon=True) for x in self.namespaces]
+        _ = [x.start() for x in self._watchers]
+        logging.info("Informer started, watching nodes and pods")
+
+    def stop_informer(self):
+        self._stop.set()
+        self._watchers = []
+
+    def _pod_lister(self, namespace):
+        """:return: (list函数, 位置参数), namespace为None时list所有namespace"""
+        if namespace is None:
+            return self.core_v1.list_pod_for_all_namespaces, ()
+        return self.core_v1.list_namespaced_pod, (namespace,)
+
+    def _watch(self, kind, namespace=None):
+        from kubernetes import watch
+        list_func, args = (self.core_v1.list_node, ()) if kind == "node" else self._pod_lister(namespace)
+        relist = self.get_nodes if kind == "node" else self.get_pods
+        key = "node" if kind == "node" else ("pod", namespace)
+        while not self._stop.is_set():
+            try:
+                stream = watch.Watch().stream(list_func, *args,
+                                              resource_version=self.resource_version[key],
+                                              timeout_seconds=self.watch_timeout,
+                                              allow_watch_bookmarks=True)
+                for event in stream:
+                    self._apply_event(kind, event, namespace)
+                    if self._stop.is_set():
+                        break
+            except Exception as e:
+                if getattr(e, "status", None) == HTTP_GONE:
+                    logging.warning(f"{kind} watch的resourceVersion已过期(410 Gone), 重新list")
+                    if relist():
+                        continue
+                    # list失败时resourceVersion仍是过期的那个, 立即重试只会再次收到410
+                    logging.error(f"{kind}重新list失败, 5秒后重试")
+                else:
+                    logging.error(f"{kind} watch中断, 5秒后重试: {e}")
+                self._stop.wait(5)
+
+    def _apply_event(self, kind, event, namespace=None):
+        """按resourceVersion把一条watch事件应用到本地缓存, namespace为该事件所属pod watch流的namespace"""
+        metrics.WATCH_EVENTS.inc(kind=kind, type=event["type"])
+        stream = "node" if kind == "node" else ("pod", namespace)
+        if event["type"] == "BOOKMARK":
+            self.resource_version[stream] = event["raw_object"]["metadata"]["resourceVersion"]
+            return
+        obj = event["object"]
+        rv = obj.metadata.resource_version
+        key = obj.metadata.name if kind == "node" else (obj.metadata.namespace, obj.metadata.name)
+        versions = self.versions[kind]
+
+        with self._lock:
+            self.resource_version[stream] = rv
+            if event["type"] == "DELETED":
+                versions.pop(key, None)
+                if kind == "node":
+                    self.node_store.pop(key, None)
+                else:
+                    self._drop_pod(key)
+                return
+            if versions.get(key) == rv:
+                return
+            try:
+                if kind == "node":
+                    self.node_store[key] = self._parse_node(obj)
+                else:
+                    self._put_pod(key, self._parse_pod(obj))
+                versions[key] = rv
+            except Exception as e:
+                logging.error(f"解析{kind} {key}失败: {e}")
+
+    def _pages(self, list_func, *args, **kwargs):
+        """按limit/continue分页list, 逐页yield, 不在内存中保留完整列表"""
+        token = None
+        while True:
+            with metrics.api_call("k8s", list_func.__name__):
+                page = list_func(*args, limit=self.page_size, _continue=token, **kwargs)
+            yield page
+            token = page.metadata._continue
+            if not token:
+                return
+
+    def _raw_pages(self, list_func, *args, **kwargs):
+        """与_pages相同, 但每页是响应JSON解析出的dict"""
+        token = None
+        while True:
+            with metrics.api_call("k8s", list_func.__name__):
+                response = list_func(*args, limit=self.page_size, _continue=token, _preload_content=False, **kwargs)
+                page = _loads(response.data)
+            yield page
+            token = page["metadata"].get("continue")
+            if not token:
+                return
+
+    def _list(self, kind, list_func, *args, **kwargs):
+        """
+        逐页list并逐个解析对象, 每页解析完即可释放
+        :return: ({key: 记录}, {key: resourceVersion}, list的resourceVersion)
+        """
+        records, versions, rv = {}, {}, None
+        if self.raw:
+            parse = self._parse_node_raw if kind == "node" else self._parse_pod_raw
+            for page in self._raw_pages(list_func, *args, **kwargs):
+                for item in page["items"]:
+                    meta = item["metadata"]
+                    key = meta["name"] if kind == "node" else (meta["namespace"], meta["name"])
+                    records[key] = parse(item)
+                    versions[key] = meta["resourceVersion"]
+                rv = page["metadata"]["resourceVersion"]
+        else:
+            parse = self._parse_node if kind == "node" else self._parse_pod
+            for page in self._pages(list_func, *args, **kwargs):
+                for item in page.items:
+                    meta = item.metadata
+                    key = meta.name if kind == "node" else (meta.namespace, meta.name)
+                    records[key] = parse(item)
+                    versions[key] = meta.resource_version
+                rv = page.metadata.resource_version
+        return records, versions, rv
+
     def get_nodes(self):
-        self.node_cache.clear()
+        """list全部节点并替换缓存, :return: list是否成功, 失败时保留原有缓存"""
         try:
-            nodes = self.core_v1.list_node().items
-            for node in nodes:
-                self.node_cache.append(self._parse_node(node))
-            logging.info(f"Obtain {len(self.node_cache)}  in this Cluster...")
+            nodes, versions, rv = self._list("node", self.core_v1.list_node)
+            with self._lock:
+                self.node_store = nodes
+                self.versions["node"] = versions
+                self.resource_version["node"] = rv
+            logging.info(f"Obtain {len(self.node_store)}  in this Cluster...")
+            return True
         except Exception as e:
             logging.error(e)
+            return False
+
+    def list_nodes(self, label_selector=None):
+        """由API Server按label selector过滤节点, 结果直接返回, 不写入缓存, :return: Node列表, 失败为None"""
+        try:
+            return list(self._list("node", self.core_v1.list_node, label_selector=label_selector)[0].values())
+        except Exception as e:
+            logging.error(e)
+            return None
 
     def _parse_node(self, node):
         addresses = {x.type: x.address for x in node.status.addresses}
@@ -41,64 +272,116 @@ class ClusterMonitor:
                 status = "Ready" if cond.status=="True" else "NotReady"
 
         node_info = {
-            "name": node.metadata.name,
             "InternalIP": addresses.get("InternalIP", None),
-            "Hostname":addresses.get("Hostname", None),
-            "CPU":node.status.capacity["cpu"],
-            "RAM": self._parse_node_memory(node.status.capacity["memory"]),
+            "milli_cpu": cpu_millis(node.status.capacity["cpu"]),
+            "ram_bytes": memory_bytes(node.status.capacity["memory"]),
             "status": status
         }
         #logging.info(f"Parse Node ->\n\t{node_info}")
-        return (node, Node(node.metadata.name, node_info))
+        return Node(node.metadata.name, node_info)
 
-    def _parse_node_memory(self, mem_str):
-        if mem_str.endswith("Ki"):
-            return float(mem_str[:-len("Ki")])/1024/1024
-        return None
+    def _parse_node_raw(self, node):
+        """_parse_node的JSON版本, node为API响应中的dict"""
+        status = node["status"]
+        addresses = {x["type"]: x["address"] for x in status.get("addresses") or ()}
+        ready = next((x["status"] for x in status.get("conditions") or () if x["type"] == "Ready"), None)
+        return Node(node["metadata"]["name"], {
+            "InternalIP": addresses.get("InternalIP", None),
+            "milli_cpu": cpu_millis(status["capacity"]["cpu"]),
+            "ram_bytes": memory_bytes(status["capacity"]["memory"]),
+            "status": "Ready" if ready == "True" else "NotReady"
+        })
+
+    def _list_pods(self, **kwargs):
+        """逐个list self.namespaces, :return: ({key: Pod}, {key: resourceVersion}, {流: list的resourceVersion})"""
+        pods, versions, listed = {}, {}, {}
+        for namespace in self.namespaces:
+            list_func, args = self._pod_lister(namespace)
+            records, record_versions, rv = self._list("pod", list_func, *args, **kwargs)
+            pods.update(records)
+            versions.update(record_versions)
+            listed[("pod", namespace)] = rv
+        return pods, versions, listed
 
     def get_pods(self):
-        self.pod_cache.clear()
+        """
+        list pod并替换缓存, 逐页解析
+        informer模式下list全部pod, 作为watch的起点; 否则缓存只保存ASSIGNED_PODS(用于节点占用),
+        待调度的pod以UNSCHEDULED_PODS另外list到self.unscheduled, 已结束的pod都由API Server过滤掉
+        :return: list是否成功, 失败时保留原有缓存
+        """
+        try:
+            pods, versions, listed = self._list_pods(field_selector=None if self.informer else ASSIGNED_PODS)
+            unscheduled = [] if self.informer else list(self._list_pods(field_selector=UNSCHEDULED_PODS)[0].values())
+            by_node = {}
+            for key, pod in pods.items():
+                if pod.node is not None:
+                    by_node.setdefault(pod.node, set()).add(key)
+            with self._lock:
+                self.pod_store = pods
+                self.versions["pod"] = versions
+                self.pods_by_node = by_node
+                self.unscheduled = unscheduled
+                self.resource_version.update(listed)
+            logging.info(f"Obtain {len(pods) + len(unscheduled)} pods in namespaces {self.namespaces}")
+            return True
+        except Exception as e:
+            logging.error(e)
+            return False
+
+    def list_pods(self, field_selector=None, label_selector=None):
+        """
+        由API Server按field selector(如"status.phase=Pending", "spec.nodeName=xxx")和label selector过滤pod,
+        结果直接返回, 不写入缓存: 缓存、按节点的索引和watch的resourceVersion都基于get_pods的完整列表
+        :return: Pod列表, 失败为None
+        """
         try:
-            pods = self.core_v1.list_pod_for_all_namespaces().items
-            pods = [x for x in pods if x.metadata.namespace == "default"]
-            for pod in pods:
-                self.pod_cache.append(self._parse_pod(pod))
-            logging.info(f"Obtain {len(self.pod_cache)} pods in the default namespace")
+            return list(self._list_pods(field_selector=field_selector, label_selector=label_selector)[0].values())
         except Exception as e:
             logging.error(e)
+            return None
 
     def _parse_pod(self, pod):
-        name, ns = pod.metadata.name, pod.metadata.namespace
-        status = pod.status.phase
+        # namespace/phase/nodeName在大量pod间重复, intern后共享同一个字符串
+        # 各容器的request按整数毫核/字节求和, Pod和Node都以整数保存, 没有requests的容器计为0
         node = pod.spec.node_name
-        cpu = sum([self._parse_pod_cpu(x.resources.requests["cpu"]) for x in pod.spec.containers])
-        ram = sum([self._parse_pod_ram(x.resources.requests["memory"]) for x in pod.spec.containers])
-
-        pod_info = {
-            "name":name,
-            "namespace":ns,
-            "status": status,
-            "node": node,
-            "CPU":cpu, "RAM":ram
-        }
-        #logging.info(f"Parse Pod ->\n\t{pod_info}")
-        return (pod, Pod(pod_info))
-
-    def _parse_pod_cpu(self, cpu):
-        if cpu.endswith("m"):
-            return float(cpu[:-len("m")])/1000
-        else:
-            return float(cpu)
+        millis, size = 0, 0
+        for container in pod.spec.containers:
+            requests = (container.resources and container.resources.requests) or {}
+            millis += cpu_millis(requests.get("cpu"))
+            size += memory_bytes(requests.get("memory"))
+        scheduler = pod.spec.scheduler_name
+        return Pod.record(pod.metadata.name, sys.intern(pod.metadata.namespace), sys.intern(pod.status.phase),
+                          sys.intern(node) if node else None, millis, size,
+                          sys.intern(scheduler) if scheduler else None)
 
-    def _parse_pod_ram(self, ram):
-        if ram.endswith("Gi"):
-            return float(ram[:-len("Gi")])
-        elif ram.endswith("Mi"):
-            return float(ram[:-len("Mi")]) / 1024
+    def _parse_pod_raw(self, pod):
+        """_parse_pod的JSON版本, pod为API响应中的dict"""
+        meta, spec = pod["metadata"], pod["spec"]
+        node = spec.get("nodeName")
+        millis, size = 0, 0
+        for container in spec["containers"]:
+            requests = (container.get("resources") or {}).get("requests") or {}
+            millis += cpu_millis(requests.get("cpu"))
+            size += memory_bytes(requests.get("memory"))
+        scheduler = spec.get("schedulerName")
+        return Pod.record(meta["name"], sys.intern(meta["namespace"]), sys.intern(pod["status"]["phase"]),
+                          sys.intern(node) if node else None, millis, size,
+                          sys.intern(scheduler) if scheduler else None)
 
     @property
     def pending_pods(self):
-        return [x for x in self.pod_cache if x[1].status == "Pending"]
+        """
+        本调度器待调度的pod: 未绑定的Pending pod, 且schedulerName为scheduler_name或未指定
+        informer模式下从缓存中筛选, 否则从get_pods时由API Server过滤出的未绑定Pending pod中筛选
+        已绑定但仍为Pending的pod(如正在拉取镜像)只计入节点占用, 不再参与调度
+        """
+        if not self.informer:
+            with self._lock:
+                pods = list(self.unscheduled)
+        else:
+            pods = [x for x in self.pod_cache if x.status == "Pending" and x.node is None]
+        return [x for x in pods if x.scheduler in (None, self.scheduler_name)]
 
 
 if __name__=="__main__":
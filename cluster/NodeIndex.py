@@ -0,0 +1,165 @@
+import random, threading
+
+
+class _Treap:
+    """以(剩余RAM, 剩余CPU, seq)为键的treap节点, 维护子树中的最大剩余CPU"""
+    __slots__ = ("key", "priority", "left", "right", "max_cpu")
+
+    def __init__(self, key, priority):
+        self.key = key
+        self.priority = priority
+        self.left = self.right = None
+        self.max_cpu = key[1]
+
+    def update(self):
+        self.max_cpu = self.key[1]
+        if self.left is not None and self.left.max_cpu > self.max_cpu:
+            self.max_cpu = self.left.max_cpu
+        if self.right is not None and self.right.max_cpu > self.max_cpu:
+            self.max_cpu = self.right.max_cpu
+
+
+def _split(t, key):
+    """:return: (键小于key的子树, 键不小于key的子树)"""
+    if t is None:
+        return None, None
+    if t.key < key:
+        t.right, right = _split(t.right, key)
+        t.update()
+        return t, right
+    left, t.left = _split(t.left, key)
+    t.update()
+    return left, t
+
+
+def _merge(left, right):
+    """left中所有键都小于right中的键"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _first(t, low, cpu):
+    """:return: 键不小于low且剩余CPU不小于cpu的最小键, 没有则为None"""
+    while t is not None and t.max_cpu >= cpu:
+        if t.key < low:
+            t = t.right
+            continue
+        found = _first(t.left, low, cpu)
+        if found is not None:
+            return found
+        if t.key[1] >= cpu:
+            return t.key
+        # 右子树的键都不小于low, 只按max_cpu剪枝下降
+        low, t = (float("-inf"),), t.right
+    return None
+
+
+def _walk(t, out):
+    while t is not None:
+        _walk(t.left, out)
+        out.append(t.key)
+        t = t.right
+    return out
+
+
+class NodeIndex:
+    """
+    已开启节点的有序索引, 按(剩余RAM, 剩余CPU)升序排列, 资源都是整数字节/毫核
+    底层为按该键排序、以子树最大剩余CPU增强的treap, 插入、删除和best-fit查找都是O(log n):
+    best-fit从第一个RAM足够的节点开始, 跳过max_cpu不够的子树, 放置后只更新该节点的位置
+    多个分片并发调度时通过reserve/reserve_best_fit在锁内检查剩余资源并放置
+    """
+    def __init__(self, nodes=()):
+        self._root = None
+        self._size = 0
+        self._nodes = {}
+        self._key_of = {}       # id(node) -> key, 规划中的新节点都叫"created", 不能按名字区分
+        self._names = {}
+        self._seq = 0
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+        for node in nodes:
+            self.add(node)
+
+    def _key(self, node):
+        self._seq += 1
+        return (node.free_ram_bytes, node.free_milli_cpu, self._seq)
+
+    def add(self, node):
+        key = self._key(node)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Treap(key, self._random.random())), right)
+        self._size += 1
+        self._nodes[key[2]] = node
+        self._key_of[id(node)] = key
+        self._names[node.name] = node
+
+    def remove(self, node):
+        key = self._key_of.pop(id(node))
+        if self._names.get(node.name) is node:
+            del self._names[node.name]
+        left, right = _split(self._root, key)
+        _, right = _split(right, key[:2] + (key[2] + 1,))
+        self._root = _merge(left, right)
+        self._size -= 1
+        del self._nodes[key[2]]
+
+    def best_fit(self, milli_cpu, ram_bytes):
+        """
+        :return: 能容纳(milli_cpu, ram_bytes)且剩余RAM最少的节点(RAM相同则剩余CPU最少), 没有则为None
+        """
+        key = _first(self._root, (ram_bytes, float("-inf")), milli_cpu)
+        return None if key is None else self._nodes[key[2]]
+
+    def place(self, node, pod):
+        """把pod放到node上, 并按新的剩余资源重新排序该节点"""
+        self.remove(node)
+        node.add_pod(pod)
+        self.add(node)
+
+    def node(self, name):
+        return self._names.get(name)
+
+    def release(self, name, pod):
+        """撤销pod在节点上的放置(如绑定失败), 节点不在索引中时忽略"""
+        with self._lock:
+            node = self.node(name)
+            if node is None or pod not in node.pods:
+                return
+            self.remove(node)
+            node.remove_pod(pod)
+            self.add(node)
+
+    def snapshot(self):
+        """:return: [(节点名, 剩余毫核, 剩余字节)], 供分片在锁外规划"""
+        with self._lock:
+            return [(self._nodes[seq].name, free_cpu, free_ram) for free_ram, free_cpu, seq in _walk(self._root, [])]
+
+    def reserve(self, name, pod):
+        """剩余资源仍能容纳pod时放置并返回True, 已被其他分片占用时返回False"""
+        with self._lock:
+            node = self.node(name)
+            if node is None or not node.fits(pod):
+                return False
+            self.place(node, pod)
+            return True
+
+    def reserve_best_fit(self, pod):
+        """:return: 在锁内best-fit并放置pod的节点, 没有则为None"""
+        with self._lock:
+            node = self.best_fit(pod.milli_cpu, pod.ram_bytes)
+            if node is not None:
+                self.place(node, pod)
+            return node
+
+    def __len__(self):
+        return self._size
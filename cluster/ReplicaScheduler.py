@@ -0,0 +1,174 @@
+import json, logging, time
+from cluster.Scheduler import Scheduler
+from cluster.LeaderElector import LeaderElector
+from utils.quantity import cpu_millis, memory_bytes
+from utils import metrics
+
+# 节点上记录各副本已提交放置的注解: {"namespace/name": [毫核, 字节, 提交时间, 副本标识]}
+RESERVATIONS = "kdd.scheduler/reservations"
+# 缓存中看不到的pod的预留保留的时间(秒), 超过后视为pod已删除
+RESERVATION_TTL = 60
+HTTP_CONFLICT = 409
+
+
+class ReplicaScheduler(Scheduler):
+    """
+    乐观并发的多副本调度: 各副本基于自己的informer缓存独立规划, 提交时检测冲突, 只重排失败的pod
+        1. 按缓存best-fit, 得到每个已有节点上的放置
+        2. 逐节点提交: 读取节点的最新版本和预留注解, 以注解加缓存中的已绑定pod计算占用,
+           放得下的pod写入注解(patch带resourceVersion, 其他副本先提交时返回409, 重读后重试),
+           放不下的pod为容量冲突
+        3. 绑定已预留的pod, 已被其他副本预留(reserved)或先绑定(409, binding)的pod由该副本完成, 本副本跳过
+        4. 容量冲突和绑定失败的pod进入重排队列, 下一轮优先规划
+    新节点规划(节点供应)只由持有Lease的副本执行
+    """
+    def __init__(self, identity=None, coordination_v1=None, lease_options=None, commit_retries=3, **options):
+        """
+        :param identity: 副本标识, 同时作为Lease的持有者名
+        :param coordination_v1: 可注入的CoordinationV1Api, 供选主使用
+        :param lease_options: 传给LeaderElector的额外参数(如lease_duration, retry_period)
+        :param commit_retries: 节点预留遇到409时的重试次数
+        :param options: 传给Scheduler的其他参数
+        """
+        self.identity = identity
+        self.coordination_v1 = coordination_v1
+        self.lease_options = lease_options or {}
+        self.commit_retries = commit_retries
+        super().__init__(**options)
+
+    def _setup(self):
+        super()._setup()
+        # 与ClusterMonitor共用ApiClient, 不另外载入kubeconfig
+        api_client = None if self.coordination_v1 else getattr(self.cluster_monitor.core_v1, "api_client", None)
+        self.elector = LeaderElector(self.coordination_v1, identity=self.identity, api_client=api_client,
+                                     **self.lease_options)
+        self.identity = self.elector.identity
+        self.requeued = set()
+        self.last_conflicts = {"capacity": 0, "reserved": 0, "binding": 0, "commit": 0}
+
+    @staticmethod
+    def _key(pod):
+        return f"{pod.namespace or 'default'}/{pod.name}"
+
+    def _plan(self, pendding_pods, index):
+        # 上一轮冲突的pod优先规划: 排在同等大小的pod之前
+        requeued = [x for x in pendding_pods if self._key(x) in self.requeued]
+        others = [x for x in pendding_pods if self._key(x) not in self.requeued]
+        with metrics.phase("best_fit"):
+            placements, unplaced = self._best_fit(requeued, index)
+            more, rest = self._best_fit(others, index)
+        placements, unplaced = placements + more, unplaced + rest
+        self.last_conflicts = {"capacity": 0, "reserved": 0, "binding": 0, "commit": 0}
+
+        with metrics.phase("commit"):
+            accepted, lost = self._commit(placements)
+        bound, failed = [], []
+        if accepted and self.binder:
+            with metrics.phase("bind"):
+                results = self.binder.bind(accepted)
+            for (pod, node_name), result in zip(accepted, results):
+                if result["status"] == "bound":
+                    bound.append((pod, node_name))
+                elif result["status"] == "conflict":
+                    self.last_conflicts["binding"] += 1
+                else:
+                    failed.append(pod)
+        else:
+            bound = accepted
+        self.requeued = {self._key(x) for x in lost + failed}
+        for kind, count in self.last_conflicts.items():
+            if count:
+                metrics.REPLICA_CONFLICTS.inc(count, kind=kind)
+        logging.info(f"副本{self.identity}: 放置{len(bound)}个pod, 冲突{self.last_conflicts}, "
+                     f"{len(self.requeued)}个pod进入重排队列")
+
+        result = []
+        if unplaced and self.elector.is_leader():
+            with metrics.phase("optimize"):
+                result = self.cabfd.optimize(unplaced)
+            if self.repacker:
+                with metrics.phase("repack"):
+                    result = self.repacker.improve(result)
+            self.cabfd.summary(result)
+        elif unplaced:
+            logging.info(f"副本{self.identity}不是leader, {len(unplaced)}个pod的新节点由leader规划")
+        return bound, result
+
+    def _commit(self, placements):
+        """:return: (本副本在节点上预留的[(Pod, node_name)], 因容量或重试耗尽而失败的pod)"""
+        by_node = {}
+        for pod, node_name in placements:
+            by_node.setdefault(node_name, []).append(pod)
+        accepted, lost = [], []
+        for node_name, pods in by_node.items():
+            reserved, lost_here = self._reserve(node_name, pods)
+            accepted += [(x, node_name) for x in reserved]
+            lost += lost_here
+        return accepted, lost
+
+    def _reserve(self, node_name, pods):
+        """在节点的预留注解中写入放得下的pod, :return: (预留成功的pod, 放不下或提交失败的pod)"""
+        for attempt in range(self.commit_retries + 1):
+            try:
+                node = json.loads(self.cluster_monitor.core_v1.read_node(node_name, _preload_content=False).data)
+                capacity = node["status"]["capacity"]
+                free_cpu = cpu_millis(capacity["cpu"])
+                free_ram = memory_bytes(capacity["memory"])
+                reservations = self._live_reservations(node_name, node)
+                free_cpu -= sum(x[0] for x in reservations.values())
+                free_ram -= sum(x[1] for x in reservations.values())
+                for pod in self.cluster_monitor.pods_on(node_name):
+                    if self._key(pod) not in reservations and pod.status not in ("Succeeded", "Failed"):
+                        free_cpu, free_ram = free_cpu - pod.milli_cpu, free_ram - pod.ram_bytes
+
+                reserved, lost, changed = [], [], False
+                for pod in pods:
+                    owner = reservations.get(self._key(pod))
+                    if owner is not None:
+                        # 本副本上一轮预留后绑定失败时重新绑定, 其他副本预留的pod由其绑定
+                        if owner[3] == self.identity:
+                            reserved.append(pod)
+                        else:
+                            self.last_conflicts["reserved"] += 1
+                    elif pod.milli_cpu <= free_cpu and pod.ram_bytes <= free_ram:
+                        free_cpu, free_ram = free_cpu - pod.milli_cpu, free_ram - pod.ram_bytes
+                        reservations[self._key(pod)] = [pod.milli_cpu, pod.ram_bytes, round(time.time(), 3),
+                                                        self.identity]
+                        reserved.append(pod)
+                        changed = True
+                    else:
+                        self.last_conflicts["capacity"] += 1
+                        lost.append(pod)
+                if not changed:
+                    return reserved, lost
+                self.cluster_monitor.core_v1.patch_node(node_name, {"metadata": {
+                    "resourceVersion": node["metadata"]["resourceVersion"],
+                    "annotations": {RESERVATIONS: json.dumps(reservations, separators=(",", ":"))}}})
+                return reserved, lost
+            except Exception as e:
+                if getattr(e, "status", None) != HTTP_CONFLICT:
+                    logging.error(f"副本{self.identity}预留节点{node_name}失败: {e}")
+                    return [], pods
+                self.last_conflicts["commit"] += 1
+        return [], pods
+
+    def _live_reservations(self, node_name, node):
+        """
+        节点注解中仍有效的预留: 去掉已结束或已绑定到其他节点的pod
+        缓存中还看不到的pod(可能是其他副本的缓存更新)在RESERVATION_TTL内保留, 避免超量放置
+        """
+        raw = ((node["metadata"].get("annotations") or {}).get(RESERVATIONS)) or "{}"
+        reservations, now = {}, time.time()
+        for key, request in json.loads(raw).items():
+            namespace, name = key.split("/", 1)
+            pod = self.cluster_monitor.pod(namespace, name)
+            if pod is None and now - request[2] > RESERVATION_TTL:
+                continue
+            if pod is not None and (pod.status in ("Succeeded", "Failed") or pod.node not in (None, node_name)):
+                continue
+            reservations[key] = request
+        return reservations
+
+    def close(self):
+        self.elector.release()
+        self.cluster_monitor.stop_informer()
@@ -1,52 +1,204 @@
-import logging, os, warnings
-from kubernetes import client
+import cProfile, logging, os, time, warnings
 from pricing_model.Monitor import GCPMonitor
 from optimizer.CABFD import CABFD
+from optimizer.BatchBFD import BatchBFD
+from optimizer.LocalSearch import LocalSearch
+from optimizer.PlanCache import PlanCache
+from optimizer.IncrementalPlanner import IncrementalPlanner
 from utils.resources import Pod, Node
 from cluster.Monitor import ClusterMonitor
+from cluster.NodeIndex import NodeIndex
+from cluster.Binder import Binder
+from utils import metrics
 from datetime import datetime
 warnings.filterwarnings("ignore")
 
+# 可选的新节点优化器
+OPTIMIZERS = {"CABFD": CABFD, "BatchBFD": BatchBFD}
+
+
+def make_optimizer(name="CABFD", plan_cache=0, incremental=0, catalogue=None):
+    """:return: 按optimizer/plan_cache/incremental组合的新节点优化器, catalogue为PlanCache使用的目录版本来源"""
+    optimizer_cls = OPTIMIZERS[name]
+    optimizer = PlanCache(optimizer_cls, capacity=plan_cache, catalogue=catalogue) if plan_cache else optimizer_cls()
+    if incremental:
+        optimizer = IncrementalPlanner(optimizer, full_every=incremental)
+    return optimizer
+
+
 class Scheduler:
-    def __init__(self):
+    def __init__(self, informer=True, bind=True, core_v1=None, gcp_options=None, metrics_port=None,
+                 profile_dir=None, repack_time=0, monitor_options=None,
+                 plan_cache=0, incremental=0, optimizer="CABFD"):
+        """
+        :param core_v1: 可注入的CoreV1Api, 供ClusterMonitor和Binder共用
+        :param gcp_options: 传给GCPMonitor的额外参数(如离线客户端、可用区、缓存路径)
+        :param monitor_options: 传给ClusterMonitor的额外参数(如raw, page_size)
+        :param optimizer: 规划新节点的优化器, OPTIMIZERS中的名字(CABFD或BatchBFD)
+        :param plan_cache: 大于0时在CABFD前加一层容量为该值的方案缓存
+        :param incremental: 大于0时在多轮之间保留新节点规划并只应用pending pod的变化, 每隔该轮数全量规划一次
+        :param metrics_port: 不为None时在本地该端口以Prometheus格式导出/metrics
+        :param profile_dir: 不为None时每轮schedule在cProfile下运行, 结果写入该目录的schedule-<轮次>.prof
+        :param repack_time: 大于0时对CABFD的新节点规划再做该时长(秒)的局部搜索
+        """
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
+        self.informer = informer
+        self.bind = bind
+        self.core_v1 = core_v1
+        self.gcp_options = gcp_options or {}
+        self.monitor_options = monitor_options or {}
+        self.plan_cache = plan_cache
+        self.incremental = incremental
+        self.optimizer = optimizer
+        self.metrics_port = metrics_port
+        self.profile_dir = profile_dir
+        self.repack_time = repack_time
+        self.cycle = 0
         self._setup()
 
     def _setup(self):
-        self.cabfd = CABFD()
-        self.cluster_monitor = ClusterMonitor()
-        self.gcp_monitor = GCPMonitor(project_id=os.getenv("GCP_PROJECT", default="single-cloud-ylxq"))
+        self.gcp_monitor = GCPMonitor(project_id=os.getenv("GCP_PROJECT", default="single-cloud-ylxq"),
+                                      **self.gcp_options)
+        self.cabfd = self._make_optimizer()
+        self.repacker = LocalSearch(time_limit=self.repack_time) if self.repack_time else None
+        self.cluster_monitor = ClusterMonitor(informer=self.informer, core_v1=self.core_v1, **self.monitor_options)
+        self.binder = Binder(core_v1=self.core_v1) if self.bind else None
+        self.metrics_server = metrics.serve(self.metrics_port) if self.metrics_port is not None else None
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+    def _make_optimizer(self):
+        return make_optimizer(self.optimizer, self.plan_cache, self.incremental, catalogue=self.gcp_monitor)
 
     def _get_available_nodes(self):
-        self.cluster_monitor.refresh()
-        ip2type = self.gcp_monitor.get_instance_type()
-        for k8s_node, node in self.cluster_monitor.node_cache:
+        """:return: 除master外的节点, 读取_schedule开始时refresh的快照"""
+        with metrics.phase("instance_type"):
+            ip2type = self.gcp_monitor.get_instance_type()
+        for node in self.cluster_monitor.node_cache:
             node.type = ip2type.get(node.internalIP, None)
         logging.info(f"调度器获取{datetime.today().strftime('%H:%M:%S')}时的集群内节点")
 
-        return [x for x in self.cluster_monitor.node_cache if x[1].name!="master"]
+        return [x for x in self.cluster_monitor.node_cache if x.name!="master"]
 
     def _get_pendding_pods(self):
-        self.cluster_monitor.refresh()
+        """:return: 待调度的pod, 读取_schedule开始时refresh的快照"""
         logging.info(f"调度器获取{datetime.today().strftime('%H:%M:%S')}时的pending pods")
         return self.cluster_monitor.pending_pods
 
+    def _build_node_index(self, nodes):
+        """
+        为Ready节点建立剩余资源索引, 已绑定到节点上且未结束的pod计入占用
+        使用缓存节点的副本, 避免在informer缓存上累积本轮的放置
+        """
+        open_nodes = {}
+        for node in nodes:
+            if node.status == "Ready":
+                open_nodes[node.name] = Node(node.name, {"type": node.type, "milli_cpu": node.milli_cpu,
+                                                         "ram_bytes": node.ram_bytes,
+                                                         "status": node.status, "InternalIP": node.internalIP})
+                for pod in self.cluster_monitor.pods_on(node.name):
+                    if pod.status not in ("Succeeded", "Failed"):
+                        open_nodes[node.name].add_pod(pod)
+        return NodeIndex(open_nodes.values())
+
     def schedule(self):
+        """
+        先按best-fit把pending pod放到已有的Ready节点上, 放不下的pod再交给CABFD规划新节点
+        每轮的总耗时记入metrics, 开启profile_dir时同时保存该轮的cProfile结果
+        :return: (放置到已有节点的[(Pod, node_name)], 新节点规划)
+        """
+        self.cycle += 1
+        profiler = cProfile.Profile() if self.profile_dir else None
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            return self._schedule()
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_dir, f"schedule-{self.cycle:05d}.prof"))
+            metrics.CYCLE_SECONDS.observe(time.perf_counter() - start)
+
+    def _schedule(self):
         logging.info(f"开始准备调度")
-        pendding_pods = [p[1] for p in self._get_pendding_pods()]
+        # 每轮只refresh一次: 非informer模式下每次refresh都会list全部节点和pod
+        with metrics.phase("refresh"):
+            self.cluster_monitor.refresh()
+        pendding_pods = [p for p in self._get_pendding_pods() if p.node is None]
         nodes = self._get_available_nodes()
-        logging.info(f"待调度节点如下：")
-        _ = [logging.info(x) for x in pendding_pods]
-        logging.info(f"已有节点如下：")
-        _ = [logging.info(x) for x in nodes]
+        metrics.CYCLE_PODS.observe(len(pendding_pods))
+        metrics.CYCLE_NODES.observe(len(nodes))
+        with metrics.phase("log"):
+            logging.info(f"待调度节点如下：")
+            _ = [logging.info(x) for x in pendding_pods]
+            logging.info(f"已有节点如下：")
+            _ = [logging.info(x) for x in nodes]
+
+        with metrics.phase("node_index"):
+            index = self._build_node_index(nodes)
+        return self._plan(pendding_pods, index)
+
+    @staticmethod
+    def _best_fit(pods, index):
+        """:return: (放置到已有节点的[(Pod, node_name)], 放不下的pod), 按RAM降序逐个best-fit"""
+        placements, unplaced = [], []
+        for pod in sorted(pods, key=lambda x: (-x.ram_bytes, -x.milli_cpu)):
+            node = index.best_fit(pod.milli_cpu, pod.ram_bytes)
+            if node is None:
+                unplaced.append(pod)
+                continue
+            index.place(node, pod)
+            placements.append((pod, node.name))
+        return placements, unplaced
+
+    def _bind(self, placements, index):
+        """
+        绑定放置方案, 未绑定成功的pod从方案中去掉并释放其在index中占用的资源
+        被其他调度器抢先绑定(conflict)的pod不再由本调度器处理, 其余失败的pod交给新节点规划
+        :return: (绑定成功的[(Pod, node_name)], 绑定失败的pod)
+        """
+        if not placements or not self.binder:
+            return placements, []
+        with metrics.phase("bind"):
+            results = self.binder.bind(placements)
+        bound, failed = [], []
+        for (pod, node_name), result in zip(placements, results):
+            if result["status"] == "bound":
+                bound.append((pod, node_name))
+                continue
+            index.release(node_name, pod)
+            if result["status"] != "conflict":
+                failed.append(pod)
+        if len(bound) < len(placements):
+            logging.info(f"{len(placements) - len(bound)}个pod绑定未成功, 其中{len(failed)}个交给新节点规划")
+        return bound, failed
+
+    def _plan(self, pendding_pods, index):
+        """
+        best-fit到已有节点并绑定, 放不下或绑定失败的pod规划新节点
+        :return: (放置到已有节点的[(Pod, node_name)], 新节点规划)
+        """
+        with metrics.phase("best_fit"):
+            placements, unplaced = self._best_fit(pendding_pods, index)
+        logging.info(f"{len(placements)}个pod放置到已有节点, {len(unplaced)}个pod需要新节点")
+
+        placements, failed = self._bind(placements, index)
+        unplaced += failed
 
-        if nodes == []:
-            result = self.cabfd.optimize(pendding_pods)
+        result = []
+        if unplaced:
+            with metrics.phase("optimize"):
+                result = self.cabfd.optimize(unplaced)
+            if self.repacker:
+                with metrics.phase("repack"):
+                    result = self.repacker.improve(result)
             self.cabfd.summary(result)
+        return placements, result
 
 
 
@@ -0,0 +1,133 @@
+import logging, queue, threading, time
+from collections import deque
+from cluster.Monitor import ClusterMonitor, SCHEDULER_NAME
+
+
+class SchedulerDaemon:
+    """
+    常驻调度器: 把Pending Pod的ADDED事件放入队列, 按debounce窗口和最大批大小
+    攒成micro-batch后交给优化器, 突发流量下不必每个pod都重新规划一次
+    """
+    def __init__(self, event_source=None, optimizer=None, parse_pod=None, on_plan=None,
+                 debounce=0.5, max_delay=2.0, max_batch=500, scheduler_name=SCHEDULER_NAME):
+        """
+        :param event_source: 产出watch事件({'type', 'object'})的可迭代对象, 默认监听集群的Pending Pod
+        :param optimizer: 提供optimize(pods)的优化器, 默认为CABFD
+        :param parse_pod: 把事件中的对象转换为Pod, 默认使用ClusterMonitor的解析
+        :param on_plan: 每个批次规划完成后的回调 on_plan(pods, schedule), 负责按方案创建节点/绑定pod;
+                        默认只用optimizer.summary记录方案, 守护进程本身不修改集群
+        :param debounce: 最后一个pod到达后再等待多久(秒)没有新pod就开始规划
+        :param max_delay: 批次中第一个pod最多等待多久(秒)
+        :param max_batch: 每批最多的pod数
+        :param scheduler_name: 只规划未绑定且schedulerName为该名字或未指定的pod
+        """
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.scheduler_name = scheduler_name
+        self.on_plan = on_plan or self._log_plan
+        self.queue = queue.Queue()
+        self.batch_sizes = deque(maxlen=100)
+        self.planned_pods = 0
+        self._stop = threading.Event()
+        self._setup(event_source, optimizer, parse_pod)
+
+    def _setup(self, event_source, optimizer, parse_pod):
+        if event_source is None or parse_pod is None:
+            from listening import pending_pod_events
+            monitor = ClusterMonitor()
+            event_source = event_source if event_source is not None else pending_pod_events(monitor.core_v1)
+            parse_pod = parse_pod or monitor._parse_pod
+        if optimizer is None:
+            from optimizer.CABFD import CABFD
+            optimizer = CABFD()
+        self.event_source = event_source
+        self.optimizer = optimizer
+        self.parse_pod = parse_pod
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    @property
+    def last_batch_size(self):
+        return self.batch_sizes[-1] if self.batch_sizes else 0
+
+    def _consume_events(self):
+        """生产者线程: 事件流结束后放入None通知调度循环退出"""
+        try:
+            for event in self.event_source:
+                if self._stop.is_set():
+                    break
+                if event['type'] != 'ADDED':
+                    continue
+                try:
+                    pod = self.parse_pod(event['object'])
+                except Exception as e:
+                    logging.error(f"解析Pending Pod失败: {e}")
+                    continue
+                if pod.node is None and pod.scheduler in (None, self.scheduler_name):
+                    self.queue.put(pod)
+        finally:
+            self.queue.put(None)
+
+    def _next_batch(self):
+        """
+        阻塞直到有pod到达, 之后持续收集直到debounce窗口内没有新pod、
+        达到max_delay或max_batch
+        :return: (批次, 事件流是否已结束)
+        """
+        first = self.queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = min(self.debounce, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                pod = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if pod is None:
+                return batch, True
+            batch.append(pod)
+        return batch, False
+
+    def run(self):
+        """调度循环, 事件流结束或调用stop()后返回"""
+        threading.Thread(target=self._consume_events, daemon=True).start()
+        logging.info(f"调度器启动, debounce={self.debounce}s, max_batch={self.max_batch}")
+        finished = False
+        while not finished and not self._stop.is_set():
+            batch, finished = self._next_batch()
+            if batch:
+                self._plan(batch)
+
+    def _plan(self, batch):
+        schedule = self.optimizer.optimize(batch)
+        self.batch_sizes.append(len(batch))
+        self.planned_pods += len(batch)
+        logging.info(f"规划{len(batch)}个pod, 需要{len(schedule)}个节点, 队列中还有{self.queue_depth}个pod")
+        self.on_plan(batch, schedule)
+
+    def _log_plan(self, batch, schedule):
+        self.optimizer.summary(schedule)
+
+    def stop(self):
+        self._stop.set()
+        self.queue.put(None)
+
+
+if __name__=="__main__":
+    daemon = SchedulerDaemon()
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop()
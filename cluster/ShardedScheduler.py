@@ -0,0 +1,191 @@
+import logging, time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from cluster.Scheduler import Scheduler, make_optimizer
+from cluster.NodeIndex import NodeIndex
+from optimizer.LocalSearch import LocalSearch
+from pricing_model.PricingCatalogue import PricingCatalogue
+from utils.resources import Pod, Node
+from utils import metrics
+
+# 工作进程内的状态, 由_init_worker在进程启动时建立一次
+_worker = {}
+
+
+def _init_worker(optimizer, plan_cache, incremental, repack_time):
+    logging.disable(logging.INFO)
+    flavors = PricingCatalogue.load().flavor_index.all_flavors
+    _worker["options"] = (optimizer, plan_cache, incremental)
+    _worker["catalogue"] = SimpleNamespace(catalogue_version=None)
+    _worker["optimizers"] = {}
+    _worker["spill"] = make_optimizer(optimizer)
+    _worker["repacker"] = LocalSearch(time_limit=repack_time) if repack_time else None
+    _worker["position"] = {(x["type"], x.get("zone")): i for i, x in enumerate(flavors)}
+
+
+def _key(pod):
+    # 增量规划保留的是之前轮次的Pod对象, 按名字而不是对象对应到本轮的下标
+    return pod.name if pod.name is not None else id(pod)
+
+
+def _new_nodes(optimizer, pods, keys):
+    """:return: [(机型在完整目录中的位置, [pod下标])], pod按keys找回下标"""
+    schedule = optimizer.optimize(pods)
+    if _worker["repacker"]:
+        schedule = _worker["repacker"].improve(schedule)
+    return [(_worker["position"][(x.type, x.zone)], [keys[_key(p)] for p in x.pods]) for x in schedule]
+
+
+def _plan_shard(shard, version, free_cpu, free_ram, names, cpu, ram):
+    """
+    在工作进程中规划一个分片, 输入和输出都是紧凑的数组而不是Node/Pod对象
+    :param version: 父进程GCPMonitor的catalogue_version, 供分片的方案缓存判断目录是否变化
+    :param free_cpu, free_ram: 已有节点剩余资源的快照(整数毫核/字节), 节点以在快照中的位置表示
+    :param names, cpu, ram: 分片中pod的名字和请求
+    :return: (best-fit的pod下标顺序, 每个pod放置的快照位置(-1为需要新节点), 新节点规划, 耗时)
+    """
+    start = time.perf_counter()
+    _worker["catalogue"].catalogue_version = version
+    view = NodeIndex(Node(i, {"milli_cpu": c, "ram_bytes": r}) for i, (c, r) in enumerate(zip(free_cpu, free_ram)))
+    pods = [Pod.record(name, shard, None, None, c, r) for name, c, r in zip(names, cpu, ram)]
+    order = array('q', sorted(range(len(pods)), key=lambda i: (-ram[i], -cpu[i])))
+    target = array('q', [-1]) * len(pods)
+    unplaced = []
+    for i in order:
+        node = view.best_fit(cpu[i], ram[i])
+        if node is None:
+            unplaced.append(pods[i])
+            continue
+        view.place(node, pods[i])
+        target[i] = node.name
+
+    plan = []
+    if unplaced:
+        if shard not in _worker["optimizers"]:
+            _worker["optimizers"][shard] = make_optimizer(*_worker["options"], catalogue=_worker["catalogue"])
+        plan = _new_nodes(_worker["optimizers"][shard], unplaced, {_key(x): i for i, x in enumerate(pods)})
+    return order, target, plan, time.perf_counter() - start
+
+
+def _plan_spill(shard, names, cpu, ram):
+    """为reserve冲突后仍放不下或绑定失败的pod规划新节点, 使用无状态的优化器, 不影响分片的增量规划"""
+    pods = [Pod.record(name, shard, None, None, c, r) for name, c, r in zip(names, cpu, ram)]
+    return _new_nodes(_worker["spill"], pods, {_key(x): i for i, x in enumerate(pods)})
+
+
+class ShardedScheduler(Scheduler):
+    """
+    多namespace调度: pending pod按namespace分片, 各分片在工作进程中并行规划
+        1. 在已有节点剩余资源的快照上best-fit, 放不下的pod由该分片的优化器规划新节点
+           (每个分片固定在一个工作进程上, 增量规划、方案缓存等状态保存在该进程中)
+        2. 父进程按各分片的best-fit顺序在共享的NodeIndex上逐个reserve, 剩余资源已被其他分片占用时为冲突,
+           冲突的pod对最新的剩余资源重新best-fit, 仍放不下的再交回工作进程规划新节点
+    快照和pod只以名字列表和整数毫核/字节数组传给工作进程, 返回快照位置和机型位置;
+    所有分片完成后统一绑定, 绑定失败的pod同样交回所在分片的工作进程规划新节点
+    """
+    def __init__(self, namespaces=("default",), workers=4, **options):
+        """
+        :param namespaces: 调度的namespace列表, None为所有namespace
+        :param workers: 并行规划分片的进程数
+        :param options: 传给Scheduler的其他参数
+        """
+        self.namespaces = namespaces
+        self.workers = workers
+        monitor_options = dict(options.pop("monitor_options", None) or {})
+        monitor_options["namespace"] = list(namespaces) if namespaces is not None else None
+        super().__init__(monitor_options=monitor_options, **options)
+
+    def _setup(self):
+        super()._setup()
+        self.flavors = PricingCatalogue.load().flavor_index.all_flavors
+        self.pools = [None] * self.workers
+        self.shard_slot = {}
+        self.last_shards = {}
+
+    def _pool_for(self, shard):
+        """:return: 分片固定使用的单进程池, 分片按出现顺序轮流分配到各进程"""
+        slot = self.shard_slot.setdefault(shard, len(self.shard_slot) % self.workers)
+        if self.pools[slot] is None:
+            self.pools[slot] = ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                                   initargs=(self.optimizer, self.plan_cache, self.incremental,
+                                                             self.repack_time))
+        return self.pools[slot]
+
+    def close(self):
+        for pool in self.pools:
+            if pool is not None:
+                pool.shutdown()
+        self.pools = [None] * self.workers
+
+    def _plan(self, pendding_pods, index):
+        shards = {}
+        for pod in pendding_pods:
+            shards.setdefault(pod.namespace, []).append(pod)
+        snapshot = index.snapshot()
+        names = [x[0] for x in snapshot]
+        free_cpu, free_ram = array('q', (x[1] for x in snapshot)), array('q', (x[2] for x in snapshot))
+        version = self.gcp_monitor.catalogue_version
+
+        with metrics.phase("shards"):
+            futures = {x: self._pool_for(x).submit(_plan_shard, x, version, free_cpu, free_ram, [p.name for p in pods],
+                                                   array('q', (p.milli_cpu for p in pods)),
+                                                   array('q', (p.ram_bytes for p in pods)))
+                       for x, pods in shards.items()}
+            results = {x: self._commit(x, shards[x], names, index, *future.result()) for x, future in futures.items()}
+
+        placements, result = [], []
+        for shard, (shard_placements, shard_result, conflicts, elapsed) in results.items():
+            placements += shard_placements
+            result += shard_result
+            logging.info(f"分片{shard}: {len(shards[shard])}个pod, 放置到已有节点{len(shard_placements)}个, "
+                         f"冲突{conflicts}次, 新节点{len(shard_result)}个, 耗时{elapsed:.3f}s")
+        self.last_shards = {x: (len(shards[x]), len(results[x][0]), results[x][2]) for x in shards}
+
+        placements, failed = self._bind(placements, index)
+        if failed:
+            by_shard = {}
+            for pod in failed:
+                by_shard.setdefault(pod.namespace, []).append(pod)
+            for shard, pods in by_shard.items():
+                result += self._spill(shard, pods)
+        if result:
+            self.cabfd.summary(result)
+        return placements, result
+
+    def _commit(self, shard, pods, names, index, order, target, plan, elapsed):
+        """
+        按工作进程的best-fit顺序在共享的NodeIndex上reserve, 这是父进程中唯一的规划步骤
+        :return: (放置到已有节点的[(Pod, node_name)], 新节点规划, 冲突次数, 工作进程耗时)
+        """
+        placements, retry, spill = [], [], []
+        for i in order:
+            if target[i] < 0:
+                continue
+            if index.reserve(names[target[i]], pods[i]):
+                placements.append((pods[i], names[target[i]]))
+            else:
+                retry.append(pods[i])
+        for pod in retry:
+            node = index.reserve_best_fit(pod)
+            if node is None:
+                spill.append(pod)
+            else:
+                placements.append((pod, node.name))
+        if retry:
+            metrics.SHARD_CONFLICTS.inc(len(retry), shard=shard)
+
+        result = self._nodes(pods, plan)
+        if spill:
+            result += self._spill(shard, spill)
+        return placements, result, len(retry), elapsed
+
+    def _spill(self, shard, pods):
+        """:return: 在分片的工作进程中用无状态优化器为pods规划的新节点"""
+        plan = self._pool_for(shard).submit(_plan_spill, shard, [x.name for x in pods],
+                                            array('q', (x.milli_cpu for x in pods)),
+                                            array('q', (x.ram_bytes for x in pods))).result()
+        return self._nodes(pods, plan)
+
+    def _nodes(self, pods, plan):
+        return [Node("created", self.flavors[k], pods=[pods[i] for i in members]) for k, members in plan]
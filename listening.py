@@ -3,14 +3,6 @@ from datetime import datetime
 import logging
 import sys,time
 
-# 配置日志
-logging.basicConfig(
-    stream=sys.stdout,
-    format='%(asctime)s - %(levelname)s: %(message)s',
-    level=logging.INFO
-)
-
-
 def watch_pending_pods():
     # 初始化客户端
     try:
@@ -23,6 +15,14 @@ def watch_pending_pods():
         return
 
     v1 = client.CoreV1Api()
+    for event in pending_pod_events(v1):
+        # 只处理ADDED事件
+        if event['type'] == 'ADDED':
+            print_pod_info(event['object'])
+
+
+def pending_pod_events(v1):
+    """持续产出Pending Pod的watch事件, 断开后从最新resourceVersion重连"""
     w = watch.Watch()
     resource_version = '0'
 
@@ -41,10 +41,7 @@ def watch_pending_pods():
             for event in stream:
                 pod = event['object']
                 resource_version = pod.metadata.resource_version
-
-                # 只处理ADDED事件
-                if event['type'] == 'ADDED':
-                    print_pod_info(pod)
+                yield event
 
         except Exception as e:
             logging.error(f"监听中断，5秒后重试... 错误: {str(e)}")
@@ -80,6 +77,12 @@ def print_pod_info(pod):
 
 
 if __name__ == "__main__":
+    # 只在作为脚本运行时配置日志, 被SchedulerDaemon等导入时不改动调用方的日志配置
+    logging.basicConfig(
+        stream=sys.stdout,
+        format='%(asctime)s - %(levelname)s: %(message)s',
+        level=logging.INFO
+    )
     logging.info("启动Pending Pod监控器")
     try:
         watch_pending_pods()
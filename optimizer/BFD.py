@@ -1,78 +1,60 @@
-import logging, json, os
+import logging, os, time
 from utils.resources import Pod,Node
+from optimizer.Optimizer import Optimizer
+from utils import metrics
 
-class BFD:
-    def __init__(self):
+class BFD(Optimizer):
+    def __init__(self, pricing_path=None, sort_key=None):
+        """
+        :param sort_key: pod的放置顺序, 默认按RAM降序
+        """
         logging.basicConfig(
             level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
         )
-        self._load_pricing_model()
+        self.sort_key = sort_key or (lambda x: -x.ram_bytes)
+        self._load_pricing_model(pricing_path)
 
-    def _load_pricing_model(self):
-        try:
-            with open("../data/pricing.json", 'r') as fp:
-                self.gcp_pricing = json.load(fp)['gcp']
-                logging.info("Initializing Pricing Model from GCP")
-        except Exception as e:
-            logging.error(e)
-            raise
-
-    def optimize(self, pods):
-        sorted_pods = sorted(pods, key=lambda x:-x.memory)
+    @metrics.optimizer
+    def optimize(self, pods, deadline=None):
+        """:param deadline: time.time()的截止时间, 超过时抛出TimeoutError"""
+        sorted_pods = sorted(pods, key=self.sort_key)
 
         schedule = []
         for pod in sorted_pods:
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError("BFD超过截止时间")
             candidates = []
             best = None
             candidates = self._find_in_existing_nodes(schedule, pod)
             if candidates != []:
                 best = self._get_node_least_ram(candidates, flag=True)
                 if best is not None:
-                    best.pods.append(pod)
+                    best.add_pod(pod)
                     continue
 
             candidates = self._find_possible_types(pod)
             best = self._get_node_least_ram(candidates)
             best.name = "created"
-            best.pods.append(pod)
+            best.add_pod(pod)
             schedule.append(best)
 
         return schedule
 
     def _find_in_existing_nodes(self, nodes, pod):
-        request_cpu, request_ram = pod.cpu, pod.memory
+        request_cpu, request_ram = pod.milli_cpu, pod.ram_bytes
 
         return [n for n in nodes
-                if n.available_cpu >= request_cpu and n.availbale_memory >= request_ram]
+                if n.milli_cpu - n.used_milli_cpu >= request_cpu and n.ram_bytes - n.used_ram_bytes >= request_ram]
 
     def _find_possible_types(self, pod:Pod):
-        return [Node("not-created", x)
-                for x in self.gcp_pricing
-                if x["CPU"]>=pod.cpu and x["RAM"]>=pod.memory]
+        return [Node("not-created", x) for x in self.flavor_index.fit(pod.cpu, pod.memory)]
 
     def _get_node_least_ram(self, nodes, flag=False):
         if flag:
-            return min(nodes, key=lambda x:(x.availbale_memory,))
-        return min(nodes, key=lambda x:(x.availbale_memory,x.price))
-
-    def summary(self, schedule):
-        cnt = 0
-        tot_price = 0
-        for node in schedule:
-            cnt +=1
-            type = node.type
-            price = node.price
-            tot_price += price
-            vcpu, ram = node.cpu, node.memory
-            pods = [(pod.cpu, pod.memory) for pod in node.pods]
-            logging.info(f"创建节点{cnt}, 类型为{type}, 价格为{price}, 配置为{vcpu} vCPU和{ram}G RAM"
-                         f"\n\t 部署的pod为 {pods}"
-                         f"\n\t 占用CPU{node.occupied_cpu}个, 占用Memory{node.occupied_memory}G"
-                         f"\n\t CPU占用率{100*node.occupied_cpu/vcpu:.2f}%, Memory占用率{100*node.occupied_memory/ram:.2f}%")
-        logging.info(f"总价为{tot_price}")
-
+            return min(nodes, key=lambda x:(x.ram_bytes - x.used_ram_bytes,))
+        return min(nodes, key=lambda x:(x.ram_bytes - x.used_ram_bytes,x.price))
 
 
 if __name__=="__main__":
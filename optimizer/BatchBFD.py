@@ -0,0 +1,145 @@
+import logging
+from collections import defaultdict
+from utils.resources import Pod, Node, GiB, to_millis, to_bytes
+from optimizer.Optimizer import Optimizer
+from utils import metrics
+
+
+class _Group:
+    """同一机型、同一部署组合的count个节点, 整组放置, 直到最后才展开成Node; 资源为整数毫核/字节"""
+    __slots__ = ("flavor", "cpu", "ram", "used_cpu", "used_ram", "shapes", "count")
+
+    def __init__(self, flavor, used_cpu=0, used_ram=0, shapes=None, count=1):
+        self.flavor = flavor
+        self.cpu, self.ram = to_millis(flavor["CPU"]), to_bytes(flavor["RAM"])
+        self.used_cpu = used_cpu
+        self.used_ram = used_ram
+        self.shapes = shapes if shapes else {}
+        self.count = count
+
+    def split(self, count):
+        """从本组分出count个节点成为新组"""
+        self.count -= count
+        return _Group(self.flavor, self.used_cpu, self.used_ram, dict(self.shapes), count)
+
+    def place(self, shape, k):
+        """每个节点再放置k个shape的pod"""
+        self.used_cpu += k * shape[0]
+        self.used_ram += k * shape[1]
+        self.shapes[shape] = self.shapes.get(shape, 0) + k
+
+
+class BatchBFD(Optimizer):
+    """
+    按shape class批量装箱的BFD
+    pending pod先按(毫核, 字节)归类并计数, 以"这个机型能放k个副本"为单位整类放置,
+    规划开销只与shape数量有关, 最后才展开为逐个pod的分配
+    """
+    def __init__(self, pricing_path=None):
+        logging.basicConfig(
+            level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
+        )
+        self._load_pricing_model(pricing_path)
+
+    @metrics.optimizer
+    def optimize(self, pods):
+        buckets = self._group_by_shape(pods)
+        logging.info(f"{len(pods)}个pod归为{len(buckets)}个shape class")
+
+        groups = []
+        for shape in sorted(buckets, key=lambda x: (-x[1], -x[0])):
+            remaining = self._fill_existing_groups(groups, shape, len(buckets[shape]))
+            if remaining:
+                groups += self._open_groups(shape, remaining)
+
+        return self._expand(groups, buckets)
+
+    def _group_by_shape(self, pods):
+        buckets = defaultdict(list)
+        for pod in pods:
+            buckets[(pod.milli_cpu, pod.ram_bytes)].append(pod)
+        return buckets
+
+    @staticmethod
+    def _fit_count(avai_cpu, avai_ram, shape):
+        """一个节点剩余资源还能放几个该shape的pod"""
+        cpu, ram = shape
+        k_cpu = avai_cpu // cpu if cpu > 0 else float("inf")
+        k_ram = avai_ram // ram if ram > 0 else float("inf")
+        return min(k_cpu, k_ram)
+
+    def _fill_existing_groups(self, groups, shape, remaining):
+        """按剩余RAM、CPU从少到多(best-fit)把shape填进已开启的节点组"""
+        for group in sorted(groups, key=lambda x: (x.ram - x.used_ram, x.cpu - x.used_cpu)):
+            k = self._fit_count(group.cpu - group.used_cpu, group.ram - group.used_ram, shape)
+            if k <= 0:
+                continue
+            k = min(k, remaining)
+            if k * group.count <= remaining:
+                group.place(shape, k)
+                remaining -= k * group.count
+            else:
+                full, rest = divmod(remaining, k)
+                if full:
+                    groups.append(group.split(full))
+                    groups[-1].place(shape, k)
+                if rest:
+                    groups.append(group.split(1))
+                    groups[-1].place(shape, rest)
+                remaining = 0
+            if remaining == 0:
+                break
+        return remaining
+
+    def _open_groups(self, shape, remaining):
+        """
+        整节点选单副本价格最低的机型, 余下不足一整节点的副本选能容纳它们的最便宜机型
+        :return: 新开启的节点组
+        """
+        cpu, ram = shape[0] / 1000, shape[1] / GiB
+        candidates = [(x, self._fit_count(to_millis(x["CPU"]), to_bytes(x["RAM"]), shape))
+                      for x in self.flavor_index.fit(cpu, ram)]
+        if candidates == []:
+            raise ValueError(f"没有机型可以容纳pod (CPU={cpu}, RAM={ram})")
+        candidates = [(x, min(k, remaining)) for x, k in candidates]
+
+        flavor, k = min(candidates, key=lambda x: (x[0]["price"] / x[1], x[0]["price"]))
+        full, rest = divmod(remaining, k)
+        groups = []
+        if full:
+            groups.append(_Group(flavor, count=full))
+            groups[-1].place(shape, k)
+        if rest:
+            flavor, _ = min([x for x in candidates if x[1] >= rest], key=lambda x: x[0]["price"])
+            groups.append(_Group(flavor))
+            groups[-1].place(shape, rest)
+        return groups
+
+    def _expand(self, groups, buckets):
+        schedule = []
+        for group in groups:
+            for _ in range(group.count):
+                node = Node("created", group.flavor)
+                for shape, k in group.shapes.items():
+                    for _ in range(k):
+                        node.add_pod(buckets[shape].pop())
+                schedule.append(node)
+        return schedule
+
+
+if __name__=="__main__":
+    bbfd = BatchBFD()
+    request1 = {"CPU": 0.7, "RAM": 0.2}
+    request2 = {"CPU": 1, "RAM": 0.7}
+    request3 = {"CPU": 0.1, "RAM": 1}
+    request4 = {"CPU": 0.2, "RAM": 0.9}
+    setup = [20, 20, 40, 5]
+    requests = [request1, request2, request3, request4]
+    pods = []
+    for i, s in zip(setup, requests):
+        for _ in range(i):
+            pods.append(Pod(s))
+    result = bbfd.optimize(pods)
+    bbfd.summary(result)
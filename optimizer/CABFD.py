@@ -1,27 +1,29 @@
 from utils.resources import Pod, Node
-from pricing_model.Monitor import GCPMonitor
-import logging, os, json
+from optimizer.Optimizer import Optimizer
+from optimizer.PackingEngine import PackingEngine
+from utils import metrics
+import logging, os
 
-class CABFD:
-    def __init__(self):
+class CABFD(Optimizer):
+    def __init__(self, vectorized=True, pricing_path=None):
         logging.basicConfig(
             level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
         )
-        self._load_pricing_model()
-
-    def _load_pricing_model(self):
-        try:
-            with open("../data/pricing.json", 'r') as fp:
-                self.gcp_pricing = json.load(fp)['gcp']
-                logging.info("Initializing Pricing Model from GCP")
-        except Exception as e:
-            logging.error(e)
-            raise
+        self.vectorized = vectorized
+        self._load_pricing_model(pricing_path)
+        self.engine = PackingEngine(self.flavor_index.flavors, all_flavors=self.flavor_index.all_flavors)
 
+    @metrics.optimizer
     def optimize(self, pods):
-        sorted_pods = sorted(pods, key=lambda x:(-x.memory, -x.cpu))
+        if self.vectorized:
+            return self.engine.pack(pods)
+        return self._optimize_greedy(pods)
+
+    def _optimize_greedy(self, pods):
+        """逐个候选节点打分的原始实现, 作为向量化内核的参照"""
+        sorted_pods = sorted(pods, key=lambda x:(-x.ram_bytes, -x.milli_cpu))
 
         schedule = []
         for pod in sorted_pods:
@@ -29,7 +31,7 @@ class CABFD:
             candidates = self._find_in_existing_nodes(schedule, pod)
             candidates += self._find_possible_types(pod)
             best = self._find_best(candidates, pod)
-            best.pods.append(pod)
+            best.add_pod(pod)
             if best in schedule:
                 continue
             schedule.append(best)
@@ -38,32 +40,14 @@ class CABFD:
 
         return schedule
 
-    def summary(self, schedule):
-        cnt = 0
-        tot_price = 0
-        for node in schedule:
-            cnt +=1
-            type = node.type
-            price = node.price
-            tot_price += price
-            vcpu, ram = node.cpu, node.memory
-            pods = [(pod.cpu, pod.memory) for pod in node.pods]
-            logging.info(f"创建节点{cnt}, 类型为{type}, 价格为{price}, 配置为{vcpu} vCPU和{ram}G RAM"
-                         f"\n\t 部署的pod为 {pods}"
-                         f"\n\t 占用CPU{node.occupied_cpu}个, 占用Memory{node.occupied_memory}G"
-                         f"\n\t CPU占用率{100*node.occupied_cpu/vcpu:.2f}%, Memory占用率{100*node.occupied_memory/ram:.2f}%")
-        logging.info(f"总价为{tot_price}")
     def _find_in_existing_nodes(self, nodes, pod):
-        request_cpu, request_ram = pod.cpu, pod.memory
+        request_cpu, request_ram = pod.milli_cpu, pod.ram_bytes
 
         return [n for n in nodes
-                if n.available_cpu >= request_cpu and n.availbale_memory >= request_ram]
+                if n.milli_cpu - n.used_milli_cpu >= request_cpu and n.ram_bytes - n.used_ram_bytes >= request_ram]
 
     def _find_possible_types(self, pod:Pod):
-        cnt = 0
-        return [Node("not-created", x)
-                for x in self.gcp_pricing
-                if x["CPU"]>=pod.cpu and x["RAM"]>=pod.memory]
+        return [Node("not-created", x) for x in self.flavor_index.fit(pod.cpu, pod.memory)]
 
     def _find_best(self, nodes, pod):
         best = max(nodes, key=lambda x: self._score(x, pod, nodes))
@@ -76,9 +60,11 @@ class CABFD:
         avai_cpu, avai_ram = node.available_cpu, node.availbale_memory
         ram_util = 1-(avai_cpu - pod.cpu)/node.cpu
         cpu_util = 1-(avai_ram - pod.memory)/node.memory
-        price = 1 - (node.price / max(x.price for x in candidates))
+        # 候选机型来自剪枝后的索引, 归一化的最高价仍按完整目录计算
+        max_price = max(max(x.price for x in candidates), self.flavor_index.max_price(pod.cpu, pod.memory))
+        price = 1 - (node.price / max_price)
         if node.name == "created":
-            price = 1 - (0 / max(x.price for x in candidates))
+            price = 1 - (0 / max_price)
 
         return 1*ram_util + 1*cpu_util + 0.5 * price
 
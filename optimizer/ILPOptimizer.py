@@ -0,0 +1,174 @@
+import logging, time
+from optimizer.CABFD import CABFD
+from utils.resources import Node
+from utils import metrics
+
+CPU_SCALE = 1000        # 毫核
+RAM_SCALE = 2**20       # KiB
+PRICE_SCALE = 10**6     # 百万分之一美元
+
+
+class ILPOptimizer:
+    """
+    optimizer/README.md中二维装箱ILP的求解后端, 扩展为同时为每个节点选择机型并最小化总价:
+        x_ij: pod i是否放在节点槽位j, z_jf: 槽位j是否使用机型f
+        min sum_jf price_f * z_jf
+        s.t. sum_j x_ij = 1, sum_f z_jf <= 1,
+             sum_i cpu_i * x_ij <= sum_f CPU_f * z_jf, sum_i ram_i * x_ij <= sum_f RAM_f * z_jf
+    相同(CPU, RAM)的pod合并为一类, x_sj为第s类pod放在槽位j的个数
+    初始解(hint)取CABFD方案与"最大机型first-fit decreasing"方案中较便宜的一个, 其节点数即槽位数上界,
+    因此gap是相对该槽位上界的模型而言; 用OR-Tools CP-SAT在time_limit内求解,
+    求解器不可用、超时无解或没有改进时直接返回初始解
+    """
+    def __init__(self, time_limit=2.0, workers=8, max_pods=500, max_variables=50_000, pricing_path=None):
+        """
+        :param time_limit: 整个optimize的时间预算(秒, 含初始解和建模), 到时返回当前最好的可行解
+        :param workers: CP-SAT的搜索线程数
+        :param max_pods: 超过该数量的批次不建模, 直接使用CABFD的方案
+        :param max_variables: pod类数×槽位数超过该值时不建模(建模本身就会超出时间预算), 直接使用初始解
+        """
+        logging.basicConfig(
+            level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
+        )
+        self.time_limit = time_limit
+        self.workers = workers
+        self.max_pods = max_pods
+        self.max_variables = max_variables
+        self.cabfd = CABFD(pricing_path=pricing_path)
+        self.flavor_index = self.cabfd.flavor_index
+        self.last_status = None
+        self.last_gap = None
+
+    @metrics.optimizer
+    def optimize(self, pods):
+        deadline = time.perf_counter() + self.time_limit
+        warm = self.cabfd.optimize(pods)
+        self.last_status, self.last_gap = "CABFD", None
+        if not pods or len(pods) > self.max_pods:
+            return warm
+        ffd = self._first_fit_largest(pods)
+        if sum(x.price for x in ffd) < sum(x.price for x in warm):
+            warm, self.last_status = ffd, "FFD"
+        try:
+            from ortools.sat.python import cp_model
+        except ImportError:
+            logging.warning("未安装ortools, ILPOptimizer只返回初始解")
+            return warm
+        return self._solve(cp_model, pods, warm, deadline)
+
+    def summary(self, schedule):
+        self.cabfd.summary(schedule)
+
+    def _first_fit_largest(self, pods):
+        """按RAM降序first-fit, 新节点使用CPU最大的机型, 放不下时用能容纳该pod的最便宜机型"""
+        largest = self.flavor_index.flavors[-1]
+        schedule = []
+        for pod in sorted(pods, key=lambda x: (-x.ram_bytes, -x.milli_cpu)):
+            node = next((x for x in schedule if x.fits(pod)), None)
+            if node is None:
+                fits = largest["CPU"] >= pod.cpu and largest["RAM"] >= pod.memory
+                flavor = largest if fits else min(self.flavor_index.fit(pod.cpu, pod.memory), key=lambda x: x["price"])
+                node = Node("created", flavor)
+                schedule.append(node)
+            node.add_pod(pod)
+        return schedule
+
+    def _solve(self, cp_model, pods, warm, deadline):
+        flavors = self.flavor_index.flavors
+        shapes = {}
+        for pod in pods:
+            shapes.setdefault((pod.cpu, pod.memory), []).append(pod)
+        groups = list(shapes.values())
+        if len(groups) * len(warm) > self.max_variables:
+            logging.info(f"{len(groups)}类pod×{len(warm)}个槽位超过建模上限, 使用初始解")
+            return warm
+        # 按毫核/KiB取整, 与初始解的可行性一致(向上取整会让装满的节点在整数模型中超载, hint失效)
+        cpu = [round(x[0].cpu * CPU_SCALE) for x in groups]
+        ram = [round(x[0].memory * RAM_SCALE) for x in groups]
+        count = [len(x) for x in groups]
+        f_cpu = [round(x["CPU"] * CPU_SCALE) for x in flavors]
+        f_ram = [round(x["RAM"] * RAM_SCALE) for x in flavors]
+        f_price = [round(x["price"] * PRICE_SCALE) for x in flavors]
+        slots, S, F = range(len(warm)), range(len(groups)), range(len(flavors))
+
+        model = cp_model.CpModel()
+        x = [[model.NewBoolVar(f"x{s}_{j}") if count[s] == 1 else model.NewIntVar(0, count[s], f"x{s}_{j}")
+              for j in slots] for s in S]
+        z = [[model.NewBoolVar(f"z{j}_{f}") for f in F] for j in slots]
+        for s in S:
+            model.Add(sum(x[s]) == count[s])
+        for j in slots:
+            model.AddAtMostOne(z[j])
+            # 放了pod的槽位必须选一个机型(零请求的pod不受容量约束, 否则可以放在没有机型的槽位上)
+            for s in S:
+                model.Add(x[s][j] <= count[s] * sum(z[j]))
+            model.Add(sum(cpu[s] * x[s][j] for s in S) <= sum(f_cpu[f] * z[j][f] for f in F))
+            model.Add(sum(ram[s] * x[s][j] for s in S) <= sum(f_ram[f] * z[j][f] for f in F))
+            if j:
+                # 使用的槽位排在前面, 消除空槽位之间的对称
+                model.Add(sum(z[j]) <= sum(z[j - 1]))
+        # 冗余的总容量约束, 收紧下界
+        model.Add(sum(f_cpu[f] * z[j][f] for j in slots for f in F) >= sum(c * n for c, n in zip(cpu, count)))
+        model.Add(sum(f_ram[f] * z[j][f] for j in slots for f in F) >= sum(r * n for r, n in zip(ram, count)))
+        model.Minimize(sum(f_price[f] * z[j][f] for j in slots for f in F))
+        self._hint(model, x, z, groups, warm)
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(deadline - time.perf_counter(), 0.05)
+        solver.parameters.num_workers = self.workers
+        start = time.perf_counter()
+        status = solver.Solve(model)
+        elapsed = time.perf_counter() - start
+
+        warm_price = sum(x.price for x in warm)
+        self.last_status = solver.StatusName(status)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            logging.info(f"ILP在{elapsed:.2f}s内没有找到可行解({self.last_status}), 使用CABFD方案")
+            return warm
+        objective, bound = solver.ObjectiveValue(), solver.BestObjectiveBound()
+        # 目标为0时(没有节点)gap没有意义, 记为0
+        self.last_gap = 0.0 if status == cp_model.OPTIMAL or not objective else (objective - bound) / objective
+        logging.info(f"ILP {self.last_status}: 总价{objective / PRICE_SCALE:.6f} (初始解{warm_price:.6f}), "
+                     f"下界{bound / PRICE_SCALE:.6f}, gap {self.last_gap:.2%}, {len(groups)}类pod/{len(warm)}个槽位, "
+                     f"耗时{elapsed:.2f}s")
+        if objective / PRICE_SCALE >= warm_price:
+            return warm
+
+        schedule, remaining = [], [list(x) for x in groups]
+        for j in slots:
+            chosen = [f for f in F if solver.BooleanValue(z[j][f])]
+            if chosen:
+                node = Node("created", flavors[chosen[0]])
+                for s in S:
+                    for _ in range(solver.Value(x[s][j])):
+                        node.add_pod(remaining[s].pop())
+                schedule.append(node)
+        # 取整误差可能让节点在原始数值下略微超载, 此时放弃ILP的解
+        if any(x.free_milli_cpu < 0 or x.free_ram_bytes < 0 for x in schedule):
+            logging.warning("ILP方案在取整前的资源数值下超载, 使用CABFD方案")
+            return warm
+        return schedule
+
+    def _hint(self, model, x, z, groups, warm):
+        """把初始解写成完整的hint: 第j个节点对应槽位j"""
+        flavor_of = {(x["type"], x.get("zone")): f for f, x in enumerate(self.flavor_index.flavors)}
+        for j, node in enumerate(warm):
+            chosen = flavor_of.get((node.type, node.zone))
+            for f in range(len(z[j])):
+                model.AddHint(z[j][f], f == chosen)
+            placed = {}
+            for pod in node.pods:
+                placed[(pod.cpu, pod.memory)] = placed.get((pod.cpu, pod.memory), 0) + 1
+            for s, group in enumerate(groups):
+                model.AddHint(x[s][j], placed.get((group[0].cpu, group[0].memory), 0))
+
+
+if __name__ == "__main__":
+    import random
+    from utils.resources import Pod
+    rnd = random.Random(0)
+    pods = [Pod({"CPU": round(rnd.uniform(0.1, 2), 1), "RAM": round(rnd.uniform(0.25, 6), 2)}) for _ in range(200)]
+    ilp = ILPOptimizer(time_limit=5)
+    ilp.summary(ilp.optimize(pods))
@@ -0,0 +1,138 @@
+import logging
+from cluster.NodeIndex import NodeIndex
+from optimizer.CABFD import CABFD
+from pricing_model.PricingCatalogue import PricingCatalogue
+from utils import metrics
+
+
+class IncrementalPlanner:
+    """
+    在多轮调度之间保留新节点规划, 每轮只应用待调度pod的变化:
+        - 已绑定/删除的pod从其规划节点移除, 节点降配为能容纳剩余占用的最便宜机型, 空节点删除
+        - 新pending的pod先best-fit到规划节点的剩余空间, 放不下的交给optimizer为其规划新节点
+    pod以(namespace, name)识别, 资源请求变化视为删除后重新加入; 每full_every轮(或变化超过一半时)做一次全量规划,
+    收回增量放置累积的碎片
+    规划节点的剩余资源保存在NodeIndex中, best-fit和降配都只触及变化的pod和节点, 开销与变化量成正比;
+    调用方已知变化时可直接调用apply, 省去optimize与上一轮待调度pod的对比
+    """
+    def __init__(self, optimizer=None, full_every=20, pricing_path=None):
+        """
+        :param optimizer: 全量规划和为新pod规划节点时使用的优化器, 默认为CABFD
+        :param full_every: 每隔该轮数做一次全量规划
+        """
+        logging.basicConfig(
+            level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
+        )
+        self.optimizer = optimizer or CABFD(pricing_path=pricing_path)
+        self.full_every = full_every
+        self.flavor_index = PricingCatalogue.load(pricing_path).flavor_index
+        self.plan = {}          # id(node) -> 规划节点, 保持规划顺序
+        self.index = NodeIndex()
+        self.placed = {}        # key -> (规划节点, Pod)
+        self.since_full = None
+        self.last_delta = (0, 0)
+
+    @staticmethod
+    def _key(pod):
+        return (pod.namespace, pod.name) if pod.name is not None else id(pod)
+
+    @metrics.optimizer
+    def optimize(self, pods):
+        current = {self._key(x): x for x in pods}
+        removed = [k for k, (_, pod) in self.placed.items()
+                   if k not in current or (current[k].milli_cpu, current[k].ram_bytes) != (pod.milli_cpu, pod.ram_bytes)]
+        added = [p for k, p in current.items() if k not in self.placed]
+        added += [current[k] for k in removed if k in current]
+
+        if not current:
+            self.last_delta = (len(added), len(removed))
+            self._reset()
+            return []
+        if (self.since_full is None or self.since_full + 1 >= self.full_every
+                or len(added) + len(removed) > len(current) / 2):
+            self.last_delta = (len(added), len(removed))
+            return self._full(current.values())
+        return self.apply(added, removed)
+
+    def apply(self, added=(), removed=()):
+        """
+        :param added: 新pending或资源请求变化后的Pod
+        :param removed: 已绑定、删除或资源请求变化的pod的(namespace, name)
+        :return: 当前的新节点规划
+        """
+        added = list(added)
+        self.last_delta = (len(added), len(removed))
+        if self.since_full is None:
+            return self._full(added)
+        self.since_full += 1
+        touched = self._remove(removed)
+        touched.update(self._insert(added))
+        self._downsize(touched)
+        logging.info(f"增量规划: 新增{len(added)}个pod, 移除{len(removed)}个pod, "
+                     f"涉及{len(touched)}/{len(self.plan)}个规划节点")
+        return list(self.plan.values())
+
+    def _reset(self):
+        self.plan, self.index, self.placed, self.since_full = {}, NodeIndex(), {}, None
+
+    def _full(self, pods):
+        pods = list(pods)
+        self._reset()
+        schedule = self.optimizer.optimize(pods) if pods else []
+        self.plan = {id(x): x for x in schedule}
+        self.index = NodeIndex(schedule)
+        self.placed = {self._key(p): (node, p) for node in schedule for p in node.pods}
+        self.since_full = 0
+        logging.info(f"全量规划: {len(pods)}个pod, {len(self.plan)}个节点")
+        return list(schedule)
+
+    def _remove(self, keys):
+        touched = {}
+        for key in keys:
+            entry = self.placed.pop(key, None)
+            if entry is None:
+                continue
+            node, pod = entry
+            self.index.remove(node)
+            node.remove_pod(pod)
+            self.index.add(node)
+            touched[id(node)] = node
+        return touched
+
+    def _insert(self, pods):
+        """按RAM降序best-fit(剩余RAM最少)到规划节点, 剩下的pod一起交给optimizer"""
+        touched, rest = {}, []
+        for pod in sorted(pods, key=lambda x: (-x.ram_bytes, -x.milli_cpu)):
+            node = self.index.best_fit(pod.milli_cpu, pod.ram_bytes)
+            if node is None:
+                rest.append(pod)
+                continue
+            self.index.place(node, pod)
+            self.placed[self._key(pod)] = (node, pod)
+            touched[id(node)] = node
+        if rest:
+            for node in self.optimizer.optimize(rest):
+                self.plan[id(node)] = node
+                self.index.add(node)
+                self.placed.update({self._key(p): (node, p) for p in node.pods})
+        return touched
+
+    def _downsize(self, touched):
+        """只处理本轮有变化的节点: 删除空节点, 其余换成能容纳当前占用的最便宜机型"""
+        for node in touched.values():
+            if not node.pods:
+                self.index.remove(node)
+                del self.plan[id(node)]
+                continue
+            flavor = min(self.flavor_index.fit(node.occupied_cpu, node.occupied_memory),
+                         key=lambda x: x["price"], default=None)
+            if flavor is not None and flavor["price"] < node.price:
+                self.index.remove(node)
+                node.type, node.cpu, node.memory = flavor["type"], flavor["CPU"], flavor["RAM"]
+                node.price, node.zone = flavor["price"], flavor.get("zone")
+                self.index.add(node)
+
+    def summary(self, schedule):
+        self.optimizer.summary(schedule)
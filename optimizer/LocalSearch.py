@@ -0,0 +1,207 @@
+import logging, random, time
+from collections import OrderedDict
+from pricing_model.PricingCatalogue import PricingCatalogue
+from utils.resources import Node, GiB, to_millis, to_bytes
+from utils import metrics
+
+EPS = 1e-9      # 总价比较的容差, 资源占用都是整数, 不需要容差
+
+
+class _Bin:
+    """局部搜索中的节点: 机型总是能容纳当前占用的最便宜机型, 占用为整数毫核/字节"""
+    __slots__ = ("flavor", "cpu", "ram", "pods")
+
+    def __init__(self, flavor, pods):
+        self.flavor = flavor
+        self.pods = list(pods)
+        self.cpu = sum(x.milli_cpu for x in self.pods)
+        self.ram = sum(x.ram_bytes for x in self.pods)
+
+
+class LocalSearch:
+    """
+    对任意optimize()得到的方案做限时的局部搜索, 只接受不增加总价的移动:
+        - 清空利用率最低的节点, 把其中的pod best-fit到其他节点
+        - 把一个pod移到另一个节点 / 交换两个节点上的pod / 合并两个节点
+        - 每次移动后节点换成能容纳其占用的最便宜机型(降配)
+    节点价格只取决于(CPU, RAM)占用, 每次移动只重新计算两个节点, 代价差为O(1)(机型查询有缓存)
+    总价相同的合并总是接受(节点更少、碎片更少), 总价相同的移动/交换按利用率平方和是否增大决定是否接受,
+    让负载集中, 为之后清空节点创造机会
+    """
+    def __init__(self, time_limit=0.5, seed=0, pricing_path=None, cache_size=4096):
+        """
+        :param time_limit: 每次improve的时间预算(秒)
+        :param cache_size: 机型查询缓存的(CPU, RAM)占用数上限, 超过时淘汰最久未使用的
+        """
+        logging.basicConfig(
+            level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
+        )
+        self.time_limit = time_limit
+        self.random = random.Random(seed)
+        self.flavor_index = PricingCatalogue.load(pricing_path).flavor_index
+        self.cache_size = cache_size
+        self._cheapest = OrderedDict()
+        self.last_saved = 0
+        self.last_moves = (0, 0)
+
+    def cheapest(self, cpu, ram):
+        """:return: 能容纳cpu毫核、ram字节的最便宜机型, 没有则为None"""
+        key = (cpu, ram)
+        flavor = self._cheapest.get(key, False)
+        if flavor is not False:
+            self._cheapest.move_to_end(key)
+            return flavor
+        flavor = min(self.flavor_index.fit(cpu / 1000, ram / GiB), key=lambda x: x["price"], default=None)
+        self._cheapest[key] = flavor
+        if len(self._cheapest) > self.cache_size:
+            self._cheapest.popitem(last=False)
+        return flavor
+
+    def _price(self, cpu, ram, empty=False):
+        """空节点(没有pod, 而不是占用为0)价格为0, 放不下时为None"""
+        if empty:
+            return 0
+        flavor = self.cheapest(cpu, ram)
+        return None if flavor is None else flavor["price"]
+
+    @staticmethod
+    def _util(flavor, cpu, ram):
+        if flavor is None:
+            return 0
+        return (cpu / to_millis(flavor["CPU"])) ** 2 + (ram / to_bytes(flavor["RAM"])) ** 2
+
+    def improve(self, schedule):
+        """
+        :param schedule: optimize()返回的节点列表
+        :return: 总价不高于原方案的新方案, 节省的价格记在last_saved
+        """
+        if not schedule:
+            return schedule
+        deadline = time.perf_counter() + self.time_limit
+        before = sum(x.price for x in schedule)
+        bins = [_Bin(self.cheapest(x.used_milli_cpu, x.used_ram_bytes) or self._flavor_of(x), x.pods)
+                for x in schedule]
+        tried, moves, accepted = set(), 0, 0
+
+        while time.perf_counter() < deadline and len(bins) > 1:
+            changed = 0
+            for _ in range(256):
+                r = self.random.random()
+                move = self._relocate if r < 0.4 else self._swap if r < 0.8 else self._merge
+                changed += move(bins)
+            changed += self._empty_lowest(bins, tried)
+            moves, accepted = moves + 257, accepted + changed
+            if changed:
+                # 有节点变化后, 之前清空失败的节点可能可以清空了
+                tried.clear()
+                bins = [x for x in bins if x.pods]
+
+        # 占用以整数累加, 与逐个求和完全一致
+        flavors = [self.cheapest(x.cpu, x.ram) for x in bins]
+        if any(x is None for x in flavors):
+            return schedule
+        result = [Node("created", f, pods=x.pods) for f, x in zip(flavors, bins)]
+        after = sum(x.price for x in result)
+        if after > before + EPS:
+            return schedule
+        self.last_saved, self.last_moves = before - after, (moves, accepted)
+        metrics.REPACK_SAVED.inc(self.last_saved)
+        logging.info(f"局部搜索: 尝试{moves}次移动, 接受{accepted}次, 节点{len(schedule)} -> {len(result)}, "
+                     f"总价{before:.6f} -> {after:.6f}, 节省{self.last_saved:.6f}")
+        return result
+
+    @staticmethod
+    def _flavor_of(node):
+        return {"type": node.type, "CPU": node.cpu, "RAM": node.memory, "price": node.price, "zone": node.zone}
+
+    def _accept(self, a, a_cpu, a_ram, b, b_cpu, b_ram, merge=False, a_empty=False, b_empty=False):
+        """
+        两个节点改为新占用后是否更优, 更优时同时更新两个节点的机型
+        :param a_empty, b_empty: 移动后节点是否不再有pod
+        """
+        price_a, price_b = self._price(a_cpu, a_ram, a_empty), self._price(b_cpu, b_ram, b_empty)
+        if price_a is None or price_b is None:
+            return False
+        old_a = a.flavor["price"] if a.pods else 0
+        old_b = b.flavor["price"] if b.pods else 0
+        delta = price_a + price_b - old_a - old_b
+        if delta > EPS:
+            return False
+        if delta > -EPS and not merge:
+            flavor_a, flavor_b = self.cheapest(a_cpu, a_ram), self.cheapest(b_cpu, b_ram)
+            gain = (self._util(flavor_a, a_cpu, a_ram) + self._util(flavor_b, b_cpu, b_ram)
+                    - self._util(a.flavor, a.cpu, a.ram) - self._util(b.flavor, b.cpu, b.ram))
+            if gain <= EPS:
+                return False
+        a.cpu, a.ram, b.cpu, b.ram = a_cpu, a_ram, b_cpu, b_ram
+        a.flavor = self.cheapest(a_cpu, a_ram) or a.flavor
+        b.flavor = self.cheapest(b_cpu, b_ram) or b.flavor
+        return True
+
+    def _relocate(self, bins):
+        a, b = self.random.sample(bins, 2)
+        if not a.pods:
+            return False
+        i = self.random.randrange(len(a.pods))
+        pod = a.pods[i]
+        if not self._accept(a, a.cpu - pod.milli_cpu, a.ram - pod.ram_bytes,
+                            b, b.cpu + pod.milli_cpu, b.ram + pod.ram_bytes, a_empty=len(a.pods) == 1):
+            return False
+        a.pods[i] = a.pods[-1]
+        a.pods.pop()
+        b.pods.append(pod)
+        return True
+
+    def _swap(self, bins):
+        a, b = self.random.sample(bins, 2)
+        if not a.pods or not b.pods:
+            return False
+        i, j = self.random.randrange(len(a.pods)), self.random.randrange(len(b.pods))
+        p, q = a.pods[i], b.pods[j]
+        d_cpu, d_ram = q.milli_cpu - p.milli_cpu, q.ram_bytes - p.ram_bytes
+        if not self._accept(a, a.cpu + d_cpu, a.ram + d_ram, b, b.cpu - d_cpu, b.ram - d_ram):
+            return False
+        a.pods[i], b.pods[j] = q, p
+        return True
+
+    def _merge(self, bins):
+        """把b上的pod全部移到a, a换成能容纳两者的最便宜机型(可能升配)"""
+        a, b = self.random.sample(bins, 2)
+        if not a.pods or not b.pods:
+            return False
+        if not self._accept(a, a.cpu + b.cpu, a.ram + b.ram, b, 0, 0, merge=True, b_empty=True):
+            return False
+        a.pods += b.pods
+        b.pods = []
+        return True
+
+    def _empty_lowest(self, bins, tried):
+        """
+        把利用率最低(且本轮未尝试过)的节点中的pod按RAM降序best-fit到其他节点的剩余空间
+        全部放得下才提交, 其他节点的机型不变
+        :return: 是否清空了一个节点
+        """
+        candidates = [x for x in bins if x.pods and id(x) not in tried]
+        if not candidates:
+            return False
+        victim = min(candidates, key=lambda x: max(x.cpu / to_millis(x.flavor["CPU"]), x.ram / to_bytes(x.flavor["RAM"])))
+        tried.add(id(victim))
+        # 剩余空间的副本: [节点, 剩余CPU, 剩余RAM, 新放入的pod]
+        free = [[x, to_millis(x.flavor["CPU"]) - x.cpu, to_bytes(x.flavor["RAM"]) - x.ram, []]
+                for x in bins if x is not victim and x.pods]
+        for pod in sorted(victim.pods, key=lambda x: (-x.ram_bytes, -x.milli_cpu)):
+            fits = [x for x in free if x[1] >= pod.milli_cpu and x[2] >= pod.ram_bytes]
+            if not fits:
+                return False
+            best = min(fits, key=lambda x: x[2])
+            best[1] -= pod.milli_cpu
+            best[2] -= pod.ram_bytes
+            best[3].append(pod)
+        for node, _, _, pods in free:
+            node.pods += pods
+            node.cpu += sum(x.milli_cpu for x in pods)
+            node.ram += sum(x.ram_bytes for x in pods)
+        victim.pods, victim.cpu, victim.ram = [], 0, 0
+        return True
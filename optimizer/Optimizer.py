@@ -0,0 +1,33 @@
+import logging
+from pricing_model.PricingCatalogue import PricingCatalogue
+
+
+class Optimizer:
+    """
+    BFD/CABFD/BatchBFD共用的部分: 从共享的PricingCatalogue加载机型目录, 以及打印规划结果
+    子类实现optimize(pods), 返回新节点列表(list of Node)
+    """
+    def _load_pricing_model(self, pricing_path):
+        try:
+            self.pricing = PricingCatalogue.load(pricing_path)
+            self.gcp_pricing = self.pricing.gcp_pricing
+            self.flavor_index = self.pricing.flavor_index
+        except Exception as e:
+            logging.error(e)
+            raise
+
+    def summary(self, schedule):
+        cnt = 0
+        tot_price = 0
+        for node in schedule:
+            cnt +=1
+            type = node.type
+            price = node.price
+            tot_price += price
+            vcpu, ram = node.cpu, node.memory
+            pods = [(pod.cpu, pod.memory) for pod in node.pods]
+            logging.info(f"创建节点{cnt}, 类型为{type}, 价格为{price}, 配置为{vcpu} vCPU和{ram}G RAM"
+                         f"\n\t 部署的pod为 {pods}"
+                         f"\n\t 占用CPU{node.occupied_cpu}个, 占用Memory{node.occupied_memory}G"
+                         f"\n\t CPU占用率{100*node.occupied_cpu/vcpu:.2f}%, Memory占用率{100*node.occupied_memory/ram:.2f}%")
+        logging.info(f"总价为{tot_price}")
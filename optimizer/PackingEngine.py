@@ -0,0 +1,92 @@
+import time
+import numpy as np
+from utils.resources import Node, GiB, to_millis, to_bytes
+
+
+class PackingEngine:
+    """
+    CABFD的向量化打分内核
+    已开启的节点和候选机型都以NumPy数组(容量, 已用CPU/RAM, 价格)保存,
+    每个pod的所有候选节点在一次向量运算中完成打分, 结果与CABFD逐个打分完全一致
+    容量和占用与Node一样是整数毫核/字节, 可行性按整数判断, 打分时才换算为核/GiB
+    """
+    def __init__(self, flavors, weights=(1, 1, 0.5), sort_key=None, all_flavors=None):
+        """
+        :param weights: _score中CPU利用率、RAM利用率、价格三项的权重
+        :param sort_key: pod的放置顺序, 默认与CABFD相同(RAM降序, 再按CPU降序)
+        :param all_flavors: 价格项归一化使用的完整机型目录(FlavorIndex.all_flavors), 默认为flavors
+        """
+        self.flavors = flavors
+        self.weights = weights
+        self.sort_key = sort_key or (lambda x: (-x.ram_bytes, -x.milli_cpu))
+        self.flavor_cpu = np.array([x["CPU"] for x in flavors], dtype=np.float64)
+        self.flavor_ram = np.array([x["RAM"] for x in flavors], dtype=np.float64)
+        self.flavor_price = np.array([x["price"] for x in flavors], dtype=np.float64)
+        self.flavor_millis = np.array([to_millis(x["CPU"]) for x in flavors], dtype=np.int64)
+        self.flavor_bytes = np.array([to_bytes(x["RAM"]) for x in flavors], dtype=np.int64)
+        all_flavors = flavors if all_flavors is None else all_flavors
+        self.scale_cpu = np.array([x["CPU"] for x in all_flavors], dtype=np.float64)
+        self.scale_ram = np.array([x["RAM"] for x in all_flavors], dtype=np.float64)
+        self.scale_price = np.array([x["price"] for x in all_flavors], dtype=np.float64)
+
+    def pack(self, pods, deadline=None):
+        """
+        :param pods: 待调度的pod
+        :param deadline: time.time()的截止时间, 超过时抛出TimeoutError, 供Portfolio的工作进程及时放弃
+        :return: 与CABFD.optimize相同结构的schedule (list of Node)
+        """
+        sorted_pods = sorted(pods, key=self.sort_key)
+        w_cpu, w_ram, w_price = self.weights
+
+        size = 64
+        cap_cpu, cap_ram = np.empty(size, dtype=np.int64), np.empty(size, dtype=np.int64)
+        used_cpu, used_ram = np.zeros(size, dtype=np.int64), np.zeros(size, dtype=np.int64)
+        price = np.empty(size)
+        flavor_of, members = [], []
+        n = 0
+
+        for pod in sorted_pods:
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError("PackingEngine超过截止时间")
+            cpu, ram = pod.cpu, pod.memory
+            free_cpu, free_ram = cap_cpu[:n] - used_cpu[:n], cap_ram[:n] - used_ram[:n]
+            open_fit = (free_cpu >= pod.milli_cpu) & (free_ram >= pod.ram_bytes)
+            avai_cpu, avai_ram = free_cpu / 1000, free_ram / GiB
+            type_fit = (self.flavor_cpu >= cpu) & (self.flavor_ram >= ram)
+            if not open_fit.any() and not type_fit.any():
+                raise ValueError(f"没有机型可以容纳pod (CPU={cpu}, RAM={ram})")
+
+            scale_fit = (self.scale_cpu >= cpu) & (self.scale_ram >= ram)
+            max_price = max(price[:n][open_fit].max(initial=0), self.flavor_price[type_fit].max(initial=0),
+                            self.scale_price[scale_fit].max(initial=0))
+            # 已创建节点的价格项恒为 1 - 0/max_price
+            open_score = (w_cpu * (1 - (avai_cpu - cpu) / (cap_cpu[:n] / 1000))
+                          + w_ram * (1 - (avai_ram - ram) / (cap_ram[:n] / GiB))
+                          + w_price * (1 - 0 / max_price))
+            type_score = (w_cpu * (1 - (self.flavor_cpu - cpu) / self.flavor_cpu)
+                          + w_ram * (1 - (self.flavor_ram - ram) / self.flavor_ram)
+                          + w_price * (1 - self.flavor_price / max_price))
+            scores = np.concatenate((np.where(open_fit, open_score, -np.inf),
+                                     np.where(type_fit, type_score, -np.inf)))
+            best = int(np.argmax(scores))
+
+            if best < n:
+                used_cpu[best] += pod.milli_cpu
+                used_ram[best] += pod.ram_bytes
+                members[best].append(pod)
+                continue
+
+            if n == size:
+                size *= 2
+                cap_cpu, cap_ram = np.resize(cap_cpu, size), np.resize(cap_ram, size)
+                used_cpu, used_ram = np.resize(used_cpu, size), np.resize(used_ram, size)
+                used_cpu[n:], used_ram[n:] = 0, 0
+                price = np.resize(price, size)
+            k = best - n
+            cap_cpu[n], cap_ram[n], price[n] = self.flavor_millis[k], self.flavor_bytes[k], self.flavor_price[k]
+            used_cpu[n], used_ram[n] = pod.milli_cpu, pod.ram_bytes
+            flavor_of.append(k)
+            members.append([pod])
+            n += 1
+
+        return [Node("created", self.flavors[k], pods=p) for k, p in zip(flavor_of, members)]
@@ -0,0 +1,110 @@
+import logging, threading
+from collections import OrderedDict
+from optimizer.CABFD import CABFD
+from pricing_model.PricingCatalogue import PricingCatalogue
+from utils.resources import Node
+from utils import metrics
+
+
+class PlanCache:
+    """
+    优化器前的方案缓存: 键为待调度pod的(CPU, RAM)多重集签名加上定价目录的version
+    命中时按签名把本次的pod重新分配到缓存方案的各个节点上, 不再调用优化器
+    version由pricing.json的内容和GCPMonitor的catalogue_version组成:
+    GCPMonitor刷新到新的机型定价后先export到pricing_path, 优化器才能读到新定价; 之后version改变,
+    缓存清空并按新定价重建优化器. 创建时不export, 假定pricing.json与GCPMonitor当前的目录一致
+    """
+    def __init__(self, optimizer=CABFD, capacity=256, pricing_path=None, catalogue=None, **options):
+        """
+        :param optimizer: 优化器类, 以optimizer(pricing_path=..., **options)创建
+        :param capacity: 缓存的方案数上限, 超过时淘汰最久未使用的方案
+        :param catalogue: 提供catalogue_version的GCPMonitor, 其定价目录刷新后导出到pricing_path并使缓存失效
+        """
+        logging.basicConfig(
+            level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
+        )
+        self.optimizer_cls = optimizer
+        self.capacity = capacity
+        self.pricing_path = pricing_path
+        self.catalogue = catalogue
+        self.options = options
+        self.plans = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.version = None
+        self.catalogue_version = getattr(catalogue, "catalogue_version", None)
+        self._refresh_pricing()
+
+    def _refresh_pricing(self):
+        """GCPMonitor的目录刷新后导出到pricing_path, 定价目录有变化时清空缓存并重建优化器"""
+        if self.catalogue is not None and self.catalogue.catalogue_version != self.catalogue_version:
+            if self.catalogue.catalogue_version is not None:
+                self.catalogue.export(self.pricing_path)
+            self.catalogue_version = self.catalogue.catalogue_version
+        version = PricingCatalogue.load(self.pricing_path).version
+        if self.catalogue is not None:
+            version = f"{version}/{self.catalogue_version}"
+        if version == self.version:
+            return
+        if self.version is not None:
+            logging.info(f"定价目录{self.version} -> {version}, 清空{len(self.plans)}个缓存方案")
+        self.optimizer = self.optimizer_cls(pricing_path=self.pricing_path, **self.options)
+        self.plans.clear()
+        self.version = version
+
+    @staticmethod
+    def signature(pods):
+        """:return: ((CPU, RAM), 个数)按形状排序的元组"""
+        shapes = {}
+        for pod in pods:
+            shape = (pod.cpu, pod.memory)
+            shapes[shape] = shapes.get(shape, 0) + 1
+        return tuple(sorted(shapes.items()))
+
+    @metrics.optimizer
+    def optimize(self, pods):
+        with self._lock:
+            self._refresh_pricing()
+            key = (self.version, self.signature(pods))
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.plans.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.PLAN_CACHE.inc(result="hit" if plan is not None else "miss")
+        if plan is not None:
+            return self._remap(plan, pods)
+
+        schedule = self.optimizer.optimize(pods)
+        plan = [({"type": x.type, "CPU": x.cpu, "RAM": x.memory, "price": x.price, "zone": x.zone},
+                 self.signature(x.pods)) for x in schedule]
+        with self._lock:
+            if key[0] == self.version:
+                self.plans[key] = plan
+                if len(self.plans) > self.capacity:
+                    self.plans.popitem(last=False)
+        return schedule
+
+    @staticmethod
+    def _remap(plan, pods):
+        """按形状把pod逐个填入缓存方案的节点"""
+        buckets = {}
+        for pod in pods:
+            buckets.setdefault((pod.cpu, pod.memory), []).append(pod)
+        schedule = []
+        for flavor, shapes in plan:
+            node = Node("created", flavor)
+            for shape, count in shapes:
+                bucket = buckets[shape]
+                for _ in range(count):
+                    node.add_pod(bucket.pop())
+            schedule.append(node)
+        return schedule
+
+    def summary(self, schedule):
+        logging.info(f"方案缓存: 命中{self.hits}次, 未命中{self.misses}次, 缓存{len(self.plans)}/{self.capacity}个方案")
+        self.optimizer.summary(schedule)
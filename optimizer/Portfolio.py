@@ -0,0 +1,158 @@
+import logging, time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from optimizer.BFD import BFD
+from optimizer.PackingEngine import PackingEngine
+from pricing_model.PricingCatalogue import PricingCatalogue
+from utils.resources import Pod, Node, to_millis, to_bytes
+from utils import metrics
+
+# pod放置顺序: RAM优先, CPU优先, 体积(CPU×RAM)优先
+SORT_KEYS = {
+    "memory": lambda x: (-x.ram_bytes, -x.milli_cpu),
+    "cpu": lambda x: (-x.milli_cpu, -x.ram_bytes),
+    "volume": lambda x: (-x.milli_cpu * x.ram_bytes, -x.ram_bytes),
+}
+# CABFD打分权重(CPU利用率, RAM利用率, 价格)的变体, 第一个为CABFD的默认值
+WEIGHTS = [(1, 1, 0.5), (1, 1, 0), (1, 1, 1), (1, 1, 2), (1, 0.5, 0.5), (0.5, 1, 0.5)]
+STRATEGIES = ([("CABFD", key, weights) for weights in WEIGHTS for key in SORT_KEYS]
+              + [("BFD", key, None) for key in SORT_KEYS])
+
+# 工作进程内的状态, 由_init_worker在进程启动时建立一次
+_worker = {}
+
+
+def _init_worker(pricing_path):
+    logging.disable(logging.INFO)
+    catalogue = PricingCatalogue.load(pricing_path)
+    _worker["flavors"] = catalogue.flavors
+    _worker["all_flavors"] = catalogue.flavor_index.all_flavors
+    _worker["position"] = {(x["type"], x.get("zone")): i for i, x in enumerate(catalogue.flavors)}
+    _worker["pricing_path"] = pricing_path
+
+
+def _run(strategy, cpu, ram, deadline=None):
+    """
+    在工作进程中按一个策略规划, 输入和输出都是紧凑的数组而不是Node对象
+    :param deadline: time.time()的截止时间, 超过时策略抛出TimeoutError, 工作进程不再为已放弃的策略继续计算
+    :return: (策略, 总价, [(机型在FlavorIndex中的位置, [pod下标])], 耗时)
+    """
+    start = time.perf_counter()
+    name, key, weights = strategy
+    pods = [Pod.record(None, None, None, None, c, r) for c, r in zip(cpu, ram)]
+    if name == "BFD":
+        schedule = BFD(_worker["pricing_path"], sort_key=SORT_KEYS[key]).optimize(pods, deadline)
+    else:
+        schedule = PackingEngine(_worker["flavors"], weights, SORT_KEYS[key],
+                                 _worker["all_flavors"]).pack(pods, deadline)
+    index = {id(x): i for i, x in enumerate(pods)}
+    plan = [(_worker["position"][(x.type, x.zone)], [index[id(p)] for p in x.pods]) for x in schedule]
+    return strategy, sum(x.price for x in schedule), plan, time.perf_counter() - start
+
+
+class Portfolio:
+    """
+    启发式组合: 在进程池中并行运行BFD和CABFD的多种排序方式与打分权重, 取总价最低的可行方案
+    pod只以整数毫核/字节数组传给工作进程, 工作进程启动时各自加载一次定价目录, 返回机型位置和pod下标
+    设置time_limit时, 除第一个策略外每个策略在工作进程内带有截止时间, 超时的策略自行结束而不会占住进程池;
+    第一个策略不设截止时间, 保证至少有一个方案
+    """
+    def __init__(self, workers=None, strategies=None, time_limit=None, bfd_limit=2000, pricing_path=None):
+        """
+        :param workers: 进程数, 默认为CPU核数
+        :param strategies: [(优化器, 排序方式, 权重)], 默认为STRATEGIES
+        :param time_limit: 各策略的时间预算(秒), 到时只在已完成的策略中选择(至少等到第一个策略完成)
+        :param bfd_limit: pod数超过该值时跳过BFD策略(BFD的开销随节点数平方增长)
+        """
+        logging.basicConfig(
+            level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',  # 时间格式
+        )
+        self.workers = workers
+        self.strategies = strategies or STRATEGIES
+        self.time_limit = time_limit
+        self.bfd_limit = bfd_limit
+        self.pricing_path = pricing_path
+        self.flavors = PricingCatalogue.load(pricing_path).flavors
+        self.pool = None
+        self.last_results = []
+
+    def _pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.pricing_path,))
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    @metrics.optimizer
+    def optimize(self, pods):
+        if not pods:
+            return []
+        cpu = array('q', (x.milli_cpu for x in pods))
+        ram = array('q', (x.ram_bytes for x in pods))
+        pool = self._pool()
+        strategies = [x for x in self.strategies if x[0] != "BFD" or len(pods) <= self.bfd_limit]
+        deadline = None if self.time_limit is None else time.time() + self.time_limit
+        futures = [pool.submit(_run, x, cpu, ram, None if i == 0 else deadline) for i, x in enumerate(strategies)]
+        done, pending = wait(futures, timeout=self.time_limit)
+        while pending and not any(x.exception() is None for x in done):
+            more, pending = wait(pending, return_when=FIRST_COMPLETED)
+            done |= more
+        # 未开始的策略直接取消, 已在运行的策略会在截止时间后自行抛出TimeoutError
+        for future in pending:
+            future.cancel()
+
+        best, self.last_results = None, []
+        for future in futures:
+            if future not in done:
+                continue
+            try:
+                strategy, price, plan, elapsed = future.result()
+            except TimeoutError:
+                continue
+            except Exception as e:
+                logging.error(f"组合策略执行失败: {e}")
+                continue
+            self.last_results.append((strategy, price, len(plan), elapsed))
+            if not self._feasible(plan, cpu, ram):
+                logging.warning(f"策略{strategy}的方案不可行, 忽略")
+                continue
+            if best is None or (price, len(plan)) < (best[1], len(best[2])):
+                best = (strategy, price, plan)
+        if best is None:
+            raise RuntimeError("组合中没有策略得到可行方案")
+
+        strategy, price, plan = best
+        logging.info(f"组合选出{strategy}, 总价{price:.6f}, {len(plan)}个节点 "
+                     f"(共{len(self.last_results)}个策略, 最贵{max(x[1] for x in self.last_results):.6f})")
+        return [Node("created", self.flavors[k], pods=[pods[i] for i in members]) for k, members in plan]
+
+    def _feasible(self, plan, cpu, ram):
+        """每个pod恰好放置一次, 且每个节点的CPU/RAM不超过机型容量"""
+        seen = 0
+        for k, members in plan:
+            flavor = self.flavors[k]
+            if (sum(cpu[i] for i in members) > to_millis(flavor["CPU"])
+                    or sum(ram[i] for i in members) > to_bytes(flavor["RAM"])):
+                return False
+            seen += len(members)
+        return seen == len(cpu) and len({i for _, members in plan for i in members}) == len(cpu)
+
+    def summary(self, schedule):
+        for strategy, price, nodes, elapsed in sorted(self.last_results, key=lambda x: x[1]):
+            logging.info(f"{strategy}: 总价{price:.6f}, {nodes}个节点, 耗时{elapsed:.3f}s")
+        logging.info(f"总价为{sum(x.price for x in schedule)}")
+
+
+if __name__ == "__main__":
+    import random
+    rnd = random.Random(0)
+    pods = [Pod({"CPU": round(rnd.uniform(0.1, 2), 1), "RAM": round(rnd.uniform(0.25, 6), 2)}) for _ in range(1000)]
+    portfolio = Portfolio()
+    portfolio.summary(portfolio.optimize(pods))
+    portfolio.close()
@@ -0,0 +1,45 @@
+import bisect, logging
+
+
+class FlavorIndex:
+    """
+    机型索引, 在加载pricing.json时构建一次
+    剔除被支配的机型(存在另一机型CPU和RAM都不少, 且价格不高), 剩余机型按(CPU, RAM)排序
+    all_flavors保留未剪枝的完整目录: CABFD的价格项按能容纳pod的所有机型中的最高价归一化, 用完整目录计算该最高价
+    剪枝会改变方案: 被支配的机型可能比支配它的机型小(如(2核, 8GiB, 0.10)被(4核, 16GiB, 0.09)支配),
+    CABFD不能再选它; 支配机型容量不小且价格不高, 实际得到的方案总价通常更低
+    """
+    def __init__(self, flavors):
+        self.all_flavors = list(flavors)
+        self.flavors = self._prune(flavors)
+        self._cpus = [x["CPU"] for x in self.flavors]
+        logging.info(f"Flavor Index built with {len(self.flavors)}/{len(flavors)} non-dominated flavors")
+
+    @staticmethod
+    def _prune(flavors):
+        """
+        按价格从低到高扫描, 已保留的机型都不比当前机型贵, 只需检查其CPU和RAM
+        :return: Pareto前沿上的机型, 按(CPU, RAM)升序
+        """
+        frontier = []
+        for flavor in sorted(flavors, key=lambda x: (x["price"], -x["CPU"], -x["RAM"])):
+            if any(x["CPU"] >= flavor["CPU"] and x["RAM"] >= flavor["RAM"] for x in frontier):
+                continue
+            frontier.append(flavor)
+        return sorted(frontier, key=lambda x: (x["CPU"], x["RAM"]))
+
+    def fit(self, cpu, ram):
+        """
+        :return: 能容纳(cpu, ram)的机型
+        只在CPU方向二分定位下界, RAM方向是对剩余机型的线性过滤; 前沿上的机型在CPU和RAM上没有单调关系,
+        不能再二分, 而前沿通常只有几个到几十个机型, 线性过滤的开销可以忽略
+        """
+        start = bisect.bisect_left(self._cpus, cpu)
+        return [x for x in self.flavors[start:] if x["RAM"] >= ram]
+
+    def max_price(self, cpu, ram):
+        """:return: 完整目录中能容纳(cpu, ram)的机型的最高价, 没有则为0"""
+        return max((x["price"] for x in self.all_flavors if x["CPU"] >= cpu and x["RAM"] >= ram), default=0)
+
+    def __len__(self):
+        return len(self.flavors)
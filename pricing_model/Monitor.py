@@ -1,9 +1,26 @@
-from google.cloud import compute_v1, billing_v1
-import os, logging, json
+import hashlib, os, logging, json, time, threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
+from pricing_model.PricingCatalogue import DATA_DIR, DEFAULT_PRICING
+
+CACHE_VERSION = 2
+DEFAULT_CACHE = os.path.join(DATA_DIR, "pricing_cache.json")
+FLAVOR_POOL = os.path.join(DATA_DIR, "pre-defined-Flavors.json")
+
 
 class GCPMonitor:
-    def __init__(self, project_id = None, region=None, zone='b'):
+    def __init__(self, project_id = None, region=None, zone='b', cache_path=DEFAULT_CACHE,
+                 ttl=24*3600, compute_client=None, billing_client=None, instance_client=None, zones=None):
+        """
+        :param zones: 需要发现机型和定价的可用区列表(如["australia-southeast1-b", "us-central1-a"]),
+                      默认只有region-zone这一个, 各可用区并发查询
+        :param cache_path: 本地定价缓存文件, 为None时不使用缓存
+        :param ttl: 缓存有效期(秒), 过期后先沿用旧缓存启动, 在后台重新拉取
+        :param compute_client, billing_client, instance_client: 可注入离线替身(见OfflineClients),
+                      未注入时在第一次调用API时才导入google-cloud SDK并创建客户端
+        构造时只读本地缓存, 不访问网络; 没有可用缓存时在第一次访问机型目录时才拉取
+        """
         logging.basicConfig(
             level=logging.INFO,  # 设置全局日志级别（DEBUG及以上会记录）
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -13,93 +30,265 @@ class GCPMonitor:
         self.project_id = project_id or os.getenv("GCP_PROJECT")
         self.region = region or "australia-southeast1"
         self.zone = self.region + "-" + zone
-        self._init_clients()
+        self.zones = list(zones) if zones else [self.zone]
+        self.regions = sorted({self._region_of(x) for x in self.zones})
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.compute_service_id = None
+        self.fetched_at = None
+        self.machine_cache = self.pricing_cache = self.machine_price_cache = None
+        self.catalogue_version = None      # 机型定价的摘要, 每次目录内容变化时改变
+        self.instance_cache = {}           # zone -> {ip: 机型}, 实例查询失败时沿用
+        self._refreshing = threading.Lock()
+        self._compute_client = compute_client
+        self._billing_client = billing_client
+        self._instance_client = instance_client
         self.flavor_pool = self._read_flavor_pool()
-        self.machine_cache = self.fetch_machine_specs()
-        self.pricing_cache = self.fetch_pricing_data()
-        self.machine_price_cache = self.cal_VM_price()
 
-    def _init_clients(self):
-        self.compute_client = compute_v1.MachineTypesClient()
-        self.billing_client = billing_v1.CloudCatalogClient()
-        self.instance_client = compute_v1.InstancesClient()
-        logging.info("Connecting to Compute Client and Billing Client")
+        self.refresher = None
+        if self._load_cache() and self.expired:
+            self.refresher = threading.Thread(target=self._background_refresh, daemon=True)
+            self.refresher.start()
+
+    @property
+    def compute_client(self):
+        if self._compute_client is None:
+            from google.cloud import compute_v1
+            self._compute_client = compute_v1.MachineTypesClient()
+            logging.info("Connecting to Compute Client")
+        return self._compute_client
+
+    @property
+    def billing_client(self):
+        if self._billing_client is None:
+            from google.cloud import billing_v1
+            self._billing_client = billing_v1.CloudCatalogClient()
+            logging.info("Connecting to Billing Client")
+        return self._billing_client
 
-        services = list(self.billing_client.list_services())
+    @property
+    def instance_client(self):
+        if self._instance_client is None:
+            from google.cloud import compute_v1
+            self._instance_client = compute_v1.InstancesClient()
+        return self._instance_client
+
+    def _ensure_catalogue(self):
+        """没有缓存可用时同步拉取一次机型目录"""
+        if self.machine_price_cache is None:
+            self.refresh_catalogue()
+
+    def _find_compute_service(self):
+        with metrics.api_call("gcp", "list_services"):
+            services = list(self.billing_client.list_services())
         self.compute_service_id = next(
             s.name for s in services
             if s.display_name == "Compute Engine"
         )
         logging.info(f"Retrieving Compute Engine Service {self.compute_service_id} to get SKUs")
 
+    @staticmethod
+    def _region_of(zone):
+        return zone.rsplit("-", 1)[0]
+
+    @staticmethod
+    def _digest(prices):
+        """:return: 机型定价内容的摘要, 供方案缓存等判断目录是否变化"""
+        return hashlib.sha1(json.dumps(prices, sort_keys=True).encode()).hexdigest()[:12]
+
+    @property
+    def expired(self):
+        return self.fetched_at is None or time.time() - self.fetched_at > self.ttl
+
+    def refresh_catalogue(self):
+        """
+        从GCP重新拉取机型和SKU定价并写回本地缓存, 同一时间只有一个刷新在进行
+        新的目录先在局部变量中建立, 拉取失败或结果为空时抛出异常, 当前目录和磁盘缓存都保持不变;
+        个别可用区查询失败时该可用区沿用旧缓存中的机型, 有可用区失败的刷新不写入磁盘
+        """
+        blocking = self.machine_price_cache is None
+        if not self._refreshing.acquire(blocking=blocking):
+            return
+        try:
+            if blocking and self.machine_price_cache is not None:
+                return  # 等待期间另一个线程已经拉取完成
+            if self.compute_service_id is None:
+                self._find_compute_service()
+            # 各可用区的机型查询与SKU目录下载并发进行, 耗时取决于最慢的一个
+            with ThreadPoolExecutor(max_workers=len(self.zones) + 1) as pool:
+                skus = pool.submit(self._list_skus)
+                zones = {x: pool.submit(self.fetch_machine_specs, x) for x in self.zones}
+                skus = skus.result()
+                specs, failed = self._collect_specs(zones)
+            pricing = self.fetch_pricing_data(skus, specs)
+            prices = self.cal_VM_price(specs, pricing)
+            if not prices:
+                raise RuntimeError("拉取到的机型定价为空, 不更新定价目录")
+            self.machine_cache, self.pricing_cache, self.machine_price_cache = specs, pricing, prices
+            self.catalogue_version = self._digest(prices)
+            if failed:
+                # 部分可用区沿用旧机型, 不算一次完整的刷新: 不写盘, fetched_at不变, 下次仍会重新拉取
+                logging.warning(f"可用区{failed}的机型查询失败, 沿用旧缓存中的机型, 本次刷新不写入磁盘")
+                return
+            self.fetched_at = time.time()
+            self._save_cache()
+        finally:
+            self._refreshing.release()
+
+    def _collect_specs(self, futures):
+        """
+        :param futures: {zone: fetch_machine_specs的Future}
+        :return: ({zone: 机型}, 查询失败而沿用旧缓存的可用区), 失败的可用区没有旧缓存时抛出异常
+        """
+        specs, failed = {}, []
+        for zone, future in futures.items():
+            try:
+                specs[zone] = future.result()
+            except Exception:
+                previous = (self.machine_cache or {}).get(zone)
+                if previous is None:
+                    raise
+                specs[zone] = previous
+                failed.append(zone)
+        return specs, failed
+
+    def _background_refresh(self):
+        try:
+            self.refresh_catalogue()
+        except Exception as e:
+            logging.error(f"后台刷新定价失败, 继续使用旧缓存: {e}")
+
+    def _load_cache(self):
+        """
+        读取本地定价缓存, 版本、区域或机型池不一致时视为无效
+        :return: 是否成功载入
+        """
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, 'r') as fp:
+                cache = json.load(fp)
+            if (cache["version"] != CACHE_VERSION or cache["zones"] != self.zones
+                    or cache["flavor_pool"] != self.flavor_pool):
+                logging.info("Pricing cache does not match current configuration, ignored")
+                return False
+            self.machine_cache = cache["machine_cache"]
+            self.pricing_cache = cache["pricing_cache"]
+            self.machine_price_cache = cache["machine_price_cache"]
+            self.catalogue_version = self._digest(self.machine_price_cache)
+            self.compute_service_id = cache["compute_service_id"]
+            self.fetched_at = cache["fetched_at"]
+            logging.info(f"Pricing cache loaded from {self.cache_path}, "
+                         f"{time.time() - self.fetched_at:.0f}s old")
+            return True
+        except Exception as e:
+            logging.error(f"读取定价缓存失败: {e}")
+            return False
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+        cache = {
+            "version": CACHE_VERSION,
+            "zones": self.zones,
+            "flavor_pool": self.flavor_pool,
+            "compute_service_id": self.compute_service_id,
+            "fetched_at": self.fetched_at,
+            "machine_cache": self.machine_cache,
+            "pricing_cache": self.pricing_cache,
+            "machine_price_cache": self.machine_price_cache,
+        }
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, 'w') as fp:
+            json.dump(cache, fp)
+        os.replace(tmp, self.cache_path)
+        logging.info(f"Pricing cache saved to {self.cache_path}")
+
     def _read_flavor_pool(self):
         """
         We have already narrowed the range of VMs in project
         :return: A list containing names of flavors
         """
-        with open('../data/pre-defined-Flavors.json', 'r') as fp:
+        with open(FLAVOR_POOL, 'r') as fp:
             gcp_flavors = json.load(fp)['gcp']
             logging.info(f"Flavor Pool Loaded as {gcp_flavors}")
             return gcp_flavors
 
-    def fetch_machine_specs(self):
+    def fetch_machine_specs(self, zone=None):
         """
         Get all available flavors of VMs in GCP project
         Do intersection with pre-defined flavors of VMs
-        :return: available machine types
+        :param zone: 查询的可用区, 默认为self.zone
+        :return: available machine types of this zone, 查询失败时抛出异常
         """
+        zone = zone or self.zone
+        region = self._region_of(zone)
         specs = defaultdict(list)
 
-        logging.info(f"Fetching machine types in {self.region}")
+        logging.info(f"Fetching machine types in {zone}")
         try:
-            request = compute_v1.ListMachineTypesRequest(
-                project=self.project_id,
-                zone=self.zone  # 每个区域选择第一个可用区
-            )
-            machine_types = self.compute_client.list(request)
-            _ = [specs[mt.name.split("-")[0]].append(
-                {
-                    "name": mt.name,
-                    "vcpu": mt.guest_cpus,
-                    "memory_mb": mt.memory_mb,
-                    "is_shared_core": "shared-core" in mt.name,
-                    "region": self.region
-                }
-            )
-                for mt in machine_types if mt.name in self.flavor_pool]
-            # assert len(self.flavor_pool) == len(specs)
+            request = {"project": self.project_id, "zone": zone}
+            with metrics.api_call("gcp", "list_machine_types"):
+                machine_types = list(self.compute_client.list(request=request))
         except Exception as e:
-            logging.error(f"Error fetching specs in {self.region}: {str(e)}")
+            logging.error(f"Error fetching specs in {zone}: {str(e)}")
+            raise
+        _ = [specs[mt.name.split("-")[0]].append(
+            {
+                "name": mt.name,
+                "vcpu": mt.guest_cpus,
+                "memory_mb": mt.memory_mb,
+                "is_shared_core": "shared-core" in mt.name,
+                "region": region,
+                "zone": zone
+            }
+        )
+            for mt in machine_types if mt.name in self.flavor_pool]
+        # assert len(self.flavor_pool) == len(specs)
 
         return specs
 
-    def fetch_pricing_data(self):
-        """获取计算引擎的定价数据"""
-        pricing_cache = defaultdict(dict)
-        skus = self.billing_client.list_skus(parent=self.compute_service_id)
-        skus = [sku
+    def _list_skus(self):
+        """下载Compute Engine的SKU目录并保留按需的CPU/RAM单价, 一次下载覆盖所有region"""
+        with metrics.api_call("gcp", "list_skus"):
+            skus = list(self.billing_client.list_skus(parent=self.compute_service_id))
+        return [sku
                 for sku in skus
                 if sku.category.usage_type=="OnDemand" and
-                self.region in sku.service_regions and
+                any(x in sku.service_regions for x in self.regions) and
                 ("Instance Core" in sku.description or "Instance Ram" in sku.description) and
                 len(sku.description.split(" ")) <= 7]
 
+    def fetch_pricing_data(self, skus=None, machine_cache=None):
+        """
+        获取计算引擎的定价数据
+        :param machine_cache: 各可用区的机型, 默认为self.machine_cache
+        :return: {region: {机型族: {"CPU": 单价, "RAM": 单价}}}
+        """
+        if skus is None:
+            skus = self._list_skus()
+        machine_cache = self.machine_cache if machine_cache is None else machine_cache
+        families = {x for specs in machine_cache.values() for x in specs}
+        pricing_cache = {x: defaultdict(dict) for x in self.regions}
+
         for sku in skus:
-            entry = self._parse_sku(sku)
+            entry = self._parse_sku(sku, families)
             if entry:
-                pricing_cache[entry['id']][entry['resource']] = entry['pricing_info']
+                for region in self.regions:
+                    if region in sku.service_regions:
+                        pricing_cache[region][entry['id']][entry['resource']] = entry['pricing_info']
 
         return pricing_cache
 
-    def _parse_sku(self, sku):
+    def _parse_sku(self, sku, families):
         """解析单个SKU的数据结构"""
         try:
             # 切分后第一个是类似“n4”, "c3"类似
             mt_id = sku.description.lower().split()[0]
-            if self.machine_cache == {}:
+            if not families:
                 raise Exception("请先获取项目可用VM类型")
             else:
-                if mt_id not in self.machine_cache.keys():
+                if mt_id not in families:
                     return None
             # 解析定价信息
             pricing_info = {}
@@ -121,7 +310,6 @@ class GCPMonitor:
             return {
                 "sku_id": sku.sku_id,
                 "id": mt_id,
-                "region": self.region,
                 "resource": sku.category.resource_group, # cpu or ram
                 "pricing_info": pricing_info
             }
@@ -129,45 +317,74 @@ class GCPMonitor:
             logging.error(f"Error parsing SKU {sku.sku_id}: {str(e)}")
             return None
 
-    def cal_VM_price(self):
+    def cal_VM_price(self, machine_cache=None, pricing_cache=None):
+        machine_cache = self.machine_cache if machine_cache is None else machine_cache
+        pricing_cache = self.pricing_cache if pricing_cache is None else pricing_cache
         machine_price_cache = []
-        for type, VMs in self.machine_cache.items():
-            cpu, ram = self.pricing_cache[type]['CPU'], self.pricing_cache[type]['RAM']
-            for VM in VMs:
-                temp = {}
-                name = VM['name']
-                temp['type'] = name
-                vcpu, memory = VM['vcpu'], VM['memory_mb'] / 1024
-                temp["CPU"], temp["RAM"] = vcpu,  memory
-                price = vcpu * cpu['hourly_rate'] + memory * ram['hourly_rate']
-                temp["price"] = price
-                machine_price_cache.append(temp)
-                logging.info(f"{name} Calculated as {price:.6f}")
+        for zone, specs in machine_cache.items():
+            region = self._region_of(zone)
+            for type, VMs in specs.items():
+                rates = pricing_cache.get(region, {}).get(type, {})
+                if "CPU" not in rates or "RAM" not in rates:
+                    logging.warning(f"{region}中没有{type}的定价, 跳过")
+                    continue
+                cpu, ram = rates['CPU'], rates['RAM']
+                for VM in VMs:
+                    temp = {}
+                    name = VM['name']
+                    temp['type'] = name
+                    vcpu, memory = VM['vcpu'], VM['memory_mb'] / 1024
+                    temp["CPU"], temp["RAM"] = vcpu,  memory
+                    price = vcpu * cpu['hourly_rate'] + memory * ram['hourly_rate']
+                    temp["price"] = price
+                    temp["region"], temp["zone"] = region, zone
+                    machine_price_cache.append(temp)
+                    logging.info(f"{name} in {zone} Calculated as {price:.6f}")
 
         return machine_price_cache
 
-    def export(self):
-        with open("../data/pricing.json", 'w') as fp:
+    @property
+    def catalogue(self):
+        """合并后的机型目录, 以(region, zone, flavor)为键"""
+        self._ensure_catalogue()
+        return {(x["region"], x["zone"], x["type"]): x for x in self.machine_price_cache}
+
+    def export(self, path=None):
+        """
+        :param path: 输出文件, 默认为PricingCatalogue读取的data/pricing.json
+        先写临时文件再替换, 同时load的优化器不会读到写了一半的文件
+        """
+        self._ensure_catalogue()
+        path = path or DEFAULT_PRICING
+        with open(path + ".tmp", 'w') as fp:
             res = {'gcp': self.machine_price_cache}
             json.dump(res, fp)
+        os.replace(path + ".tmp", path)
 
     def get_instance_type(self):
-        """获取集群中已经创建的实例（以ip为主键）"""
-        ip2type = defaultdict(str)
-        try:
-            request = compute_v1.ListInstancesRequest(
-                project=self.project_id,
-                zone=self.zone
-            )
-            response = self.instance_client.list(request)
-            for instance in response:
-                type = instance.machine_type.split("/")[-1]
-                internal_ip = list(instance.network_interfaces.pb)[0].network_i_p
-                ip2type[internal_ip] = type
-            return ip2type
-        except Exception as e:
-            logging.error(f"获取实例失败: {e}")
-            return None
+        """
+        获取集群中已经创建的实例（以ip为主键）, 各可用区并发查询
+        个别可用区查询失败时该可用区沿用上一次成功的结果(没有则为空), 其余可用区照常返回, 不会整体返回None
+        """
+        with ThreadPoolExecutor(max_workers=len(self.zones)) as pool:
+            futures = {x: pool.submit(self._list_instances, x) for x in self.zones}
+            ip2type, failed = defaultdict(str), []
+            for zone, future in futures.items():
+                try:
+                    self.instance_cache[zone] = {list(x.network_interfaces.pb)[0].network_i_p:
+                                                 x.machine_type.split("/")[-1] for x in future.result()}
+                except Exception as e:
+                    logging.error(f"获取可用区{zone}的实例失败: {e}")
+                    failed.append(zone)
+                ip2type.update(self.instance_cache.get(zone, {}))
+        if failed:
+            logging.warning(f"可用区{failed}的实例查询失败, 沿用上一次的结果")
+        return ip2type
+
+    def _list_instances(self, zone):
+        request = {"project": self.project_id, "zone": zone}
+        with metrics.api_call("gcp", "list_instances"):
+            return list(self.instance_client.list(request=request))
 
 
 
@@ -0,0 +1,128 @@
+import time
+from types import SimpleNamespace as NS
+from collections import Counter
+
+COMPUTE_SERVICE = "services/6F81-5844-456A"
+
+# 各机型族的按需单价(每vCPU小时, 每GiB小时), 取自README中的定价表
+DEFAULT_RATES = {
+    "c4": {"CPU": 0.0433125, "RAM": 0.0049225},
+    "n4": {"CPU": 0.0407225, "RAM": 0.0046275},
+    "c3": {"CPU": 0.0433125, "RAM": 0.0049225},
+    "e2": {"CPU": 0.03095064, "RAM": 0.00414759},
+    "c2d": {"CPU": 0.041964, "RAM": 0.005619},
+}
+
+# 每vCPU对应的GiB内存
+RAM_PER_CPU = {"c4": 3.75}
+
+
+def default_machine_types(rates=DEFAULT_RATES, sizes=(2, 4, 8)):
+    return [(f"{family}-standard-{n}", n, int(n * RAM_PER_CPU.get(family, 4) * 1024))
+            for family in rates for n in sizes]
+
+
+class OfflineCatalogue:
+    """
+    Compute和Billing客户端的离线替身, 不访问网络, 记录每个API的调用次数
+    接口与GCPMonitor用到的compute_v1.MachineTypesClient, compute_v1.InstancesClient,
+    billing_v1.CloudCatalogClient保持一致
+    """
+    service_id = COMPUTE_SERVICE
+
+    def __init__(self, regions=("australia-southeast1",), machine_types=None, rates=None, instances=None,
+                 region_factor=None, latency=0.0):
+        """
+        :param regions: 提供机型和定价的region
+        :param machine_types: [(name, vcpu, memory_mb)], 默认为rates中各族的standard-2/4/8
+        :param rates: {family: {"CPU": 每vCPU小时单价, "RAM": 每GiB小时单价}}
+        :param instances: {internal_ip: (zone, machine_type)}, 模拟集群中已创建的实例
+        :param region_factor: {region: 价格系数}, 模拟不同region的价差
+        :param latency: 每次API调用的模拟延迟(秒)
+        """
+        self.regions = list(regions)
+        self.rates = rates or DEFAULT_RATES
+        self.machine_types = machine_types or default_machine_types(self.rates)
+        self.instances = instances or {}
+        self.region_factor = region_factor or {}
+        self.latency = latency
+        self.calls = Counter()
+
+    def _call(self, api):
+        self.calls[api] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def compute_client(self):
+        return _MachineTypesClient(self)
+
+    @property
+    def billing_client(self):
+        return _CloudCatalogClient(self)
+
+    @property
+    def instance_client(self):
+        return _InstancesClient(self)
+
+    def clients(self):
+        """:return: 可直接传给GCPMonitor的关键字参数"""
+        return {"compute_client": self.compute_client,
+                "billing_client": self.billing_client,
+                "instance_client": self.instance_client}
+
+    def machine_types_in(self, zone):
+        if not any(zone.startswith(x) for x in self.regions):
+            return []
+        return [NS(name=name, guest_cpus=vcpu, memory_mb=memory_mb)
+                for name, vcpu, memory_mb in self.machine_types]
+
+    def instances_in(self, zone):
+        return [NS(machine_type=f"zones/{zone}/machineTypes/{machine_type}",
+                   network_interfaces=NS(pb=[NS(network_i_p=ip)]))
+                for ip, (z, machine_type) in self.instances.items() if z == zone]
+
+    def skus(self):
+        for region in self.regions:
+            factor = self.region_factor.get(region, 1)
+            for family, rate in self.rates.items():
+                for resource, word in (("CPU", "Core"), ("RAM", "Ram")):
+                    price = NS(currency_code="USD", units=0, nanos=round(rate[resource] * factor * 1e9))
+                    expression = NS(usage_unit_description="hour" if resource == "CPU" else "gibibyte hour",
+                                    tiered_rates=[NS(unit_price=price)])
+                    yield NS(sku_id=f"{family}-{resource}-{region}",
+                             description=f"{family.upper()} Instance {word} running in {region}",
+                             service_regions=[region],
+                             category=NS(usage_type="OnDemand", resource_group=resource),
+                             pricing_info=[NS(pricing_expression=expression)])
+
+
+class _MachineTypesClient:
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+
+    def list(self, request):
+        self.catalogue._call("list_machine_types")
+        return self.catalogue.machine_types_in(request["zone"])
+
+
+class _CloudCatalogClient:
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+
+    def list_services(self):
+        self.catalogue._call("list_services")
+        return [NS(name=self.catalogue.service_id, display_name="Compute Engine")]
+
+    def list_skus(self, parent):
+        self.catalogue._call("list_skus")
+        return list(self.catalogue.skus()) if parent == self.catalogue.service_id else []
+
+
+class _InstancesClient:
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+
+    def list(self, request):
+        self.catalogue._call("list_instances")
+        return self.catalogue.instances_in(request["zone"])
@@ -0,0 +1,43 @@
+import hashlib, json, logging, os, threading
+from pricing_model.FlavorIndex import FlavorIndex
+
+# 与包的位置绑定, 不依赖当前工作目录
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_PRICING = os.path.join(DATA_DIR, "pricing.json")
+
+
+class PricingCatalogue:
+    """
+    pricing.json的进程内共享视图: 同一文件只解析一次并建立一次FlavorIndex, 所有优化器共用
+    文件内容变化(如GCPMonitor.export后)时下次load会重新解析, version随之改变
+    """
+    _shared = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path, raw):
+        self.path = path
+        self.version = hashlib.sha1(raw).hexdigest()[:12]
+        self.gcp_pricing = json.loads(raw)['gcp']
+        self.flavor_index = FlavorIndex(self.gcp_pricing)
+        logging.info(f"Pricing catalogue {self.version} loaded from {path}")
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        :param path: pricing.json的路径, 默认为仓库data目录下的pricing.json
+        :return: 该文件对应的共享PricingCatalogue
+        """
+        path = os.path.abspath(path or DEFAULT_PRICING)
+        with cls._lock:
+            mtime = os.stat(path).st_mtime_ns
+            cached = cls._shared.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            with open(path, 'rb') as fp:
+                catalogue = cls(path, fp.read())
+            cls._shared[path] = (mtime, catalogue)
+            return catalogue
+
+    @property
+    def flavors(self):
+        return self.flavor_index.flavors
@@ -0,0 +1,62 @@
+from kubernetes.client.rest import ApiException
+from collections import Counter
+from replay.FakeCoreV1Api import FakeResponse
+import copy, json, threading, time
+
+
+class FakeCoordinationV1Api:
+    """
+    进程内的CoordinationV1Api替身, 只实现Lease的读取、创建和替换
+    替换时body中的metadata.resourceVersion必须与当前版本一致, 否则返回409, 与API Server的乐观并发语义相同
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.leases = {}
+        self.rv = 0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, api):
+        self.calls[api] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _response(lease, _preload_content):
+        if not _preload_content:
+            return FakeResponse(json.dumps(lease).encode())
+        return lease
+
+    def read_namespaced_lease(self, name, namespace, _preload_content=True, **kwargs):
+        self._call("read_namespaced_lease")
+        with self._lock:
+            lease = copy.deepcopy(self.leases.get((namespace, name)))
+        if lease is None:
+            raise ApiException(status=404, reason="Not Found")
+        return self._response(lease, _preload_content)
+
+    def create_namespaced_lease(self, namespace, body, _preload_content=True, **kwargs):
+        self._call("create_namespaced_lease")
+        key = (namespace, body["metadata"]["name"])
+        with self._lock:
+            if key in self.leases:
+                raise ApiException(status=409, reason="AlreadyExists")
+            self.rv += 1
+            lease = copy.deepcopy(body)
+            lease["metadata"].update({"namespace": namespace, "resourceVersion": str(self.rv)})
+            self.leases[key] = lease
+            return self._response(copy.deepcopy(lease), _preload_content)
+
+    def replace_namespaced_lease(self, name, namespace, body, _preload_content=True, **kwargs):
+        self._call("replace_namespaced_lease")
+        with self._lock:
+            current = self.leases.get((namespace, name))
+            if current is None:
+                raise ApiException(status=404, reason="Not Found")
+            if body["metadata"].get("resourceVersion") != current["metadata"]["resourceVersion"]:
+                raise ApiException(status=409, reason="Conflict")
+            self.rv += 1
+            lease = copy.deepcopy(body)
+            lease["metadata"].update({"namespace": namespace, "resourceVersion": str(self.rv)})
+            self.leases[(namespace, name)] = lease
+            return self._response(copy.deepcopy(lease), _preload_content)
@@ -0,0 +1,273 @@
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from collections import Counter
+import bisect, copy, json, threading, time
+
+
+class FakeResponse:
+    """模拟_preload_content=False时返回的urllib3响应, 可被watch.Watch逐行读取"""
+    def __init__(self, data=b"", lines=None):
+        self.data = data
+        self.status = 200
+        self._lines = lines
+
+    def stream(self, amt=None, decode_content=False):
+        if self._lines is None:
+            yield self.data
+            return
+        yield from self._lines
+
+    def read_chunked(self, decode_content=False):
+        return self.stream()
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+    def getheaders(self):
+        return {}
+
+
+class FakeCoreV1Api:
+    """
+    进程内的CoreV1Api替身, 基于Recorder录制的node/pod列表和watch事件
+    支持分页list、field/label selector、按resourceVersion的watch、读取pod和绑定pod、读取节点和带版本前提的patch节点,
+    录制的事件按录制时的时间间隔除以speed回放, 每次API调用附加latency秒的模拟延迟
+    """
+    def __init__(self, data, latency=0.0, speed=1.0):
+        """
+        :param data: 录制文件中的"k8s"部分
+        :param latency: 每次API调用的模拟延迟(秒)
+        :param speed: 回放速度, 大于1时快于真实时间
+        """
+        self.latency = latency
+        self.speed = speed
+        self.nodes = {x["metadata"]["name"]: x for x in data["nodes"]["items"]}
+        self.pods = {(x["metadata"]["namespace"], x["metadata"]["name"]): x for x in data["pods"]["items"]}
+        self.rv = max(int(data["nodes"]["metadata"]["resourceVersion"]), int(data["pods"]["metadata"]["resourceVersion"]))
+        self.compacted = 0
+        self.bindings = []
+        self.calls = Counter()
+        self._log, self._log_rv = [], []
+        self._cond = threading.Condition()
+        self._api_client = client.ApiClient()
+        threading.Thread(target=self._replay_events, args=(data["events"],), daemon=True).start()
+
+    def _call(self, api):
+        self.calls[api] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _replay_events(self, events):
+        start = time.monotonic()
+        for event in events:
+            delay = event["offset"] / self.speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+            if event["type"] in ("ADDED", "MODIFIED", "DELETED"):
+                self._apply("pod", event["type"], copy.deepcopy(event["object"]))
+
+    def _apply(self, kind, type, obj):
+        """修改对象并写入事件日志, 唤醒正在watch的请求"""
+        with self._cond:
+            self.rv += 1
+            obj["metadata"]["resourceVersion"] = str(self.rv)
+            store = self.nodes if kind == "node" else self.pods
+            key = obj["metadata"]["name"] if kind == "node" else (obj["metadata"]["namespace"], obj["metadata"]["name"])
+            if type == "DELETED":
+                store.pop(key, None)
+            else:
+                store[key] = obj
+            self._log.append((self.rv, kind, copy.deepcopy(obj), json.dumps({"type": type, "object": obj}).encode()))
+            self._log_rv.append(self.rv)
+            self._cond.notify_all()
+
+    def compact(self):
+        """丢弃事件日志, 之后从旧resourceVersion开始的watch会收到410 Gone"""
+        with self._cond:
+            self.compacted = self.rv
+            self._log, self._log_rv = [], []
+
+    @staticmethod
+    def _field(obj, path):
+        for part in path.split("."):
+            obj = obj.get(part, {}) if isinstance(obj, dict) else {}
+        return "" if obj is None or obj == {} else obj
+
+    def _match(self, obj, namespace=None, field_selector=None, label_selector=None):
+        if namespace is not None and obj["metadata"].get("namespace") != namespace:
+            return False
+        for term in (field_selector or "").split(","):
+            if "!=" in term:
+                path, value = term.split("!=")
+                if str(self._field(obj, path)) == value:
+                    return False
+            elif "=" in term:
+                path, value = term.replace("==", "=").split("=")
+                if str(self._field(obj, path)) != value:
+                    return False
+        labels = obj["metadata"].get("labels") or {}
+        for term in (label_selector or "").split(","):
+            if "!=" in term:
+                key, value = term.split("!=")
+                if labels.get(key) == value:
+                    return False
+            elif "=" in term:
+                key, value = term.replace("==", "=").split("=")
+                if labels.get(key) != value:
+                    return False
+            elif term and term not in labels:
+                return False
+        return True
+
+    def _deserialize(self, body, klass):
+        return self._api_client._ApiClient__deserialize(body, klass)
+
+    def _list(self, kind, klass, namespace=None, field_selector=None, label_selector=None, limit=None,
+              _continue=None, watch=False, resource_version=None, timeout_seconds=None,
+              _preload_content=True, **kwargs):
+        if watch:
+            return self._watch(kind, namespace, field_selector, label_selector, resource_version, timeout_seconds)
+        with self._cond:
+            store = self.nodes if kind == "node" else self.pods
+            items = [store[x] for x in sorted(store) if self._match(store[x], namespace, field_selector, label_selector)]
+            rv = self.rv
+        start = int(_continue or 0)
+        page = items[start:start + limit] if limit else items[start:]
+        more = start + len(page) < len(items)
+        body = {"apiVersion": "v1", "kind": klass[2:],
+                "metadata": {"resourceVersion": str(rv), "continue": str(start + len(page)) if more else None},
+                "items": copy.deepcopy(page)}
+        if not _preload_content:
+            return FakeResponse(json.dumps(body).encode())
+        return self._deserialize(body, klass)
+
+    def _watch(self, kind, namespace, field_selector, label_selector, resource_version, timeout_seconds):
+        deadline = time.monotonic() + (timeout_seconds or 300) / self.speed
+
+        def lines():
+            since, initial = int(resource_version or 0), []
+            with self._cond:
+                expired = since and since < self.compacted
+                if not since:
+                    # resourceVersion为0时先以ADDED事件发送当前所有对象
+                    store = self.nodes if kind == "node" else self.pods
+                    initial = [copy.deepcopy(store[x]) for x in sorted(store)]
+                    since = self.rv
+            if expired:
+                error = {"type": "ERROR", "object": {"kind": "Status", "code": 410, "reason": "Expired",
+                                                      "message": f"too old resource version: {since}"}}
+                yield json.dumps(error).encode() + b"\n"
+                return
+            for obj in initial:
+                if self._match(obj, namespace, field_selector, label_selector):
+                    yield json.dumps({"type": "ADDED", "object": obj}).encode() + b"\n"
+            while True:
+                with self._cond:
+                    pending = self._log[bisect.bisect_right(self._log_rv, since):]
+                    if not pending:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return
+                        self._cond.wait(remaining)
+                        continue
+                for rv, event_kind, obj, line in pending:
+                    since = rv
+                    if event_kind == kind and self._match(obj, namespace, field_selector, label_selector):
+                        yield line + b"\n"
+
+        return FakeResponse(lines=lines())
+
+    def list_node(self, **kwargs):
+        """
+        :return: V1NodeList
+        :rtype: V1NodeList
+        """
+        self._call("list_node")
+        return self._list("node", "V1NodeList", **kwargs)
+
+    def read_node(self, name, _preload_content=True, **kwargs):
+        """
+        :return: V1Node
+        :rtype: V1Node
+        """
+        self._call("read_node")
+        with self._cond:
+            node = copy.deepcopy(self.nodes.get(name))
+        if node is None:
+            raise ApiException(status=404, reason="Not Found")
+        if not _preload_content:
+            return FakeResponse(json.dumps(node).encode())
+        return self._deserialize(node, "V1Node")
+
+    def patch_node(self, name, body, **kwargs):
+        """
+        只支持修改metadata.labels/annotations的merge patch(值为None时删除)
+        patch中带metadata.resourceVersion时作为前提条件, 与当前版本不一致返回409
+        """
+        self._call("patch_node")
+        metadata = body.get("metadata", {})
+        with self._cond:
+            node = self.nodes.get(name)
+            if node is None:
+                raise ApiException(status=404, reason="Not Found")
+            expected = metadata.get("resourceVersion")
+            if expected is not None and expected != node["metadata"]["resourceVersion"]:
+                raise ApiException(status=409, reason="Conflict")
+            node = copy.deepcopy(node)
+            for field in ("labels", "annotations"):
+                values = node["metadata"].setdefault(field, {})
+                for key, value in (metadata.get(field) or {}).items():
+                    if value is None:
+                        values.pop(key, None)
+                    else:
+                        values[key] = value
+            self._apply("node", "MODIFIED", node)
+        return FakeResponse(json.dumps(node).encode())
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        """
+        :return: V1PodList
+        :rtype: V1PodList
+        """
+        self._call("list_namespaced_pod")
+        return self._list("pod", "V1PodList", namespace=namespace, **kwargs)
+
+    def list_pod_for_all_namespaces(self, **kwargs):
+        """
+        :return: V1PodList
+        :rtype: V1PodList
+        """
+        self._call("list_pod_for_all_namespaces")
+        return self._list("pod", "V1PodList", **kwargs)
+
+    def read_namespaced_pod(self, name, namespace, **kwargs):
+        """
+        :return: V1Pod
+        :rtype: V1Pod
+        """
+        self._call("read_namespaced_pod")
+        with self._cond:
+            pod = copy.deepcopy(self.pods.get((namespace, name)))
+        if pod is None:
+            raise ApiException(status=404, reason="Not Found")
+        return self._deserialize(pod, "V1Pod")
+
+    def create_namespaced_pod_binding(self, name, namespace, body, **kwargs):
+        """绑定成功后pod直接进入Running, 模拟kubelet启动容器"""
+        self._call("create_namespaced_pod_binding")
+        target = body.target.name if hasattr(body, "target") else body["target"]["name"]
+        with self._cond:
+            pod = self.pods.get((namespace, name))
+            if pod is None:
+                raise ApiException(status=404, reason="Not Found")
+            if pod["spec"].get("nodeName"):
+                raise ApiException(status=409, reason="Conflict")
+            pod = copy.deepcopy(pod)
+            pod["spec"]["nodeName"] = target
+            pod["status"]["phase"] = "Running"
+            self._apply("pod", "MODIFIED", pod)
+            self.bindings.append((namespace, name, target))
+        return FakeResponse(b"{}")
@@ -0,0 +1,29 @@
+from types import SimpleNamespace as NS
+from pricing_model.OfflineClients import OfflineCatalogue
+
+
+class RecordedCatalogue(OfflineCatalogue):
+    """用Recorder录制的机型、SKU和实例数据回放Compute和Billing客户端"""
+    def __init__(self, data, latency=0.0):
+        """
+        :param data: 录制文件中的"gcp"部分
+        :param latency: 每次API调用的模拟延迟(秒)
+        """
+        super().__init__(regions=sorted({x.rsplit("-", 1)[0] for x in data["zones"]}), latency=latency)
+        self.data = data
+        self.service_id = data["compute_service_id"]
+
+    def machine_types_in(self, zone):
+        return [NS(**x) for x in self.data["machine_types"].get(zone, [])]
+
+    def instances_in(self, zone):
+        return [NS(machine_type=x["machine_type"], network_interfaces=NS(pb=[NS(network_i_p=x["ip"])]))
+                for x in self.data["instances"].get(zone, [])]
+
+    def skus(self):
+        for x in self.data["skus"]:
+            price = NS(currency_code=x["currency"], units=x["units"], nanos=x["nanos"])
+            expression = NS(usage_unit_description=x["usage_unit"], tiered_rates=[NS(unit_price=price)])
+            yield NS(sku_id=x["sku_id"], description=x["description"], service_regions=x["service_regions"],
+                     category=NS(usage_type=x["usage_type"], resource_group=x["resource_group"]),
+                     pricing_info=[NS(pricing_expression=expression)])
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import watch
+import json, logging, time
+
+
+class Recorder:
+    """
+    录制集群和GCP的真实响应, 供FakeCoreV1Api和RecordedCatalogue离线回放
+    Kubernetes部分保存原始JSON(list结果和一段时间内的watch事件), GCP部分只保存GCPMonitor读取的字段
+    """
+    def __init__(self, cluster_monitor, gcp_monitor):
+        self.cluster_monitor = cluster_monitor
+        self.gcp_monitor = gcp_monitor
+
+    def record(self, path, watch_seconds=0):
+        """
+        :param watch_seconds: 录制pod watch事件的时长(秒), 0表示只录制list结果
+        """
+        data = {"version": 1, "k8s": self._record_k8s(watch_seconds), "gcp": self._record_gcp()}
+        with open(path, 'w') as fp:
+            json.dump(data, fp)
+        logging.info(f"Recorded {len(data['k8s']['nodes']['items'])} nodes, {len(data['k8s']['pods']['items'])} pods, "
+                     f"{len(data['k8s']['events'])} events to {path}")
+
+    @staticmethod
+    def _raw(func, *args):
+        return json.loads(func(*args, _preload_content=False).data)
+
+    def _record_k8s(self, watch_seconds):
+        """
+        按ClusterMonitor的namespace录制pod: None时list/watch所有namespace, 否则逐个namespace list,
+        各namespace的watch并发进行; 结果合并为一个pod列表, resourceVersion取各次list中最大的
+        """
+        core_v1, namespace = self.cluster_monitor.core_v1, self.cluster_monitor.namespace
+        nodes = self._raw(core_v1.list_node)
+        if namespace is None:
+            listers = [(core_v1.list_pod_for_all_namespaces, ())]
+        else:
+            listers = [(core_v1.list_namespaced_pod, (x,)) for x in self.cluster_monitor.namespaces]
+        lists = [(func, args, self._raw(func, *args)) for func, args in listers]
+        pods = {"metadata": {"resourceVersion": str(max(int(x["metadata"]["resourceVersion"]) for _, _, x in lists))},
+                "items": [item for _, _, x in lists for item in x["items"]]}
+
+        events, start = [], time.time()
+        if watch_seconds:
+            with ThreadPoolExecutor(max_workers=len(lists)) as pool:
+                streams = [pool.submit(self._watch, func, args, x["metadata"]["resourceVersion"], watch_seconds, start)
+                           for func, args, x in lists]
+                events = sorted((event for x in streams for event in x.result()), key=lambda x: x["offset"])
+        return {"namespace": namespace, "nodes": nodes, "pods": pods, "events": events}
+
+    @staticmethod
+    def _watch(func, args, resource_version, watch_seconds, start):
+        stream = watch.Watch().stream(func, *args, resource_version=resource_version, timeout_seconds=watch_seconds)
+        return [{"offset": time.time() - start, "type": event["type"], "object": event["raw_object"]}
+                for event in stream]
+
+    def _record_gcp(self):
+        gcp = self.gcp_monitor
+        if gcp.compute_service_id is None:
+            gcp._find_compute_service()
+
+        machine_types = {}
+        for zone in gcp.zones:
+            request = {"project": gcp.project_id, "zone": zone}
+            machine_types[zone] = [{"name": x.name, "guest_cpus": x.guest_cpus, "memory_mb": x.memory_mb}
+                                   for x in gcp.compute_client.list(request=request)]
+
+        instances = {zone: [{"machine_type": x.machine_type,
+                             "ip": list(x.network_interfaces.pb)[0].network_i_p}
+                            for x in gcp._list_instances(zone)]
+                     for zone in gcp.zones}
+        return {"project": gcp.project_id, "zones": gcp.zones, "compute_service_id": gcp.compute_service_id,
+                "machine_types": machine_types, "skus": [self._sku(x) for x in gcp._list_skus()],
+                "instances": instances}
+
+    @staticmethod
+    def _sku(sku):
+        expression = sku.pricing_info[-1].pricing_expression
+        price = expression.tiered_rates[-1].unit_price
+        return {"sku_id": sku.sku_id, "description": sku.description,
+                "service_regions": list(sku.service_regions),
+                "usage_type": sku.category.usage_type, "resource_group": sku.category.resource_group,
+                "usage_unit": expression.usage_unit_description,
+                "currency": price.currency_code, "units": price.units, "nanos": price.nanos}
+
+
+if __name__ == "__main__":
+    import argparse, os
+    from cluster.Monitor import ClusterMonitor
+    from pricing_model.Monitor import GCPMonitor
+    parser = argparse.ArgumentParser(description="录制集群和GCP响应")
+    parser.add_argument("path")
+    parser.add_argument("--watch-seconds", type=int, default=0)
+    parser.add_argument("--zones", nargs="+", default=None)
+    args = parser.parse_args()
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "../configurations/single-cloud-ylxq-ed1608c43bb4.json")
+    gcp = GCPMonitor(project_id=os.getenv("GCP_PROJECT", default="single-cloud-ylxq"), zones=args.zones)
+    Recorder(ClusterMonitor(), gcp).record(args.path, args.watch_seconds)
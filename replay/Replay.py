@@ -0,0 +1,73 @@
+"""
+用录制文件离线运行完整的Scheduler调度流程, 统计每轮schedule的耗时
+
+    cd replay && PYTHONPATH=.. python Replay.py recording.json --latency 0.02 --speed 10 --cycles 5
+"""
+import argparse, json, logging, time
+from cluster.Scheduler import Scheduler
+from cluster.ShardedScheduler import ShardedScheduler
+from replay.FakeCoreV1Api import FakeCoreV1Api
+from replay.RecordedCatalogue import RecordedCatalogue
+from utils import metrics
+
+
+def build_scheduler(path, latency=0.0, speed=1.0, informer=True, namespaces=None, **options):
+    """
+    :param namespaces: 不为None时使用按namespace分片的ShardedScheduler
+    :param options: 传给Scheduler的其他参数(如metrics_port, profile_dir)
+    :return: (运行在替身API上的Scheduler, FakeCoreV1Api, RecordedCatalogue)
+    """
+    with open(path, 'r') as fp:
+        data = json.load(fp)
+    core_v1 = FakeCoreV1Api(data["k8s"], latency=latency, speed=speed)
+    catalogue = RecordedCatalogue(data["gcp"], latency=latency)
+    gcp_options = {"zones": data["gcp"]["zones"], "cache_path": None, **catalogue.clients()}
+    if namespaces is not None:
+        scheduler = ShardedScheduler(namespaces=namespaces, informer=informer, core_v1=core_v1,
+                                     gcp_options=gcp_options, **options)
+    else:
+        scheduler = Scheduler(informer=informer, core_v1=core_v1, gcp_options=gcp_options, **options)
+    return scheduler, core_v1, catalogue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次API调用的模拟延迟(秒)")
+    parser.add_argument("--speed", type=float, default=1.0, help="watch事件的回放速度倍数")
+    parser.add_argument("--cycles", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=0.0, help="两轮调度之间的真实间隔(秒)")
+    parser.add_argument("--no-informer", action="store_true")
+    parser.add_argument("--metrics-port", type=int, default=None, help="在本地该端口导出Prometheus指标")
+    parser.add_argument("--profile-dir", default=None, help="每轮schedule的cProfile结果输出目录")
+    parser.add_argument("--dump-metrics", action="store_true", help="结束时打印全部指标")
+    parser.add_argument("--raw-lists", action="store_true", help="list时跳过模型反序列化, 直接解析JSON")
+    parser.add_argument("--plan-cache", type=int, default=0, help="CABFD前方案缓存的容量, 0为不缓存")
+    parser.add_argument("--namespaces", default=None, help="逗号分隔的namespace列表, 给出时按namespace分片并行规划")
+    parser.add_argument("--shard-workers", type=int, default=4, help="分片规划的工作进程数(每个分片固定在其中一个进程上)")
+    parser.add_argument("--incremental", type=int, default=0, help="增量规划, 每隔该轮数全量规划一次, 0为每轮全量")
+    parser.add_argument("--optimizer", default="CABFD", choices=["CABFD", "BatchBFD"], help="规划新节点的优化器")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scheduler, core_v1, catalogue = build_scheduler(args.path, args.latency, args.speed, not args.no_informer,
+                                                    metrics_port=args.metrics_port, profile_dir=args.profile_dir,
+                                                    monitor_options={"raw": args.raw_lists},
+                                                    plan_cache=args.plan_cache, incremental=args.incremental,
+                                                    optimizer=args.optimizer,
+                                                    **({"namespaces": args.namespaces.split(","),
+                                                        "workers": args.shard_workers} if args.namespaces else {}))
+    logging.info(f"Scheduler就绪, 耗时{time.perf_counter() - start:.3f}s")
+    for cycle in range(args.cycles):
+        start = time.perf_counter()
+        placements, schedule = scheduler.schedule()
+        logging.info(f"第{cycle + 1}轮调度耗时{time.perf_counter() - start:.3f}s, "
+                        f"放置{len(placements)}个pod, 规划{len(schedule)}个新节点")
+        time.sleep(args.interval)
+    logging.info(f"Kubernetes API调用: {dict(core_v1.calls)}, GCP API调用: {dict(catalogue.calls)}")
+    if args.dump_metrics:
+        print(metrics.render())
+
+
+if __name__ == "__main__":
+    main()
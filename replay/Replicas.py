@@ -0,0 +1,104 @@
+"""
+在同一个进程内的替身API Server上同时运行多个ReplicaScheduler副本, 检查乐观并发提交的结果:
+每个pod只绑定一次、节点没有超量放置、任何时刻只有一个副本规划新节点
+
+    cd replay && PYTHONPATH=.. python Replicas.py recording.json --replicas 3 --cycles 5
+    cd replay && PYTHONPATH=.. python Replicas.py recording.json --replicas 3 --cycles 6 --failover 3
+"""
+import argparse, json, logging, threading, time
+from collections import Counter
+from cluster.ReplicaScheduler import ReplicaScheduler
+from replay.FakeCoreV1Api import FakeCoreV1Api
+from replay.FakeCoordinationV1Api import FakeCoordinationV1Api
+from replay.RecordedCatalogue import RecordedCatalogue
+from utils.quantity import cpu_millis, memory_bytes
+from utils import metrics
+
+
+def build_replicas(path, replicas, latency=0.0, speed=1.0, lease_duration=2, **options):
+    """:return: (副本列表, FakeCoreV1Api, FakeCoordinationV1Api)"""
+    with open(path, 'r') as fp:
+        data = json.load(fp)
+    core_v1 = FakeCoreV1Api(data["k8s"], latency=latency, speed=speed)
+    coordination_v1 = FakeCoordinationV1Api(latency=latency)
+    schedulers = []
+    for i in range(replicas):
+        catalogue = RecordedCatalogue(data["gcp"], latency=latency)
+        gcp_options = {"zones": data["gcp"]["zones"], "cache_path": None, **catalogue.clients()}
+        schedulers.append(ReplicaScheduler(identity=f"replica-{i}", coordination_v1=coordination_v1,
+                                           lease_options={"lease_duration": lease_duration, "retry_period": 0},
+                                           core_v1=core_v1, gcp_options=gcp_options, **options))
+    return schedulers, core_v1, coordination_v1
+
+
+def overcommitted(core_v1):
+    """:return: 已绑定pod的request之和超过容量的节点"""
+    used = {}
+    with core_v1._cond:
+        for pod in core_v1.pods.values():
+            node = pod["spec"].get("nodeName")
+            if not node or pod["status"].get("phase") in ("Succeeded", "Failed"):
+                continue
+            requests = [(x.get("resources") or {}).get("requests") or {} for x in pod["spec"]["containers"]]
+            cpu, ram = used.get(node, (0, 0))
+            used[node] = (cpu + sum(cpu_millis(x.get("cpu")) for x in requests),
+                          ram + sum(memory_bytes(x.get("memory")) for x in requests))
+        capacity = {name: (cpu_millis(x["status"]["capacity"]["cpu"]), memory_bytes(x["status"]["capacity"]["memory"]))
+                    for name, x in core_v1.nodes.items()}
+    return [x for x, (cpu, ram) in used.items()
+            if x in capacity and (cpu > capacity[x][0] or ram > capacity[x][1])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=0.5, help="两轮调度之间的真实间隔(秒)")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次API调用的模拟延迟(秒)")
+    parser.add_argument("--speed", type=float, default=1.0, help="watch事件的回放速度倍数")
+    parser.add_argument("--lease-duration", type=float, default=2, help="Lease有效期(秒)")
+    parser.add_argument("--failover", type=int, default=None, help="在该轮之后停止当前leader, 检查其他副本接管")
+    args = parser.parse_args()
+
+    schedulers, core_v1, coordination_v1 = build_replicas(args.path, args.replicas, args.latency, args.speed,
+                                                          args.lease_duration)
+    alive, leaders = list(schedulers), []
+    for cycle in range(args.cycles):
+        barrier = threading.Barrier(len(alive))
+        results = {}
+
+        def run(scheduler):
+            barrier.wait()
+            results[scheduler.identity] = scheduler.schedule()
+
+        threads = [threading.Thread(target=run, args=(x,)) for x in alive]
+        _ = [x.start() for x in threads]
+        _ = [x.join() for x in threads]
+        planners = [x for x, (_, plan) in results.items() if plan]
+        leaders.append([x.identity for x in alive if x.elector.leader])
+        logging.info(f"第{cycle + 1}轮: 放置{ {x: len(p) for x, (p, _) in results.items()} }, "
+                     f"规划新节点的副本{planners}, leader {leaders[-1]}")
+        if len(planners) > 1:
+            logging.error(f"第{cycle + 1}轮有多个副本规划了新节点: {planners}")
+        if args.failover is not None and cycle + 1 == args.failover:
+            stopped = [x for x in alive if x.elector.leader]
+            for scheduler in stopped:
+                logging.info(f"停止leader {scheduler.identity}, 不释放Lease")
+                scheduler.cluster_monitor.stop_informer()
+            alive = [x for x in alive if x not in stopped]
+        time.sleep(args.interval)
+
+    bound = Counter((ns, name) for ns, name, _ in core_v1.bindings)
+    twice = [x for x, n in bound.items() if n > 1]
+    nodes = overcommitted(core_v1)
+    logging.info(f"绑定{len(core_v1.bindings)}次, 涉及{len(bound)}个pod, 重复绑定{len(twice)}个, 超量放置的节点{nodes}")
+    logging.info(f"Kubernetes API调用: {dict(core_v1.calls)}, Lease API调用: {dict(coordination_v1.calls)}")
+    print("\n".join(metrics.REPLICA_CONFLICTS.render()))
+    for scheduler in alive:
+        scheduler.close()
+    return 1 if twice or nodes or any(len(x) > 1 for x in leaders) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
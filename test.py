@@ -1,5 +1,8 @@
 from kubernetes import client, config, watch
-import time
+import os, time
+
+# 逗号分隔的namespace列表
+NAMESPACES = os.getenv("SCHEDULER_NAMESPACES", "default").split(",")
 
 
 def main():
@@ -15,17 +18,19 @@ def main():
         process_pod(pod, v1)
 
 
-def get_pending_pods(v1):
-    """获取待调度的Pod列表"""
-    try:
-        field_selector = "status.phase=Pending"
-        return v1.list_namespaced_pod(
-            namespace="default",
-            field_selector=field_selector
-        ).items
-    except Exception as e:
-        print(f"获取Pod列表失败: {str(e)}")
-        return []
+def get_pending_pods(v1, namespaces=NAMESPACES):
+    """获取各namespace中待调度的Pod列表"""
+    pods = []
+    for namespace in namespaces:
+        try:
+            field_selector = "status.phase=Pending"
+            pods += v1.list_namespaced_pod(
+                namespace=namespace,
+                field_selector=field_selector
+            ).items
+        except Exception as e:
+            print(f"获取{namespace}的Pod列表失败: {str(e)}")
+    return pods
 
 def filter_unscheduled_pods(pods, scheduler_name):
     """筛选需要本调度器处理的Pod"""
@@ -45,7 +50,7 @@ def process_pod(pod, v1):
     print(f"开始处理Pod: {pod_name}")
 
     if node_name := select_target_node(v1):
-        if bind_pod_to_node(pod_name, node_name,v1):
+        if bind_pod_to_node(pod_name, node_name,v1, pod.metadata.namespace):
             return True
     else:
         print(f"没有可用节点可以调度 {pod_name}")
@@ -73,7 +78,7 @@ def is_valid_node(node):
     has_work1_label = node.metadata.name == "master-1"
     return node_ready and has_work1_label
 
-def bind_pod_to_node( pod_name, node_name,v1):
+def bind_pod_to_node( pod_name, node_name,v1, namespace="default"):
     """执行Pod绑定操作"""
     try:
         target_ref = client.V1ObjectReference(
@@ -91,7 +96,7 @@ def bind_pod_to_node( pod_name, node_name,v1):
         )
         api_response = v1.create_namespaced_pod_binding(
             name=pod_name,
-            namespace="default",
+            namespace=namespace,
             body=binding_body
         )
         print(f"成功绑定 {pod_name} 到 {node_name}")
@@ -0,0 +1,4 @@
+import os, sys
+
+# 仓库中的模块以仓库根目录为导入起点(cluster.*, optimizer.*, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+import random
+from collections import Counter
+import pytest
+from optimizer.BatchBFD import BatchBFD, _Group
+from utils.resources import Pod
+
+
+def check(schedule, batch):
+    """每个pod恰好分配一次, 没有节点超出机型容量"""
+    assert Counter(id(p) for x in schedule for p in x.pods) == Counter(map(id, batch))
+    assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in schedule)
+
+
+def mixed(n, seed):
+    rnd = random.Random(seed)
+    return [Pod({"CPU": round(rnd.uniform(0.1, 4), 1), "RAM": round(rnd.uniform(0.1, 16), 2)}) for _ in range(n)]
+
+
+def replica_heavy(seed):
+    rnd = random.Random(seed)
+    shapes = [{"CPU": rnd.choice([0.25, 0.5, 1, 2]), "RAM": rnd.choice([0.5, 1, 2, 4, 8])} for _ in range(6)]
+    return [Pod(shape) for shape in shapes for _ in range(rnd.randint(1, 400))]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_mixed_batches(seed):
+    batch = mixed(300, seed)
+    check(BatchBFD().optimize(batch), batch)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_replica_heavy_batches(seed):
+    batch = replica_heavy(seed)
+    schedule = BatchBFD().optimize(batch)
+    check(schedule, batch)
+    # 整组放置: 相同机型和部署组合的节点可以有很多个, 但组合种类远少于节点数
+    combos = Counter((x.type, tuple(sorted(Counter((p.milli_cpu, p.ram_bytes) for p in x.pods).items())))
+                     for x in schedule)
+    assert len(combos) < len(schedule)
+
+
+def test_zero_request_and_single_pods():
+    batch = [Pod({"CPU": 0, "RAM": 0}) for _ in range(3)] + [Pod({"CPU": 1, "RAM": 1})]
+    check(BatchBFD().optimize(batch), batch)
+    assert BatchBFD().optimize([]) == []
+
+
+def test_oversized_pod_raises():
+    with pytest.raises(ValueError):
+        BatchBFD().optimize([Pod({"CPU": 10_000, "RAM": 1})])
+
+
+def test_group_split_and_place():
+    flavor = {"type": "t", "CPU": 4, "RAM": 16, "price": 0.2}
+    group = _Group(flavor, count=5)
+    group.place((1000, 2**30), 2)
+    part = group.split(2)
+    part.place((500, 2**29), 3)
+    assert (group.count, part.count) == (3, 2)
+    assert group.shapes == {(1000, 2**30): 2}
+    assert part.shapes == {(1000, 2**30): 2, (500, 2**29): 3}
+    assert (part.used_cpu, part.used_ram) == (3500, 2 * 2**30 + 3 * 2**29)
+    assert (group.used_cpu, group.used_ram) == (2000, 2 * 2**30)
+
+
+def test_partial_fill_splits_groups(monkeypatch):
+    """小shape的副本数不足以填满整组节点时, 节点组被拆开, 拆出的节点仍然可行"""
+    splits = []
+    split = _Group.split
+    monkeypatch.setattr(_Group, "split", lambda self, count: splits.append(count) or split(self, count))
+    batch = [Pod({"CPU": 1, "RAM": 6}) for _ in range(40)] + [Pod({"CPU": 0.5, "RAM": 1}) for _ in range(7)]
+    schedule = BatchBFD().optimize(batch)
+    check(schedule, batch)
+    assert splits
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+from kubernetes.client.rest import ApiException
+from cluster.Binder import Binder
+from utils.resources import Pod
+
+
+class FakeCoreV1Api:
+    """按pod名依次返回预设的结果: None为成功, 整数为该HTTP状态的ApiException"""
+    def __init__(self, responses, owners=None):
+        self.responses = {k: list(v) for k, v in responses.items()}
+        self.owners = owners or {}
+        self.calls = []
+
+    def create_namespaced_pod_binding(self, name, namespace, body, **kwargs):
+        self.calls.append((name, body["target"]["name"]))
+        status = self.responses[name].pop(0) if self.responses.get(name) else None
+        if status is not None:
+            raise ApiException(status=status, reason="fake")
+
+    def read_namespaced_pod(self, name, namespace):
+        return SimpleNamespace(spec=SimpleNamespace(node_name=self.owners.get(name)))
+
+
+def pod(name):
+    return Pod({"CPU": 1, "RAM": 1, "name": name, "namespace": "default"})
+
+
+def bind(core_v1, *names):
+    binder = Binder(core_v1=core_v1, workers=2, retries=2, backoff=0)
+    return {x["pod"]: x for x in binder.bind([(pod(name), "node-a") for name in names])}
+
+
+def test_bound_and_409_resolution():
+    core_v1 = FakeCoreV1Api({"mine": [409], "theirs": [409]}, owners={"mine": "node-a", "theirs": "node-b"})
+    results = bind(core_v1, "ok", "mine", "theirs")
+    assert results["ok"]["status"] == "bound" and results["ok"]["attempts"] == 1
+    # 409且已绑定到目标节点(如上一次请求其实成功了): 视为绑定成功
+    assert results["mine"]["status"] == "bound" and results["mine"]["node"] == "node-a"
+    # 409且被其他调度器绑定到别的节点: 冲突, 不再重试
+    assert results["theirs"]["status"] == "conflict" and results["theirs"]["node"] == "node-b"
+    assert results["theirs"]["attempts"] == 1
+
+
+def test_retryable_errors():
+    core_v1 = FakeCoreV1Api({"flaky": [429, 503], "down": [500, 502, 504], "bad": [422]})
+    results = bind(core_v1, "flaky", "down", "bad")
+    assert results["flaky"]["status"] == "bound" and results["flaky"]["attempts"] == 3
+    # 重试次数用完仍失败
+    assert results["down"]["status"] == "failed" and results["down"]["attempts"] == 3
+    assert results["down"]["error"].startswith("504")
+    # 不可重试的状态码直接失败
+    assert results["bad"]["status"] == "failed" and results["bad"]["attempts"] == 1
+
+
+def test_409_unresolved_is_retried():
+    """409但读不到pod的归属时按可重试错误处理"""
+    core_v1 = FakeCoreV1Api({"gone": [409, 409, 409]})
+    results = bind(core_v1, "gone")
+    assert results["gone"]["status"] == "failed" and results["gone"]["attempts"] == 3
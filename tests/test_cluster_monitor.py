@@ -0,0 +1,90 @@
+import threading, time
+from kubernetes.client.rest import ApiException
+from cluster.Monitor import ClusterMonitor
+
+
+class ExpiredApi:
+    """watch总是返回410 Gone, list总是失败(如API Server过载)"""
+    def __init__(self):
+        self.lists = 0
+
+    def list_node(self, watch=False, **kwargs):
+        """
+        :rtype: V1NodeList
+        """
+        if watch:
+            raise ApiException(status=410, reason="Gone")
+        self.lists += 1
+        raise ApiException(status=503, reason="Service Unavailable")
+
+
+def test_failed_relist_backs_off():
+    api = ExpiredApi()
+    monitor = ClusterMonitor(core_v1=api)
+    assert monitor.get_nodes() is False
+    watcher = threading.Thread(target=monitor._watch, args=("node",), daemon=True)
+    watcher.start()
+    time.sleep(0.5)
+    monitor.stop_informer()
+    watcher.join(1)
+    assert not watcher.is_alive()
+    assert api.lists == 2       # 一次get_nodes, 一次410后的relist, 之后等待退避
+
+
+def node(name, cpu="4", memory="16Gi"):
+    return {"metadata": {"name": name, "resourceVersion": "1"},
+            "status": {"capacity": {"cpu": cpu, "memory": memory}, "addresses": [],
+                       "conditions": [{"type": "Ready", "status": "True"}]}}
+
+
+def pod(name, phase="Pending", node=None, cpu="500m", memory="1Gi", namespace="default", labels=None):
+    return {"metadata": {"name": name, "namespace": namespace, "resourceVersion": "1", "labels": labels or {}},
+            "spec": {"nodeName": node, "containers": [{"name": "app", "resources": {"requests": {
+                "cpu": cpu, "memory": memory}}}]},
+            "status": {"phase": phase}}
+
+
+def fake_api(pods):
+    from replay.FakeCoreV1Api import FakeCoreV1Api
+    return FakeCoreV1Api({"nodes": {"metadata": {"resourceVersion": "1"}, "items": [node("n1"), node("n2")]},
+                          "pods": {"metadata": {"resourceVersion": "1"}, "items": pods}, "events": []})
+
+
+PODS = [pod("web-1", "Running", "n1", labels={"app": "web"}), pod("web-2", labels={"app": "web"}),
+        pod("job-1", "Succeeded", "n1"), pod("db-1", "Running", "n2")]
+
+
+def test_selector_listing_does_not_touch_store():
+    monitor = ClusterMonitor(informer=True, core_v1=fake_api(PODS))
+    assert monitor.get_pods() and monitor.get_nodes()
+    store, by_node = dict(monitor.pod_store), {k: set(v) for k, v in monitor.pods_by_node.items()}
+    version = dict(monitor.resource_version)
+
+    assert [x.name for x in monitor.list_pods(field_selector="status.phase=Pending")] == ["web-2"]
+    assert {x.name for x in monitor.list_pods(label_selector="app=web")} == {"web-1", "web-2"}
+    assert [x.name for x in monitor.list_nodes(label_selector="pool=gpu")] == []
+    assert monitor.pod_store == store and monitor.pods_by_node == by_node
+    assert monitor.resource_version == version and len(monitor.node_store) == 2
+
+
+def test_non_informer_lists_filtered_on_server():
+    api = fake_api(PODS)
+    monitor = ClusterMonitor(core_v1=api)
+    monitor.refresh()
+    assert [x.name for x in monitor.pending_pods] == ["web-2"]
+    # 已结束的pod和待调度的pod都不在缓存中, 缓存只用于节点占用
+    assert set(monitor.pod_store) == {("default", "web-1"), ("default", "db-1")}
+    assert {x.name for x in monitor.pods_on("n1")} == {"web-1"}
+    assert api.calls["list_namespaced_pod"] == 2
+
+
+def test_pending_pods_are_unassigned_and_ours():
+    pods = PODS + [pod("pulling", node="n2"), pod("ours", memory="2Gi"), pod("theirs", memory="2Gi")]
+    pods[-2]["spec"]["schedulerName"] = "test-scheduler"
+    pods[-1]["spec"]["schedulerName"] = "default-scheduler"
+    for informer in (True, False):
+        monitor = ClusterMonitor(informer=informer, core_v1=fake_api(pods))
+        monitor.refresh()
+        assert sorted(x.name for x in monitor.pending_pods) == ["ours", "web-2"]
+        # 已绑定仍为Pending的pod只计入节点占用
+        assert {x.name for x in monitor.pods_on("n2")} == {"db-1", "pulling"}
@@ -0,0 +1,58 @@
+import os, random
+from optimizer.CABFD import CABFD
+from optimizer.PackingEngine import PackingEngine
+from pricing_model.FlavorIndex import FlavorIndex
+from utils.resources import Pod
+
+DOMINATED = os.path.join(os.path.dirname(__file__), "fixtures", "dominated_pricing.json")
+
+
+def pods(seed, n=300, cpu=6, ram=24):
+    rnd = random.Random(seed)
+    return [Pod({"CPU": round(rnd.uniform(0.1, cpu), 1), "RAM": round(rnd.uniform(0.1, ram), 2)}) for _ in range(n)]
+
+
+def plan(schedule, batch):
+    index = {id(p): i for i, p in enumerate(batch)}
+    return sorted((x.cpu, x.memory, round(x.price, 6), sorted(index[id(p)] for p in x.pods)) for x in schedule)
+
+
+def test_prune_drops_dominated_flavors():
+    flavors = [{"type": "a", "CPU": 2, "RAM": 8, "price": 0.1},
+               {"type": "b", "CPU": 2, "RAM": 8, "price": 0.2},
+               {"type": "c", "CPU": 2, "RAM": 4, "price": 0.15},
+               {"type": "d", "CPU": 4, "RAM": 4, "price": 0.12}]
+    index = FlavorIndex(flavors)
+    assert [x["type"] for x in index.flavors] == ["a", "d"]
+    assert [x["type"] for x in index.fit(3, 2)] == ["d"]
+    assert index.max_price(2, 4) == 0.2 and index.max_price(3, 2) == 0.12 and index.max_price(8, 1) == 0
+
+
+def test_cabfd_plans_on_shipped_catalogue():
+    """
+    data/pricing.json中没有比支配机型更小的被支配机型, 在该目录上剪枝不改变方案,
+    向量化内核和逐个打分的实现都与在完整目录上打分相同
+    """
+    cabfd = CABFD()
+    greedy = CABFD(vectorized=False)
+    unpruned = PackingEngine(cabfd.flavor_index.all_flavors)
+    for seed in range(8):
+        batch = pods(seed)
+        expected = plan(unpruned.pack(batch), batch)
+        assert plan(cabfd.optimize(batch), batch) == expected
+        assert plan(greedy.optimize(batch), batch) == expected
+
+
+def test_pruning_drops_smaller_dominated_flavor():
+    """small(2核, 8GiB, 0.10)被更大更便宜的medium支配, 剪枝后CABFD不再选它, 方案改变且总价更低"""
+    cabfd = CABFD(pricing_path=DOMINATED)
+    greedy = CABFD(vectorized=False, pricing_path=DOMINATED)
+    unpruned = PackingEngine(cabfd.flavor_index.all_flavors)
+    assert [x["type"] for x in cabfd.flavor_index.flavors] == ["medium", "large"]
+    for seed in range(3):
+        batch = pods(seed, n=10, cpu=1.5, ram=6)
+        schedule, baseline = cabfd.optimize(batch), unpruned.pack(batch)
+        assert plan(greedy.optimize(batch), batch) == plan(schedule, batch)
+        assert "small" in {x.type for x in baseline} and "small" not in {x.type for x in schedule}
+        assert sum(x.price for x in schedule) < sum(x.price for x in baseline)
+        assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in schedule)
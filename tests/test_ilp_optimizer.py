@@ -0,0 +1,43 @@
+import random, sys
+from collections import Counter
+from optimizer.ILPOptimizer import ILPOptimizer
+from utils.resources import Pod
+
+
+def pods(n=40, seed=0):
+    rnd = random.Random(seed)
+    return [Pod({"CPU": rnd.choice([0.5, 1, 2]), "RAM": rnd.choice([1, 2, 4, 6])}) for _ in range(n)]
+
+
+def check(schedule, batch):
+    assert Counter(id(p) for x in schedule for p in x.pods) == Counter(map(id, batch))
+    assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in schedule)
+
+
+def test_small_batch_no_worse_than_warm_start():
+    ilp = ILPOptimizer(time_limit=2, workers=2)
+    batch = pods()
+    warm = min(sum(x.price for x in ilp.cabfd.optimize(batch)), sum(x.price for x in ilp._first_fit_largest(batch)))
+    schedule = ilp.optimize(batch)
+    check(schedule, batch)
+    assert sum(x.price for x in schedule) <= warm + 1e-9
+    assert ilp.last_status in ("OPTIMAL", "FEASIBLE")
+    assert ilp.last_gap is not None and ilp.last_gap >= 0
+
+
+def test_zero_request_batch():
+    """全部为零请求的批次: 不能因目标为0而除零, pod也不能落在没有机型的槽位上"""
+    ilp = ILPOptimizer(time_limit=1, workers=2)
+    batch = [Pod({"CPU": 0, "RAM": 0}) for _ in range(5)]
+    schedule = ilp.optimize(batch)
+    check(schedule, batch)
+    assert len(schedule) >= 1
+
+
+def test_falls_back_without_ortools(monkeypatch):
+    monkeypatch.setitem(sys.modules, "ortools.sat.python", None)
+    ilp = ILPOptimizer(time_limit=1)
+    batch = pods(20, seed=1)
+    schedule = ilp.optimize(batch)
+    check(schedule, batch)
+    assert ilp.last_status in ("CABFD", "FFD") and ilp.last_gap is None
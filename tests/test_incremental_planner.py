@@ -0,0 +1,43 @@
+import random
+from optimizer.IncrementalPlanner import IncrementalPlanner
+from utils.resources import Pod
+
+
+def pod(i, rng):
+    return Pod({"name": f"pod-{i}", "namespace": "default", "CPU": rng.choice([0.25, 0.5, 1, 2]),
+                "RAM": rng.choice([0.5, 1, 2, 4])})
+
+
+def check(planner, pods):
+    schedule = planner.optimize(pods)
+    placed = sorted((x.namespace, x.name) for node in schedule for x in node.pods)
+    assert placed == sorted((x.namespace, x.name) for x in pods)
+    assert all(node.pods for node in schedule)
+    assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in schedule)
+    assert len(planner.index) == len(schedule)
+    return schedule
+
+
+def test_incremental_rounds_keep_a_valid_plan():
+    rng = random.Random(5)
+    pods = [pod(i, rng) for i in range(200)]
+    planner = IncrementalPlanner(full_every=50)
+    check(planner, pods)
+    for round in range(10):
+        # 每轮绑定10个pod, 新增10个pod
+        pods = pods[10:] + [pod(1000 + round * 10 + i, rng) for i in range(10)]
+        check(planner, pods)
+        assert planner.last_delta == (10, 10) and planner.since_full == round + 1
+
+
+def test_apply_touches_only_changed_nodes():
+    rng = random.Random(6)
+    pods = [pod(i, rng) for i in range(100)]
+    planner = IncrementalPlanner(full_every=50)
+    planner.optimize(pods)
+    before = {id(x): (x.type, len(x.pods)) for x in planner.plan.values()}
+    node, victim = next(iter(planner.placed.values()))
+    schedule = planner.apply(removed=[("default", victim.name)])
+    changed = [x for x in schedule if before.get(id(x)) != (x.type, len(x.pods))]
+    assert changed == ([node] if node.pods else [])
+    assert len(schedule) == len(before) - (0 if node.pods else 1)
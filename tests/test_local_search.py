@@ -0,0 +1,36 @@
+from optimizer.CABFD import CABFD
+from optimizer.LocalSearch import LocalSearch
+from utils.resources import Pod
+
+
+def pods():
+    return [Pod({"CPU": 0.25 + i % 5 * 0.5, "RAM": 0.5 + i % 7 * 0.75}) for i in range(120)]
+
+
+def test_improve_keeps_pods_and_price():
+    schedule = CABFD().optimize(pods())
+    search = LocalSearch(time_limit=0.2, cache_size=64)
+    result = search.improve(schedule)
+    assert sum(x.price for x in result) <= sum(x.price for x in schedule) + 1e-9
+    assert sorted(id(p) for x in result for p in x.pods) == sorted(id(p) for x in schedule for p in x.pods)
+    assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in result)
+    assert len(search._cheapest) <= 64
+
+
+def test_cheapest_cache_is_lru():
+    search = LocalSearch(cache_size=2)
+    search.cheapest(1000, 2**30)
+    search.cheapest(2000, 2**30)
+    search.cheapest(1000, 2**30)
+    search.cheapest(3000, 2**30)
+    assert list(search._cheapest) == [(1000, 2**30), (3000, 2**30)]
+
+
+def test_zero_request_pods_are_priced():
+    """只有零请求pod的节点不是空节点, 合并掉它不能算作省下整台机器"""
+    search = LocalSearch(time_limit=0.1)
+    schedule = CABFD().optimize([Pod({"CPU": 0, "RAM": 0}), Pod({"CPU": 0, "RAM": 0})])
+    assert search._price(0, 0) == search.cheapest(0, 0)["price"]
+    assert search._price(0, 0, empty=True) == 0
+    result = search.improve(schedule)
+    assert sum(len(x.pods) for x in result) == 2
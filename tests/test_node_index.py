@@ -0,0 +1,38 @@
+import random
+from cluster.NodeIndex import NodeIndex
+from utils.resources import Node, Pod, GiB
+
+
+def linear_best_fit(nodes, pod):
+    fits = [x for x in nodes if x.fits(pod)]
+    return min(fits, key=lambda x: (x.free_ram_bytes, x.free_milli_cpu), default=None)
+
+
+def test_best_fit_matches_linear_scan():
+    rng = random.Random(7)
+    nodes = [Node(f"n{i}", {"CPU": rng.choice([2, 4, 8, 16]), "RAM": rng.choice([4, 8, 16, 32, 64])})
+             for i in range(300)]
+    index = NodeIndex(nodes)
+    for _ in range(3000):
+        pod = Pod({"CPU": rng.choice([0.25, 0.5, 1, 2]), "RAM": rng.choice([0.5, 1, 2, 4, 8])})
+        expected = linear_best_fit(nodes, pod)
+        found = index.best_fit(pod.milli_cpu, pod.ram_bytes)
+        assert (found and (found.free_ram_bytes, found.free_milli_cpu)) == \
+               (expected and (expected.free_ram_bytes, expected.free_milli_cpu))
+        if found is not None:
+            index.place(found, pod)
+    assert len(index) == len(nodes)
+    assert sorted(x[0] for x in index.snapshot()) == sorted(x.name for x in nodes)
+    free = [(ram, cpu) for _, cpu, ram in index.snapshot()]
+    assert free == sorted(free)
+
+
+def test_remove_and_reserve():
+    nodes = [Node("a", {"CPU": 4, "RAM": 8}), Node("b", {"CPU": 1, "RAM": 16})]
+    index = NodeIndex(nodes)
+    # RAM最少的a满足CPU, b的CPU不够
+    assert index.best_fit(2000, 4 * GiB) is nodes[0]
+    assert index.best_fit(2000, 10 * GiB) is None
+    index.remove(nodes[0])
+    assert index.best_fit(1000, GiB) is nodes[1] and len(index) == 1 and index.node("a") is None
+    assert index.reserve("b", Pod({"CPU": 1, "RAM": 1})) and not index.reserve("b", Pod({"CPU": 1, "RAM": 1}))
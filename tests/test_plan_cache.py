@@ -0,0 +1,39 @@
+from optimizer.PlanCache import PlanCache
+from pricing_model.Monitor import GCPMonitor
+from pricing_model.OfflineClients import OfflineCatalogue
+from utils.resources import Pod
+
+
+def pods():
+    return [Pod({"CPU": 0.5 + i % 3, "RAM": 1 + i % 4}) for i in range(30)]
+
+
+def test_same_workload_hits():
+    cache = PlanCache(capacity=4)
+    first = cache.optimize(pods())
+    second = cache.optimize(pods())
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [x.type for x in first] == [x.type for x in second]
+
+
+def test_price_flip_invalidates(tmp_path):
+    catalogue = OfflineCatalogue()
+    gcp = GCPMonitor(project_id="test", cache_path=str(tmp_path / "cache.json"), **catalogue.clients())
+    gcp.refresh_catalogue()
+    pricing_path = str(tmp_path / "pricing.json")
+    gcp.export(pricing_path)
+    cache = PlanCache(capacity=4, catalogue=gcp, pricing_path=pricing_path)
+    before = sum(x.price for x in cache.optimize(pods()))
+    cache.optimize(pods())
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    version = gcp.catalogue_version
+    catalogue.region_factor = {"australia-southeast1": 2}
+    gcp.refresh_catalogue()
+    assert gcp.catalogue_version != version
+    after = sum(x.price for x in cache.optimize(pods()))
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert len(cache.plans) == 1
+    # 新定价导出到pricing_path, 重建的优化器按新价格规划
+    assert cache.optimizer.gcp_pricing == gcp.machine_price_cache
+    assert after > before * 1.5
@@ -0,0 +1,39 @@
+import random, time
+from optimizer.Portfolio import Portfolio, STRATEGIES
+from utils.resources import Pod
+
+
+def pods(n):
+    rnd = random.Random(0)
+    return [Pod({"CPU": round(rnd.uniform(0.1, 2), 1), "RAM": round(rnd.uniform(0.25, 6), 2)}) for _ in range(n)]
+
+
+def test_portfolio_picks_a_feasible_plan():
+    portfolio = Portfolio(workers=2, strategies=STRATEGIES[:3] + STRATEGIES[-1:])
+    try:
+        schedule = portfolio.optimize(pods(300))
+    finally:
+        portfolio.close()
+    assert sum(len(x.pods) for x in schedule) == 300
+    assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in schedule)
+    assert sum(x.price for x in schedule) == min(x[1] for x in portfolio.last_results)
+
+
+def test_overrun_strategies_free_their_workers():
+    """超时的BFD策略在工作进程内按截止时间结束, 下一轮不需要等它跑完"""
+    bfd = [x for x in STRATEGIES if x[0] == "BFD"]
+    portfolio = Portfolio(workers=2, strategies=STRATEGIES[:1] + bfd, time_limit=0.05, bfd_limit=float("inf"))
+    try:
+        portfolio.optimize(pods(200))       # 启动进程池
+        start = time.perf_counter()
+        schedule = portfolio.optimize(pods(12000))
+        first = time.perf_counter() - start
+        assert sum(len(x.pods) for x in schedule) == 12000
+        assert [x[0] for x in portfolio.last_results] == [STRATEGIES[0]]
+
+        portfolio.strategies = STRATEGIES[:1]
+        start = time.perf_counter()
+        portfolio.optimize(pods(200))
+        assert time.perf_counter() - start < first
+    finally:
+        portfolio.close()
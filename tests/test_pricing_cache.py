@@ -0,0 +1,174 @@
+import json, time
+import pytest
+from pricing_model.Monitor import GCPMonitor
+from pricing_model.OfflineClients import OfflineCatalogue
+
+
+class FailingCatalogue(OfflineCatalogue):
+    """在fail为True时让SKU目录下载失败, 模拟GCP的临时错误"""
+    fail = False
+
+    def skus(self):
+        if self.fail:
+            raise ConnectionError("billing unavailable")
+        return super().skus()
+
+
+def monitor(path, catalogue, **options):
+    monitor = GCPMonitor(project_id="test", cache_path=str(path), **catalogue.clients(), **options)
+    if monitor.refresher is not None:
+        monitor.refresher.join(5)
+    return monitor
+
+
+def pooled(gcp, catalogue):
+    """:return: 离线目录中属于机型池的机型数"""
+    return len([x for x in catalogue.machine_types if x[0] in gcp.flavor_pool])
+
+
+def age_cache(path, seconds):
+    with open(path) as fp:
+        cache = json.load(fp)
+    cache["fetched_at"] -= seconds
+    with open(path, "w") as fp:
+        json.dump(cache, fp)
+    return cache
+
+
+def test_cold_fetch_writes_cache(tmp_path):
+    path, catalogue = tmp_path / "cache.json", OfflineCatalogue()
+    gcp = monitor(path, catalogue)
+    assert catalogue.calls["list_skus"] == 0      # 构造时不访问网络
+    assert len(gcp.catalogue) == pooled(gcp, catalogue)
+    assert catalogue.calls["list_skus"] == 1
+    assert json.loads(path.read_text())["machine_price_cache"] == gcp.machine_price_cache
+
+    warm = OfflineCatalogue()
+    assert len(monitor(path, warm).catalogue) == pooled(gcp, catalogue)
+    assert sum(warm.calls.values()) == 0
+
+
+def test_expired_cache_refreshed_in_background(tmp_path):
+    path = tmp_path / "cache.json"
+    monitor(path, OfflineCatalogue()).catalogue
+    old = age_cache(path, 3600)
+
+    catalogue = OfflineCatalogue(region_factor={"australia-southeast1": 2})
+    gcp = monitor(path, catalogue, ttl=60)
+    assert catalogue.calls["list_skus"] == 1
+    assert gcp.fetched_at > old["fetched_at"]
+    assert not gcp.expired
+    prices = {x["type"]: x["price"] for x in gcp.machine_price_cache}
+    for x in old["machine_price_cache"]:
+        assert prices[x["type"]] == pytest.approx(2 * x["price"])
+
+
+def test_failed_refresh_keeps_old_cache(tmp_path):
+    path = tmp_path / "cache.json"
+    monitor(path, OfflineCatalogue()).catalogue
+    old = age_cache(path, 3600)
+
+    catalogue = FailingCatalogue()
+    catalogue.fail = True
+    gcp = monitor(path, catalogue, ttl=60)
+    assert catalogue.calls["list_skus"] == 1
+    assert gcp.machine_price_cache == old["machine_price_cache"]
+    assert gcp.fetched_at == old["fetched_at"] and gcp.expired
+    assert json.loads(path.read_text()) == old
+
+
+def test_empty_refresh_not_committed(tmp_path):
+    path = tmp_path / "cache.json"
+    monitor(path, OfflineCatalogue()).catalogue
+    old = age_cache(path, 3600)
+
+    # 可用区里没有机型池中的机型, 拉取结果为空
+    catalogue = OfflineCatalogue(machine_types=[("m1-megamem-96", 96, 1433600)])
+    gcp = monitor(path, catalogue, ttl=60)
+    assert catalogue.calls["list_machine_types"] == 1
+    assert gcp.machine_price_cache == old["machine_price_cache"]
+    assert json.loads(path.read_text()) == old
+
+
+def test_cold_fetch_failure_raises(tmp_path):
+    catalogue = FailingCatalogue()
+    catalogue.fail = True
+    gcp = monitor(tmp_path / "cache.json", catalogue)
+    with pytest.raises(ConnectionError):
+        gcp.catalogue
+    assert not (tmp_path / "cache.json").exists()
+
+
+class ZoneOutage(OfflineCatalogue):
+    """down中的可用区查询机型时失败"""
+    down = ()
+
+    def machine_types_in(self, zone):
+        if zone in self.down:
+            raise ConnectionError(f"{zone} unavailable")
+        return super().machine_types_in(zone)
+
+
+ZONES = ["australia-southeast1-b", "us-central1-a"]
+REGIONS = ("australia-southeast1", "us-central1")
+
+
+def test_failed_zone_keeps_previous_entry(tmp_path):
+    path = tmp_path / "cache.json"
+    first = monitor(path, ZoneOutage(regions=REGIONS), zones=ZONES)
+    first.catalogue
+    old = age_cache(path, 3600)
+
+    catalogue = ZoneOutage(regions=REGIONS, region_factor={"australia-southeast1": 2})
+    catalogue.down = ("us-central1-a",)
+    gcp = monitor(path, catalogue, zones=ZONES, ttl=60)
+    assert catalogue.calls["list_machine_types"] == 2
+    zones = {x["zone"] for x in gcp.machine_price_cache}
+    assert zones == set(ZONES)
+    assert gcp.machine_cache["us-central1-a"] == old["machine_cache"]["us-central1-a"]
+    # 其他可用区用上了新价格, 但这次刷新不写盘, 也不算完成
+    prices = {(x["zone"], x["type"]): x["price"] for x in gcp.machine_price_cache}
+    for x in old["machine_price_cache"]:
+        factor = 2 if x["zone"] == "australia-southeast1-b" else 1
+        assert prices[(x["zone"], x["type"])] == pytest.approx(factor * x["price"])
+    assert json.loads(path.read_text()) == old
+    assert gcp.expired
+
+
+def test_failed_zone_without_previous_entry_raises(tmp_path):
+    catalogue = ZoneOutage(regions=REGIONS)
+    catalogue.down = ("us-central1-a",)
+    gcp = monitor(tmp_path / "cache.json", catalogue, zones=ZONES)
+    with pytest.raises(ConnectionError):
+        gcp.catalogue
+    assert gcp.machine_price_cache is None
+    assert not (tmp_path / "cache.json").exists()
+
+
+class InstanceOutage(OfflineCatalogue):
+    """down中的可用区实例查询失败"""
+    down = ()
+
+    def instances_in(self, zone):
+        if zone in self.down:
+            raise ConnectionError(f"{zone} unavailable")
+        return super().instances_in(zone)
+
+
+def test_failed_instance_zone_keeps_previous_mapping(tmp_path):
+    catalogue = InstanceOutage(regions=REGIONS, instances={"10.0.0.1": (ZONES[0], "e2-standard-4"),
+                                                           "10.0.1.1": (ZONES[1], "n2-standard-8")})
+    gcp = monitor(tmp_path / "cache.json", catalogue, zones=ZONES)
+    assert gcp.get_instance_type() == {"10.0.0.1": "e2-standard-4", "10.0.1.1": "n2-standard-8"}
+
+    # 第二个可用区失败: 沿用上一次的结果, 第一个可用区的新实例照常返回
+    catalogue.instances["10.0.0.2"] = (ZONES[0], "e2-standard-8")
+    catalogue.down = (ZONES[1],)
+    ip2type = gcp.get_instance_type()
+    assert ip2type == {"10.0.0.1": "e2-standard-4", "10.0.0.2": "e2-standard-8", "10.0.1.1": "n2-standard-8"}
+
+    # 从未成功过的可用区为空, 查询不到的ip返回""
+    fresh = monitor(tmp_path / "other.json", catalogue, zones=ZONES)
+    ip2type = fresh.get_instance_type()
+    assert ip2type == {"10.0.0.1": "e2-standard-4", "10.0.0.2": "e2-standard-8"}
+    assert ip2type.get("10.0.1.1") is None and ip2type["10.0.1.1"] == ""
@@ -0,0 +1,30 @@
+import pytest
+from utils.quantity import cpu_millis, memory_bytes
+
+
+@pytest.mark.parametrize("quantity, expected", [
+    ("100m", 100), ("0.1", 100), ("1", 1000), ("2.5", 2500), ("1e3", 1_000_000), ("1E-3", 1),
+    ("500n", 1),            # 不足1毫核向上取整
+    ("1500u", 2), ("0", 0), ("+250m", 250), ("1k", 1_000_000),
+    ("-1", -1000), ("-100m", -100), ("-500n", 0),
+    (None, 0), (2, 2000), (0.25, 250),
+])
+def test_cpu_millis(quantity, expected):
+    assert cpu_millis(quantity) == expected
+
+
+@pytest.mark.parametrize("quantity, expected", [
+    ("1.5Gi", 3 * 2**29), ("512Mi", 512 * 2**20), ("128974848", 128974848), ("129e6", 129_000_000),
+    ("129M", 129_000_000), ("1e3", 1000), ("0.5Ki", 512), ("1m", 1), ("100m", 1),
+    ("-1Gi", -2**30), (None, 0), (1024, 1024),
+])
+def test_memory_bytes(quantity, expected):
+    assert memory_bytes(quantity) == expected
+
+
+@pytest.mark.parametrize("quantity", ["", "abc", "1.2.3", "1Gb", "Gi", "m", "1_000", "1_0Mi", "--1", "1e"])
+def test_invalid_quantities(quantity):
+    with pytest.raises(ValueError):
+        cpu_millis(quantity)
+    with pytest.raises(ValueError):
+        memory_bytes(quantity)
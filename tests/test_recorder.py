@@ -0,0 +1,36 @@
+import copy, threading, time
+import pytest
+from cluster.Monitor import ClusterMonitor
+from replay.Recorder import Recorder
+from test_cluster_monitor import pod, fake_api
+
+PODS = [pod("a-1"), pod("a-2", "Running", "n1"), pod("b-1", namespace="team-b"), pod("c-1", namespace="team-c")]
+
+
+@pytest.mark.parametrize("namespace, expected", [
+    ("default", {"a-1", "a-2"}),
+    (["default", "team-b"], {"a-1", "a-2", "b-1"}),
+    (None, {"a-1", "a-2", "b-1", "c-1"}),
+])
+def test_records_monitor_namespaces(namespace, expected):
+    core_v1 = fake_api(copy.deepcopy(PODS))
+    recorder = Recorder(ClusterMonitor(core_v1=core_v1, namespace=namespace), None)
+    data = recorder._record_k8s(0)
+    assert {x["metadata"]["name"] for x in data["pods"]["items"]} == expected
+    assert data["namespace"] == namespace and len(data["nodes"]["items"]) == 2
+
+
+def test_watches_every_namespace():
+    core_v1 = fake_api(copy.deepcopy(PODS))
+    recorder = Recorder(ClusterMonitor(core_v1=core_v1, namespace=["default", "team-b"]), None)
+
+    def create():
+        time.sleep(0.1)
+        for name, namespace in (("a-3", "default"), ("b-2", "team-b"), ("c-2", "team-c")):
+            core_v1._apply("pod", "ADDED", pod(name, namespace=namespace))
+    threading.Thread(target=create, daemon=True).start()
+
+    data = recorder._record_k8s(1)
+    assert sorted(x["object"]["metadata"]["name"] for x in data["events"]) == ["a-3", "b-2"]
+    assert [x["offset"] for x in data["events"]] == sorted(x["offset"] for x in data["events"])
+    assert all(x["type"] == "ADDED" for x in data["events"])
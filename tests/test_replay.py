@@ -0,0 +1,32 @@
+import os, time
+from collections import Counter
+import pytest
+from replay.Replay import build_scheduler
+from replay.Replicas import overcommitted
+
+RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "recording.json")
+
+
+def ours(core_v1):
+    """:return: 录制中本调度器负责且未绑定的pod名"""
+    return {name for (_, name), x in core_v1.pods.items()
+            if x["status"]["phase"] == "Pending" and not x["spec"].get("nodeName")
+            and x["spec"].get("schedulerName") in (None, "test-scheduler")}
+
+
+@pytest.mark.parametrize("options", [{"informer": True}, {"informer": False}, {"namespaces": ["default"]},
+                                     {"optimizer": "BatchBFD", "plan_cache": 4, "incremental": 2}])
+def test_replay_schedules_every_pod_once(options):
+    scheduler, core_v1, _ = build_scheduler(RECORDING, speed=100, **options)
+    time.sleep(0.1)     # 回放录制的ADDED事件
+    expected = ours(core_v1)
+    placements, schedule = scheduler.schedule()
+    scheduler.cluster_monitor.stop_informer()
+
+    placed = [x.name for x, _ in placements]
+    planned = [x.name for node in schedule for x in node.pods]
+    assert Counter(placed + planned) == Counter(expected)
+    assert "other-0" not in placed + planned and "warm-0" not in placed + planned
+    assert Counter(name for _, name, _ in core_v1.bindings) == Counter(placed)
+    assert overcommitted(core_v1) == []
+    assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in schedule)
@@ -0,0 +1,55 @@
+import os, threading, time
+from collections import Counter
+from replay.Replicas import build_replicas, overcommitted
+
+RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "recording.json")
+
+
+def run_cycle(schedulers):
+    """所有副本同时开始一轮调度, :return: {副本标识: (放置, 新节点规划)}"""
+    barrier, results = threading.Barrier(len(schedulers)), {}
+
+    def run(scheduler):
+        barrier.wait()
+        results[scheduler.identity] = scheduler.schedule()
+
+    threads = [threading.Thread(target=run, args=(x,)) for x in schedulers]
+    _ = [x.start() for x in threads]
+    _ = [x.join() for x in threads]
+    return results
+
+
+def test_replicas_bind_once_without_overcommit():
+    schedulers, core_v1, _ = build_replicas(RECORDING, 3, speed=100, lease_duration=1)
+    time.sleep(0.1)
+    try:
+        for cycle in range(4):
+            results = run_cycle(schedulers)
+            assert len([x for x, (_, plan) in results.items() if plan]) <= 1
+            assert len([x for x in schedulers if x.elector.leader]) <= 1
+        bound = Counter((ns, name) for ns, name, _ in core_v1.bindings)
+        assert bound and max(bound.values()) == 1
+        assert overcommitted(core_v1) == []
+        # 其他副本已预留的pod计为reserved, 不混入绑定冲突
+        conflicts = [x.last_conflicts for x in schedulers]
+        assert all(set(x) == {"capacity", "reserved", "binding", "commit"} for x in conflicts)
+    finally:
+        for scheduler in schedulers:
+            scheduler.close()
+
+
+def test_failover_keeps_a_single_leader():
+    schedulers, core_v1, _ = build_replicas(RECORDING, 2, speed=100, lease_duration=0.3)
+    time.sleep(0.1)
+    run_cycle(schedulers)
+    leader = next(x for x in schedulers if x.elector.leader)
+    leader.cluster_monitor.stop_informer()      # leader停止且不释放Lease
+    rest = [x for x in schedulers if x is not leader]
+    time.sleep(0.5)
+    for _ in range(2):
+        run_cycle(rest)
+        time.sleep(0.1)
+    assert [x.elector.leader for x in rest] == [True]
+    assert overcommitted(core_v1) == []
+    for scheduler in rest:
+        scheduler.close()
@@ -0,0 +1,41 @@
+import os
+from cluster.NodeIndex import NodeIndex
+from replay.Replay import build_scheduler
+from utils.resources import Pod, Node
+
+RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "recording.json")
+
+
+class FakeBinder:
+    """按pod名给出绑定结果, 其余pod绑定成功"""
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+
+    def bind(self, assignments):
+        return [{"pod": pod.name, "node": node, "status": self.outcomes.get(pod.name, "bound")}
+                for pod, node in assignments]
+
+
+def test_unbound_placements_are_released():
+    scheduler, _, _ = build_scheduler(RECORDING, informer=False)
+    scheduler.binder = FakeBinder({"p-0": "failed", "p-1": "conflict"})
+    pods = [Pod({"CPU": 1, "RAM": 2, "name": f"p-{i}", "namespace": "default"}) for i in range(3)]
+    node = Node("worker-1", {"CPU": 4, "RAM": 8, "status": "Ready"})
+    index = NodeIndex([node])
+
+    placements, schedule = scheduler._plan(pods, index)
+
+    assert [x.name for x, _ in placements] == ["p-2"]
+    # 绑定失败的pod交给新节点规划, 被其他调度器绑定的pod不再处理
+    assert [x.name for n in schedule for x in n.pods] == ["p-0"]
+    assert node.pods == [pods[2]] and node.used_milli_cpu == 1000 and node.used_ram_bytes == 2 * 2**30
+    assert index.best_fit(3000, 6 * 2**30) is node
+
+
+def test_list_mode_refreshes_once_per_cycle():
+    """非informer模式下每轮只list一次节点和一次(已绑定+未调度)pod"""
+    scheduler, core_v1, _ = build_scheduler(RECORDING, informer=False, bind=False)
+    core_v1.calls.clear()
+    scheduler.schedule()
+    assert core_v1.calls["list_node"] == 1
+    assert core_v1.calls["list_namespaced_pod"] == 2
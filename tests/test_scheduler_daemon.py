@@ -0,0 +1,43 @@
+import time
+from cluster.SchedulerDaemon import SchedulerDaemon
+from utils.resources import Pod
+
+
+def events(bursts, gap):
+    """按突发产出ADDED事件, 两次突发之间间隔gap秒, 中间夹一个应被忽略的MODIFIED事件"""
+    for i, size in enumerate(bursts):
+        if i:
+            time.sleep(gap)
+        for j in range(size):
+            yield {"type": "ADDED", "object": {"name": f"pod-{i}-{j}", "CPU": 0.5 + j % 3, "RAM": 1 + j % 4}}
+        yield {"type": "MODIFIED", "object": {"name": f"pod-{i}-0", "CPU": 1, "RAM": 1}}
+
+
+def run(bursts, gap=0.3, **options):
+    plans = []
+    daemon = SchedulerDaemon(event_source=events(bursts, gap), parse_pod=Pod,
+                             on_plan=lambda pods, schedule: plans.append((pods, schedule)), **options)
+    daemon.run()
+    return daemon, plans
+
+
+def test_bursts_become_micro_batches():
+    daemon, plans = run([30, 20], debounce=0.05, max_delay=1)
+    assert list(daemon.batch_sizes) == [30, 20] and daemon.planned_pods == 50
+    for pods, schedule in plans:
+        placed = [p for node in schedule for p in node.pods]
+        assert sorted(id(x) for x in placed) == sorted(id(x) for x in pods)
+        assert all(node.free_milli_cpu >= 0 and node.free_ram_bytes >= 0 for node in schedule)
+
+
+def test_max_batch_splits_a_burst():
+    daemon, plans = run([25], debounce=0.2, max_batch=10)
+    assert list(daemon.batch_sizes) == [10, 10, 5]
+
+
+def test_default_on_plan_logs_the_plan(caplog):
+    daemon = SchedulerDaemon(event_source=events([3], 0), parse_pod=Pod, debounce=0.01)
+    with caplog.at_level("INFO"):
+        daemon.run()
+    assert daemon.planned_pods == 3
+    assert any("总价为" in x.message for x in caplog.records)
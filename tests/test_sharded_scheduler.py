@@ -0,0 +1,40 @@
+import os
+from collections import Counter
+from cluster.NodeIndex import NodeIndex
+from replay.Replay import build_scheduler
+from utils.resources import Pod, Node
+
+RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "recording.json")
+
+
+def pods():
+    return [Pod({"CPU": 0.5 + i % 3 * 0.5, "RAM": 1 + i % 4, "name": f"{ns}-{i}", "namespace": ns})
+            for ns in ("a", "b") for i in range(40)]
+
+
+def nodes():
+    return [Node(f"worker-{i}", {"CPU": 4, "RAM": 8, "status": "Ready"}) for i in range(4)]
+
+
+def test_shards_commit_reserves_in_parent():
+    scheduler, _, _ = build_scheduler(RECORDING, informer=False, bind=False, namespaces=["a", "b"],
+                                      incremental=5)
+    try:
+        pending = pods()
+        index = NodeIndex(nodes())
+        placements, schedule = scheduler._plan(pending, index)
+
+        # 两个分片在同一快照上best-fit, 后提交的分片必然冲突
+        assert scheduler.last_shards["b"][2] > 0
+        planned = [x for node in schedule for x in node.pods]
+        assert Counter(map(id, [x for x, _ in placements] + planned)) == Counter(map(id, pending))
+        assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in index._nodes.values())
+        assert all(x.free_milli_cpu >= 0 and x.free_ram_bytes >= 0 for x in schedule)
+
+        # 分片的增量规划保存在工作进程中: 没有变化时新节点规划不变
+        unplaced = [x for x in pending if x in planned]
+        _, again = scheduler._plan(unplaced, NodeIndex())
+        assert sorted(x.type for x in again) == sorted(x.type for x in schedule)
+        assert Counter(id(x) for node in again for x in node.pods) == Counter(map(id, unplaced))
+    finally:
+        scheduler.close()
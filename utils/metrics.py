@@ -0,0 +1,171 @@
+"""
+进程内的调度指标: 各阶段耗时、API调用次数与耗时、每轮处理的pod/节点数
+以Prometheus文本格式在本地HTTP端点导出, 不依赖prometheus_client
+
+    from utils import metrics
+    with metrics.phase("optimize"):
+        ...
+    with metrics.api_call("k8s", "list_node"):
+        ...
+    metrics.serve(9100)      # curl localhost:9100/metrics
+"""
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect, functools, logging, threading, time
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{k}="{v}"' for k, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(x, "")) for x in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各桶计数(非累计)..., +Inf桶计数, 总和]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(str(labels.get(x, "")) for x in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in items]
+        return lines
+
+
+PHASE_SECONDS = Histogram("scheduler_phase_seconds", "Scheduler各阶段耗时", ("phase",))
+CYCLE_SECONDS = Histogram("scheduler_cycle_seconds", "一轮schedule的总耗时")
+CYCLE_PODS = Histogram("scheduler_cycle_pods", "每轮处理的pending pod数", buckets=COUNT_BUCKETS)
+CYCLE_NODES = Histogram("scheduler_cycle_nodes", "每轮参与调度的已有节点数", buckets=COUNT_BUCKETS)
+API_SECONDS = Histogram("api_call_seconds", "外部API调用耗时", ("service", "method"))
+API_ERRORS = Counter("api_call_errors_total", "失败的外部API调用次数", ("service", "method"))
+OPTIMIZER_SECONDS = Histogram("optimizer_seconds", "优化器单次规划耗时", ("optimizer",))
+OPTIMIZER_PODS = Counter("optimizer_pods_total", "优化器规划的pod总数", ("optimizer",))
+OPTIMIZER_NODES = Counter("optimizer_nodes_total", "优化器规划出的节点总数", ("optimizer",))
+WATCH_EVENTS = Counter("cluster_watch_events_total", "informer收到的watch事件数", ("kind", "type"))
+BINDINGS = Counter("scheduler_bindings_total", "按结果统计的pod绑定数", ("status",))
+REPACK_SAVED = Counter("repack_saved_price_total", "局部搜索累计节省的每小时价格")
+PLAN_CACHE = Counter("plan_cache_requests_total", "方案缓存的查询次数", ("result",))
+REPLICA_CONFLICTS = Counter("scheduler_replica_conflicts_total", "多副本调度按类型统计的冲突次数", ("kind",))
+SHARD_CONFLICTS = Counter("scheduler_shard_conflicts_total", "分片reserve已有节点时的冲突次数", ("shard",))
+
+REGISTRY = [PHASE_SECONDS, CYCLE_SECONDS, CYCLE_PODS, CYCLE_NODES, API_SECONDS, API_ERRORS,
+            OPTIMIZER_SECONDS, OPTIMIZER_PODS, OPTIMIZER_NODES, WATCH_EVENTS, BINDINGS, REPACK_SAVED,
+            PLAN_CACHE, SHARD_CONFLICTS, REPLICA_CONFLICTS]
+
+
+class timer(ContextDecorator):
+    """把代码块耗时记入histogram, 可作为with语句或装饰器使用, 异常时计入errors(若给出)"""
+    def __init__(self, histogram, errors=None, **labels):
+        self.histogram = histogram
+        self.errors = errors
+        self.labels = labels
+        self._local = threading.local()
+
+    def __enter__(self):
+        self._local.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self._local.start, **self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(**self.labels)
+        return False
+
+
+def phase(name):
+    return timer(PHASE_SECONDS, phase=name)
+
+
+def api_call(service, method):
+    return timer(API_SECONDS, API_ERRORS, service=service, method=method)
+
+
+def optimizer(func):
+    """装饰优化器的optimize(self, pods), 记录耗时和输入/输出规模, 以类名作为标签"""
+    @functools.wraps(func)
+    def wrapper(self, pods, *args, **kwargs):
+        name = type(self).__name__
+        with timer(OPTIMIZER_SECONDS, optimizer=name):
+            schedule = func(self, pods, *args, **kwargs)
+        OPTIMIZER_PODS.inc(len(pods), optimizer=name)
+        OPTIMIZER_NODES.inc(len(schedule), optimizer=name)
+        return schedule
+    return wrapper
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """在后台线程启动/metrics端点, :return: HTTPServer(调用shutdown()停止)"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Metrics endpoint listening on http://{host}:{server.server_port}/metrics")
+    return server
@@ -1,4 +1,20 @@
+# 资源以整数毫核和字节保存, 累加和比较都没有浮点误差; cpu/memory(核, GiB)只是换算后的视图
+GiB = 2**30
+
+
+def to_millis(cpu):
+    """:return: cpu核数换算的毫核数(int)"""
+    return round(cpu * 1000)
+
+
+def to_bytes(ram):
+    """:return: ram GiB换算的字节数(int)"""
+    return round(ram * GiB)
+
+
 class Pod:
+    __slots__ = ("request", "limit", "status", "namespace", "node", "name", "scheduler", "milli_cpu", "ram_bytes")
+
     def __init__(self, request: dict, limit=None, name=None):
         self.request = request
         self.limit = limit if limit else request
@@ -6,14 +22,26 @@ class Pod:
         self.namespace = request.get("namespace",None)
         self.node = request.get("node", None)
         self.name = request.get("name", None)
+        self.scheduler = request.get("scheduler", None)
+        self.milli_cpu = to_millis(request["CPU"])
+        self.ram_bytes = to_bytes(request["RAM"])
+
+    @classmethod
+    def record(cls, name, namespace, status, node, milli_cpu, ram_bytes, scheduler=None):
+        """集群快照用的pod: 只保存调度需要的字段, 不保留request/limit字典, 请求为整数毫核/字节"""
+        pod = cls.__new__(cls)
+        pod.request = pod.limit = None
+        pod.name, pod.namespace, pod.status, pod.node = name, namespace, status, node
+        pod.milli_cpu, pod.ram_bytes, pod.scheduler = milli_cpu, ram_bytes, scheduler
+        return pod
 
     @property
     def cpu(self):
-        return self.request["CPU"]
+        return self.milli_cpu / 1000
 
     @property
     def memory(self):
-        return self.request["RAM"]
+        return self.ram_bytes / GiB
 
     def __str__(self):
         return (f"Pod is {self.name}"
@@ -24,31 +52,81 @@ class Pod:
 
 
 class Node:
+    __slots__ = ("name", "type", "milli_cpu", "ram_bytes", "price", "pods", "status", "internalIP", "zone",
+                 "used_milli_cpu", "used_ram_bytes")
+
     def __init__(self, name, configuration, pods=None):
+        """
+        :param configuration: 机型或节点信息, 容量为CPU(核)/RAM(GiB), 或整数的milli_cpu/ram_bytes
+        """
         self.name = name
         self.type = configuration.get("type", None)
-        self.cpu = configuration["CPU"]
-        self.memory = configuration["RAM"]
+        self.milli_cpu = configuration["milli_cpu"] if "milli_cpu" in configuration else to_millis(configuration["CPU"])
+        self.ram_bytes = configuration["ram_bytes"] if "ram_bytes" in configuration else to_bytes(configuration["RAM"])
         self.price = configuration.get("price", None)
-        self.pods = pods if pods else []
         self.status = configuration.get("status", "NotReady")
         self.internalIP = configuration.get("InternalIP", None)
+        self.zone = configuration.get("zone", None)
+        self.pods = []
+        self.used_milli_cpu = 0
+        self.used_ram_bytes = 0
+        for pod in pods or []:
+            self.add_pod(pod)
+
+    def add_pod(self, pod):
+        """放置pod并累加已占用的CPU/RAM, O(1)"""
+        self.pods.append(pod)
+        self.used_milli_cpu += pod.milli_cpu
+        self.used_ram_bytes += pod.ram_bytes
+
+    def remove_pod(self, pod):
+        """移除pod并释放其占用的CPU/RAM"""
+        self.pods.remove(pod)
+        self.used_milli_cpu -= pod.milli_cpu
+        self.used_ram_bytes -= pod.ram_bytes
 
     @property
-    def available_cpu(self):
-        return self.cpu - sum(x.cpu for x in self.pods)
+    def free_milli_cpu(self):
+        return self.milli_cpu - self.used_milli_cpu
 
     @property
-    def availbale_memory(self):
-        return self.memory - sum(x.memory for x in self.pods)
+    def free_ram_bytes(self):
+        return self.ram_bytes - self.used_ram_bytes
+
+    def fits(self, pod):
+        return pod.milli_cpu <= self.free_milli_cpu and pod.ram_bytes <= self.free_ram_bytes
+
+    @property
+    def cpu(self):
+        return self.milli_cpu / 1000
+
+    @cpu.setter
+    def cpu(self, cpu):
+        self.milli_cpu = to_millis(cpu)
+
+    @property
+    def memory(self):
+        return self.ram_bytes / GiB
+
+    @memory.setter
+    def memory(self, ram):
+        self.ram_bytes = to_bytes(ram)
 
     @property
     def occupied_cpu(self):
-        return sum(x.cpu for x in self.pods)
+        return self.used_milli_cpu / 1000
 
     @property
     def occupied_memory(self):
-        return sum(x.memory for x in self.pods)
+        return self.used_ram_bytes / GiB
+
+    @property
+    def available_cpu(self):
+        return (self.milli_cpu - self.used_milli_cpu) / 1000
+
+    @property
+    def availbale_memory(self):
+        return (self.ram_bytes - self.used_ram_bytes) / GiB
 
     def __str__(self):
         return (f"Node is {self.name}"
@@ -56,4 +134,4 @@ class Node:
                 f"\n\t-> status:{self.status}"
                 f"\n\t-> CPU: {self.cpu}"
                 f"\n\t-> Memory: {self.memory}"
-                f"\n\t-> has pods {self.pods}")
\ No newline at end of file
+                f"\n\t-> has pods {self.pods}")